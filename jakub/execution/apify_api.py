@@ -0,0 +1,440 @@
+"""
+apify_api.py - Shared async Apify client used by the lead-finding scripts.
+
+One aiohttp session (pooled keep-alive connections) serves every request, so
+many actor runs can be started and awaited from a single event loop. Run
+completion is detected with the run endpoint's server-side wait
+(`waitForFinish`, long-poll up to 60s) instead of sleep polling, so a finished
+run is noticed within about a second.
+
+Usage:
+    from apify_api import ApifyClient
+
+    async with ApifyClient(api_key) as apify:
+        run = await apify.start_run("code_crafter/leads-finder", run_input)
+        run = await apify.wait_for_run(run["id"], timeout=600)
+        async for page in apify.iter_dataset_pages(run["defaultDatasetId"]):
+            ...
+
+        # Large datasets: 8 concurrent range requests, only the fields you need,
+        # pages yielded as they land
+        async for page in apify.iter_dataset_pages(dataset_id, workers=8,
+                                                   fields=["email", "city"], ordered=False):
+            ...
+
+        # Or all in one go (start → wait → fetch items)
+        items = await apify.run_actor("apify/instagram-profile-scraper", {"usernames": [...]})
+
+Requires:
+    pip install aiohttp
+"""
+
+import asyncio
+import json
+
+import aiohttp
+
+
+API_BASE = "https://api.apify.com/v2"
+TERMINAL_STATUSES = ("SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT")
+
+# Apify caps waitForFinish at 60s per request
+MAX_WAIT_SECS = 60
+PAGE_LIMIT = 1000
+
+# Retry policy for transient errors (429 rate limit, 5xx, network)
+MAX_RETRIES = 4
+BACKOFF_BASE_SECS = 2
+BACKOFF_MAX_SECS = 30
+
+
+class DatasetDownloadError(Exception):
+    """A dataset page still failed after retries, so the items read are incomplete."""
+
+    def __init__(self, dataset_id):
+        super().__init__(f"Dataset {dataset_id} download stopped early")
+        self.dataset_id = dataset_id
+
+
+def api_actor_id(actor_id):
+    """Apify REST API uses ~ instead of / in actor IDs."""
+    return actor_id.replace("/", "~")
+
+
+def backoff_delay(attempt):
+    return min(BACKOFF_MAX_SECS, BACKOFF_BASE_SECS * (2 ** attempt))
+
+
+def run_is_complete(run):
+    """True if the run succeeded, i.e. its dataset holds everything it was asked for."""
+    return bool(run) and run.get("status") == "SUCCEEDED"
+
+
+class ApifyClient:
+    """Async Apify REST client. Use as `async with ApifyClient(key) as apify:`."""
+
+    def __init__(self, api_key, max_connections=20, dataset_cache=None, run_registry=None,
+                 download_workers=4):
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.download_workers = download_workers  # concurrent page requests per dataset
+        self.dataset_cache = dataset_cache  # optional dataset_cache.DatasetCache
+        self.run_registry = run_registry    # optional run_registry.RunRegistry
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=90)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {self.api_key}",
+            },
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    # --- LOW LEVEL ---
+    async def request(self, method, path, data=None, params=None, timeout=300, label=""):
+        """Make a request to the Apify API. Returns parsed JSON or None on failure.
+
+        429 and 5xx responses and network errors are retried with exponential backoff.
+        """
+        url = f"{API_BASE}/{path}"
+        prefix = f"[{label}] " if label else ""
+        body = json.dumps(data) if data is not None else None
+
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self.session.request(
+                    method, url, data=body, params=params,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                ) as resp:
+                    if resp.status < 400:
+                        return await resp.json(content_type=None)
+                    error_body = await resp.text()
+                    if resp.status != 429 and resp.status < 500:
+                        print(f"  {prefix}[ERROR] Apify API {resp.status}: {error_body[:500]}")
+                        return None
+                    error = f"Apify API {resp.status}: {error_body[:200]}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f"Apify request failed: {e!r}"
+
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(backoff_delay(attempt))
+
+        print(f"  {prefix}[ERROR] {error} (gave up after {MAX_RETRIES + 1} attempts)")
+        return None
+
+    # --- RUNS ---
+    async def start_run(self, actor_id, run_input, label=""):
+        """Start an actor run. Returns the run object (id, status, defaultDatasetId, ...) or None."""
+        result = await self.request("POST", f"acts/{api_actor_id(actor_id)}/runs", run_input, label=label)
+        if not result or "data" not in result:
+            prefix = f"[{label}] " if label else ""
+            print(f"  {prefix}[ERROR] Failed to start actor run")
+            return None
+        return result["data"]
+
+    async def get_run(self, run_id, wait=0, label=""):
+        """Fetch a run object. With `wait` > 0 the server holds the request until
+        the run finishes or `wait` seconds pass, whichever comes first."""
+        params = {"waitForFinish": str(int(wait))} if wait else None
+        result = await self.request("GET", f"actor-runs/{run_id}", params=params,
+                                    timeout=wait + 30, label=label)
+        if not result or "data" not in result:
+            return None
+        return result["data"]
+
+    async def wait_for_run(self, run_id, timeout=600, label=""):
+        """Long-poll a run until it reaches a terminal status or `timeout` seconds pass.
+
+        Returns the last run object seen (check its "status"), or None if the
+        run status could not be read at all.
+        """
+        prefix = f"[{label}] " if label else ""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        run = None
+        failures = 0
+
+        while True:
+            elapsed = loop.time() - started
+            remaining = timeout - elapsed
+            if remaining <= 0:
+                break
+
+            latest = await self.get_run(run_id, wait=min(MAX_WAIT_SECS, max(1, remaining)), label=label)
+            if latest is None:
+                failures += 1
+                if failures > MAX_RETRIES:
+                    print(f"  {prefix}[ERROR] Failed to check run status")
+                    return run
+                await asyncio.sleep(backoff_delay(failures))
+                continue
+
+            failures = 0
+            run = latest
+            if run["status"] in TERMINAL_STATUSES:
+                break
+            print(f"  {prefix}Status: {run['status']} ({int(loop.time() - started)}s)...")
+
+        return run
+
+    async def abort_run(self, run_id, label=""):
+        """Abort a running actor run. Items it already pushed stay in its dataset.
+        Returns the run object or None."""
+        result = await self.request("POST", f"actor-runs/{run_id}/abort", label=label)
+        if not result or "data" not in result:
+            return None
+        return result["data"]
+
+    # --- DATASETS ---
+    async def get_dataset_info(self, dataset_id):
+        """Dataset metadata (itemCount, actRunId, ...) or None."""
+        info = await self.request("GET", f"datasets/{dataset_id}")
+        return (info or {}).get("data")
+
+    async def is_dataset_final(self, dataset_id, info=None):
+        """True if the dataset belongs to a run that has finished (so it can no longer change)."""
+        info = info or await self.get_dataset_info(dataset_id)
+        run_id = (info or {}).get("actRunId")
+        if not run_id:
+            # Named / standalone datasets are not tied to a run - don't assume they're frozen
+            return False
+        run = await self.get_run(run_id)
+        return bool(run) and run["status"] in TERMINAL_STATUSES
+
+    async def fetch_dataset_page(self, dataset_id, offset, page_limit=PAGE_LIMIT, fields=None, label=""):
+        """One page of dataset items (list), or None on failure."""
+        params = {"offset": str(offset), "limit": str(page_limit), "format": "json"}
+        if fields:
+            params["fields"] = ",".join(fields)
+        page = await self.request("GET", f"datasets/{dataset_id}/items", params=params, label=label)
+        return page if isinstance(page, list) else None
+
+    async def iter_dataset_pages(self, dataset_id, page_limit=PAGE_LIMIT, label="", final=None,
+                                 fields=None, workers=None, ordered=True):
+        """Yield dataset items one page (list) at a time.
+
+        `fields` projects items down to just those keys (smaller payloads).
+
+        With `workers` > 1 (default: the client's download_workers) the item
+        count is read once and offset ranges are fetched concurrently by up to
+        `workers` requests. Pages come back in dataset order, or as soon as
+        each one lands with ordered=False.
+
+        With a dataset cache, a cached dataset is read from disk, and a dataset
+        downloaded in full is written to the cache if it is `final` (its run has
+        finished). Pass final=True when the caller already knows the run
+        finished; otherwise it is looked up before caching.
+
+        Raises DatasetDownloadError if a page still fails after retries; the
+        pages yielded so far are not cached.
+        """
+        prefix = f"[{label}] " if label else ""
+        workers = workers or self.download_workers
+        cache = self.dataset_cache
+        if cache and cache.has(dataset_id, fields):
+            print(f"  {prefix}Loading dataset {dataset_id} from local cache")
+            for page in cache.iter_pages(dataset_id, page_limit, fields):
+                yield page
+            return
+
+        info = None
+        if workers > 1 or (cache and cache.enabled and final is None):
+            info = await self.get_dataset_info(dataset_id)
+
+        writer = None
+        if cache and cache.enabled:
+            if final is None:
+                final = await self.is_dataset_final(dataset_id, info)
+            if final:
+                writer = cache.writer(dataset_id, fields)
+
+        item_count = (info or {}).get("itemCount")
+        if workers > 1 and item_count is not None:
+            pages = self._iter_pages_concurrent(dataset_id, item_count, page_limit, fields,
+                                                workers, ordered, label)
+        else:
+            pages = self._iter_pages_sequential(dataset_id, page_limit, fields, label)
+
+        complete = False
+        try:
+            async for page in pages:
+                if page is None:
+                    print(f"  {prefix}[ERROR] Dataset {dataset_id} download stopped early")
+                    raise DatasetDownloadError(dataset_id)
+                if writer:
+                    writer.write_page(page)
+                if page:
+                    yield page
+            complete = True
+        finally:
+            await pages.aclose()
+            if writer:
+                if complete:
+                    writer.commit()
+                else:
+                    writer.abort()
+
+    async def _iter_pages_sequential(self, dataset_id, page_limit, fields, label):
+        offset = 0
+        while True:
+            page = await self.fetch_dataset_page(dataset_id, offset, page_limit, fields, label)
+            yield page
+            if page is None or len(page) < page_limit:
+                return
+            offset += page_limit
+
+    async def _iter_pages_concurrent(self, dataset_id, item_count, page_limit, fields,
+                                     workers, ordered, label):
+        """Fetch offset ranges with at most `workers` requests in flight.
+
+        Only `workers` pages are ever pending, so memory stays bounded even in
+        ordered mode where a slow page holds back the ones after it.
+        """
+        offsets = iter(range(0, item_count, page_limit))
+        pending = []
+
+        def schedule():
+            offset = next(offsets, None)
+            if offset is not None:
+                pending.append(asyncio.create_task(
+                    self.fetch_dataset_page(dataset_id, offset, page_limit, fields, label)))
+
+        for _ in range(workers):
+            schedule()
+
+        try:
+            while pending:
+                if ordered:
+                    task = pending.pop(0)
+                    page = await task
+                else:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    task = done.pop()
+                    pending.remove(task)
+                    page = task.result()
+                schedule()
+                yield page
+                if page is None:
+                    return
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def iter_dataset_items(self, dataset_id, label="", final=None, fields=None):
+        """Yield dataset items one at a time."""
+        async for page in self.iter_dataset_pages(dataset_id, label=label, final=final, fields=fields):
+            for item in page:
+                yield item
+
+    async def fetch_dataset(self, dataset_id, label="", final=None, fields=None):
+        """Fetch all items from a dataset into a list (pages fetched concurrently).
+        Raises DatasetDownloadError if it could not be read in full."""
+        items = []
+        async for page in self.iter_dataset_pages(dataset_id, label=label, final=final, fields=fields):
+            items.extend(page)
+        return items
+
+    # --- CONVENIENCE ---
+    async def run_and_wait(self, actor_id, run_input, timeout=600, label="", run_id=None, on_start=None):
+        """Start an actor run and supervise it until it ends.
+
+        A run still going after `timeout` seconds is aborted, so it stops
+        spending. Whatever a run produced before it ended is kept: the run
+        object is returned for every outcome (check `run_is_complete(run)` -
+        anything but SUCCEEDED means its dataset is partial). Returns None
+        only if no run could be started or read.
+
+        With a run registry, an identical run that finished within the TTL is
+        reused instead of starting (and paying for) a new one.
+
+        `run_id` re-attaches to a run started earlier (e.g. before a crash)
+        instead of starting a new one; if that run already ended without
+        succeeding, its partial dataset is salvaged rather than re-run.
+        `on_start(run)` is called right after a new run is started.
+        """
+        prefix = f"[{label}] " if label else ""
+
+        registry = self.run_registry
+        if registry:
+            entry = registry.lookup(actor_id, run_input)
+            if entry:
+                run = await self.get_run(entry["run_id"], label=label)
+                if run and run["status"] == "SUCCEEDED":
+                    print(f"  {prefix}Reusing run {run['id']} (identical input, finished {entry['finished_at'][:16]})")
+                    return run
+                registry.forget(actor_id, run_input)
+
+        run = None
+        if run_id:
+            run = await self.get_run(run_id, label=label)
+            if run:
+                print(f"  {prefix}Re-attached to run {run_id} ({run['status']})")
+
+        if not run:
+            run = await self.start_run(actor_id, run_input, label=label)
+            if not run:
+                return None
+            print(f"  {prefix}Run started: {run['id']}")
+            if on_start:
+                on_start(run)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        run = await self.wait_for_run(run["id"], timeout=timeout, label=label) or run
+        elapsed = int(loop.time() - started)
+
+        if run["status"] not in TERMINAL_STATUSES:
+            print(f"  {prefix}[WARN] Run {run['id']} still {run['status']} after {elapsed}s - aborting it")
+            await self.abort_run(run["id"], label=label)
+            # Wait for ABORTED so the dataset is final before it is read
+            run = await self.wait_for_run(run["id"], timeout=MAX_WAIT_SECS, label=label) or run
+
+        if not run_is_complete(run):
+            print(f"  {prefix}[WARN] Actor run {run['status']} ({elapsed}s) - keeping its partial dataset")
+            return run
+
+        print(f"  {prefix}Actor finished ({elapsed}s)")
+        if registry:
+            registry.record(actor_id, run_input, run)
+        return run
+
+    async def run_actor(self, actor_id, run_input, timeout=600, label=""):
+        """Run an actor and wait for it to finish. Returns dataset items - partial
+        if the run did not succeed, [] if it never started."""
+        run = await self.run_and_wait(actor_id, run_input, timeout=timeout, label=label)
+        if not run:
+            return []
+        # Only a finished run's dataset is final; if the abort didn't land, don't cache it
+        items = await self.fetch_dataset(run["defaultDatasetId"], label=label,
+                                         final=run["status"] in TERMINAL_STATUSES)
+        if not run_is_complete(run):
+            prefix = f"[{label}] " if label else ""
+            print(f"  {prefix}Salvaged {len(items)} items from {run['status']} run (partial)")
+        return items
+
+    async def cap_parallel(self, max_parallel):
+        """Lower a wanted number of concurrent runs to what the account can still start."""
+        if max_parallel > 1:
+            account_limit = await self.get_concurrency_limit()
+            if account_limit is not None and account_limit < max_parallel:
+                print(f"  Apify account allows {account_limit} more concurrent runs - capping --parallel")
+                return account_limit
+        return max(1, max_parallel)
+
+    async def get_concurrency_limit(self):
+        """How many more actor runs the account can start right now (None if unknown)."""
+        result = await self.request("GET", "users/me/limits")
+        if not result or "data" not in result:
+            return None
+        data = result["data"]
+        max_jobs = (data.get("limits") or {}).get("maxConcurrentActorJobs")
+        active = (data.get("current") or {}).get("activeActorJobCount", 0)
+        if not max_jobs:
+            return None
+        return max(1, max_jobs - active)
@@ -3,14 +3,18 @@ audit_dataset.py - Pull an Apify dataset and audit lead quality with strict posi
 
 Usage:
     python3 jakub/execution/audit_dataset.py Yc8vjXz4KCfq7g3lI
+
+    # Re-download from Apify instead of reading jakub/.tmp/datasets/
+    python3 jakub/execution/audit_dataset.py Yc8vjXz4KCfq7g3lI --no-cache
 """
 
-import json
+import asyncio
 import os
 import random
 import sys
-import urllib.request
-import urllib.error
+
+from apify_api import ApifyClient, DatasetDownloadError
+from dataset_cache import DatasetCache
 
 
 def load_env(path=".env"):
@@ -76,12 +80,20 @@ def check_company_size(lead):
     return True, size_str
 
 
+async def fetch_dataset(api_key, dataset_id, use_cache=True):
+    """Fetch all items from an Apify dataset (from the local cache when available)."""
+    async with ApifyClient(api_key, dataset_cache=DatasetCache(enabled=use_cache)) as apify:
+        return await apify.fetch_dataset(dataset_id)
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 audit_dataset.py <dataset_id>")
+    args = [a for a in sys.argv[1:] if a != "--no-cache"]
+    use_cache = "--no-cache" not in sys.argv
+    if not args:
+        print("Usage: python3 audit_dataset.py <dataset_id> [--no-cache]")
         sys.exit(1)
 
-    dataset_id = sys.argv[1]
+    dataset_id = args[0]
     env = load_env()
     api_key = env.get("APIFY_API_KEY")
     if not api_key:
@@ -90,27 +102,11 @@ def main():
 
     # Fetch dataset
     print(f"Fetching dataset {dataset_id}...")
-    items = []
-    offset = 0
-    while True:
-        url = f"https://api.apify.com/v2/datasets/{dataset_id}/items?offset={offset}&limit=1000&format=json"
-        req = urllib.request.Request(url, headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        })
-        try:
-            with urllib.request.urlopen(req, timeout=60) as resp:
-                batch = json.loads(resp.read())
-                if isinstance(batch, list):
-                    items.extend(batch)
-                    if len(batch) < 1000:
-                        break
-                    offset += 1000
-                else:
-                    break
-        except Exception as e:
-            print(f"Error fetching: {e}")
-            break
+    try:
+        items = asyncio.run(fetch_dataset(api_key, dataset_id, use_cache))
+    except DatasetDownloadError as e:
+        print(f"ERROR: {e} - not auditing an incomplete dataset")
+        sys.exit(1)
 
     print(f"Total leads in dataset: {len(items)}")
     print()
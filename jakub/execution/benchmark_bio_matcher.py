@@ -0,0 +1,127 @@
+"""
+benchmark_bio_matcher.py - Compare the bio matcher with the old substring loops.
+
+Generates synthetic Instagram profiles (bios mixing coaching keywords, Polish
+filler words, accents, emoji, hashtags and per-profile handles / emails), then
+times the keyword checks `filter_profiles` used to do (one `in` scan per
+keyword) against one BioMatcher pass per profile (bio + location + full name),
+and reports where their decisions differ.
+
+No API calls, nothing written.
+
+Usage:
+    python3 jakub/execution/benchmark_bio_matcher.py
+    python3 jakub/execution/benchmark_bio_matcher.py --profiles 20000 --seed 7
+"""
+
+import random
+import sys
+import time
+
+from bio_matcher import fold
+from find_instagram_leads import (
+    CTA_TERMS, NEGATIVE_BIO_KEYWORDS, ONLINE_TERMS, POLAND_INDICATORS,
+    POSITIVE_BIO_KEYWORDS, match_bio,
+)
+
+
+FILLER = [
+    "zdrowie", "pasja", "sport", "życie", "rodzina", "mama", "tata", "kawa", "podróże",
+    "aplikacja", "plany", "people", "life", "love", "happy", "simple", "kontakt",
+    "współpraca", "sklep", "www", "dzień", "energia", "motywacja", "ćwiczenia",
+    "siłownia", "bieganie", "joga", "pilates", "crossfit", "💪", "🔥", "✨", "👇",
+]
+NAMES = ["Anna", "Kasia", "Tomek", "Michał", "Ola", "Piotr", "Jan", "Ewa", "Łukasz", "Zofia"]
+LOCATIONS = ["", "", "Kraków", "Warszawa, Polska", "Wrocław", "London", "Berlin", "Gdańsk"]
+
+
+def make_profiles(n, seed):
+    rng = random.Random(seed)
+    vocab = (POSITIVE_BIO_KEYWORDS + NEGATIVE_BIO_KEYWORDS[:4] + POLAND_INDICATORS
+             + ONLINE_TERMS + CTA_TERMS)
+    profiles = []
+    for _ in range(n):
+        words = rng.choices(FILLER, k=rng.randint(6, 16)) + rng.choices(vocab, k=rng.randint(0, 4))
+        rng.shuffle(words)
+        words = [("#" + w.replace(" ", "")) if rng.random() < 0.1 else w for w in words]
+        name = rng.choice(NAMES)
+        if rng.random() < 0.5:
+            # Per-profile tokens (handles, emails) the matcher has not seen before
+            handle = f"{fold(name)}.{rng.randint(1, 999_999)}"
+            words.append(rng.choice([f"@{handle}", f"📩 {handle}@gmail.com"]))
+        bio = " ".join(words)
+        if rng.random() < 0.5:
+            bio = bio.capitalize()
+        profiles.append({
+            "biography": bio,
+            "locationName": rng.choice(LOCATIONS),
+            "fullName": f"{name} | Trener",
+        })
+    return profiles
+
+
+def legacy_match(p):
+    """The checks filter_profiles did before BioMatcher."""
+    bio = (p.get("biography") or "").lower()
+    negative = any(kw in bio for kw in NEGATIVE_BIO_KEYWORDS)
+    positive = any(kw in bio for kw in POSITIVE_BIO_KEYWORDS)
+    combined = f"{bio} {(p.get('locationName') or '').lower()} {(p.get('fullName') or '').lower()}"
+    poland = any(indicator in combined for indicator in POLAND_INDICATORS)
+    online = any(term in bio for term in ONLINE_TERMS)
+    cta = any(term in bio for term in CTA_TERMS)
+    return negative, positive, poland, online, cta
+
+
+def automaton_match(p):
+    hits = match_bio(p)
+    return hits["negative"], hits["positive"], hits["poland"], hits["online"], hits["cta"]
+
+
+def timed(fn, profiles):
+    start = time.perf_counter()
+    results = [fn(p) for p in profiles]
+    return time.perf_counter() - start, results
+
+
+def main():
+    args = sys.argv[1:]
+    n = 100_000
+    seed = 42
+    i = 0
+    while i < len(args):
+        if args[i] == "--profiles" and i + 1 < len(args):
+            n = int(args[i + 1])
+            i += 2
+        elif args[i] == "--seed" and i + 1 < len(args):
+            seed = int(args[i + 1])
+            i += 2
+        else:
+            print(f"Unknown argument: {args[i]}")
+            i += 1
+
+    profiles = make_profiles(n, seed)
+    avg_len = sum(len(p["biography"]) for p in profiles) / n
+    print(f"{n:,} synthetic profiles, average bio {avg_len:.0f} chars")
+
+    legacy_secs, legacy = timed(legacy_match, profiles)
+    automaton_secs, automaton = timed(automaton_match, profiles)
+
+    print(f"\n  Substring loops:  {legacy_secs:6.2f}s  ({legacy_secs / n * 1e6:.1f} µs/profile)")
+    print(f"  Automaton:        {automaton_secs:6.2f}s  ({automaton_secs / n * 1e6:.1f} µs/profile)")
+    print(f"  Speedup:          {legacy_secs / automaton_secs:.2f}x")
+
+    print("\n  Decisions that differ (substring -> automaton):")
+    for idx, name in enumerate(["negative", "positive", "poland", "online", "cta"]):
+        gained = sum(1 for a, b in zip(legacy, automaton) if not a[idx] and b[idx])
+        lost = sum(1 for a, b in zip(legacy, automaton) if a[idx] and not b[idx])
+        print(f"    {name:9} +{gained:<6} -{lost}")
+
+    lost_poland = [p for p, a, b in zip(profiles, legacy, automaton) if a[2] and not b[2]]
+    if lost_poland:
+        print("\n  Example Poland hits dropped (substring match inside another word):")
+        for p in lost_poland[:3]:
+            print(f"    {p['biography'][:90]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+bio_matcher.py - Single-pass keyword matcher for Instagram bios.
+
+All keyword groups (positive / negative coaching signals, Poland indicators,
+score features) are compiled into one Aho-Corasick automaton, stored as a
+full transition table ({char: next state} per state). A profile is scanned
+once, however many keywords there are:
+
+- Keywords are NFKD-folded (accents dropped, "ł" -> "l", case folded) and
+  the table steps on "Ó" / "ó" exactly as on "o", so the bio needs no
+  folding pass: "kraków" and "krakow" are one keyword.
+- The text is stepped through word by word (any run of whitespace steps
+  like a single space, so "online\ncoaching" matches "online coaching").
+  The step over a word is cached, so the words that keep coming back in
+  bios ("trener", "online", "📍", ...) cost one dict lookup, not one per
+  character.
+- Keywords of 3 characters or less ("pl", "pt", "ace", "1:1", "mlm") only
+  match as whole tokens, so "pl" no longer hits "plany" or "aplikacja".
+  Longer keywords match anywhere, as before (hashtags like #fitcoach,
+  Polish inflections like "krakowie").
+- Location / full name go through the same scan as `context`, counting
+  only for the groups that should look there (Poland indicators).
+
+See benchmark_bio_matcher.py for a comparison with the plain substring loops.
+
+Usage:
+    matcher = BioMatcher({"positive": [...], "negative": [...]})
+    hits = matcher.match(bio)       # {"positive": True, "negative": False}
+
+    matcher = BioMatcher({..., "poland": [...]}, context_groups=["poland"])
+    hits = matcher.match(bio, context=location)     # location only counts for "poland"
+"""
+
+import re
+import unicodedata
+from collections import deque
+
+
+# Letters NFKD does not decompose
+EXTRA_FOLDS = {"ł": "l", "ø": "o", "đ": "d"}
+COMBINING = re.compile("[\u0300-\u036f]+")
+WHOLE_TOKEN_MAX_LEN = 3
+# Characters the table maps onto their folded form: ASCII capitals and the Latin-1 /
+# Latin Extended-A/B letters (Polish, Czech, Slovak, German, ...)
+FOLDED_CHARS = [chr(c) for c in list(range(0x41, 0x5B)) + list(range(0xC0, 0x250))]
+# (state, word) steps kept between bios - common words are scanned once per run
+STEP_CACHE_SIZE = 20_000
+NO_GROUPS = frozenset()
+
+
+def fold(text):
+    """Lowercase, accent-free version of `text`."""
+    text = text.casefold()
+    if text.isascii():
+        return text
+    text = COMBINING.sub("", unicodedata.normalize("NFKD", text))
+    for letter, base in EXTRA_FOLDS.items():
+        if letter in text:
+            text = text.replace(letter, base)
+    return text
+
+
+class BioMatcher:
+    def __init__(self, groups, context_groups=()):
+        """`groups` is {group name: [keywords]}; `context_groups` are the groups
+        that also count in the `context` text given to match()."""
+        self.group_names = list(groups)
+        self.context_groups = frozenset(context_groups)
+        keywords = {}      # folded keyword -> groups it belongs to
+        for group, words in groups.items():
+            for word in words:
+                keyword = " ".join(fold(word).split())
+                if keyword:
+                    keywords.setdefault(keyword, set()).add(group)
+
+        # Keyword trie: goto[state] = {char: child state}
+        goto = [{}]
+        ends = [[]]        # keywords ending at each state
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto[state][char] = len(goto)
+                    goto.append({})
+                    ends.append([])
+                state = goto[state][char]
+            ends[state].append(keyword)
+
+        # Failure links (breadth first), then the full transition table: a char
+        # with no trie edge goes wherever the failure state goes on it
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for char, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(char, 0)
+                ends[child] = ends[child] + ends[fail[child]]
+                queue.append(child)
+
+        # Capitals and accented letters step like their folded form
+        folds = {}
+        for char in FOLDED_CHARS:
+            base = fold(char)
+            if len(base) == 1 and base != char:
+                folds[char] = base
+        for table in delta:
+            for char, base in folds.items():
+                if base in table:
+                    table[char] = table[base]
+
+        # state -> (groups of keywords ending there, whole-token keywords ending there)
+        self.outputs = {}
+        for state, found in enumerate(ends):
+            if not found:
+                continue
+            anywhere = set()
+            tokens = []
+            for keyword in found:
+                if len(keyword) <= WHOLE_TOKEN_MAX_LEN:
+                    tokens.append((len(keyword), keyword[0].isalnum(), keyword[-1].isalnum(),
+                                   frozenset(keywords[keyword])))
+                else:
+                    anywhere |= keywords[keyword]
+            self.outputs[state] = (frozenset(anywhere), tuple(tokens))
+        self.delta = delta
+        self.space = [table.get(" ", 0) for table in delta]
+        self.steps = {}    # (state, word) -> (state after the word, groups found in it)
+
+    def match(self, text, context=""):
+        """{group: True if any of its keywords is in `text`}
+
+        `context` (location, full name, ...) is scanned the same way, but only
+        counts for the `context_groups` given to the constructor."""
+        found = set()
+        if text:
+            self._scan(text, found)
+        if context:
+            context_found = set()
+            self._scan(context, context_found)
+            found |= context_found & self.context_groups
+        return {group: group in found for group in self.group_names}
+
+    def _scan(self, text, found):
+        """Run the automaton over `text`, adding the groups it hits to `found`.
+
+        The text is stepped through word by word: words are split on whitespace,
+        so both ends of a word are token boundaries, and the state reached after
+        a word (and the groups hit inside it) depends only on the state before
+        it. Those steps are cached, so a word seen earlier in the run costs one
+        dict lookup instead of one per character."""
+        if not text.isascii() and not unicodedata.is_normalized("NFC", text):
+            text = unicodedata.normalize("NFC", text)   # "o" + combining acute -> "ó"
+        delta = self.delta
+        outputs = self.outputs
+        steps = self.steps
+        space = self.space
+        state = 0
+        for word in text.split():
+            step = steps.get((state, word))
+            if step is None:
+                start_state = state
+                groups = NO_GROUPS
+                for i, char in enumerate(word):
+                    state = delta[state].get(char, 0)
+                    if state in outputs:
+                        groups = groups | self._hits(state, word, i)
+                if len(steps) >= STEP_CACHE_SIZE:
+                    steps.clear()
+                step = steps[(start_state, word)] = (state, groups)
+            state, groups = step
+            if groups:
+                found |= groups
+            state = space[state]
+
+    def _hits(self, state, word, i):
+        """Groups of the keywords ending at `state`, at word[i]."""
+        anywhere, tokens = self.outputs[state]
+        for length, check_left, check_right, groups in tokens:
+            start = i - length + 1
+            if check_left and start > 0 and word[start - 1].isalnum():
+                continue
+            if check_right and i + 1 < len(word) and word[i + 1].isalnum():
+                continue
+            anywhere = anywhere | groups
+        return anywhere
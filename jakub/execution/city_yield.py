@@ -0,0 +1,156 @@
+"""
+city_yield.py - Per-city lead yield history and budget allocation for the city search.
+
+After every city search the pipeline records how many raw leads the city's
+run returned and how many of them were net new (not already in Supabase, not
+a duplicate within the run, not rejected by cleaning). From that history
+each city gets an expected yield - net-new clean leads per dollar of Apify
+spend - and `allocate()` spreads a total budget over the cities so the
+expected number of net-new leads is as high as possible:
+
+- Recent runs weigh more than old ones (each older run counts half as much).
+- Cities with little history are pulled toward the average of all cities,
+  so new cities still get tried.
+- Asking one city for more leads has diminishing returns (deeper results
+  overlap more with what we already have), so the budget is handed out in
+  steps of ALLOCATION_STEP leads, each step to the city whose next step is
+  expected to bring the most net-new leads.
+- Cities whose expected yield is below `min_yield` (with enough history to
+  trust it) are saturated and skipped.
+- A city whose last run came back short of its fetch_count has no more
+  leads to give than that, so it is never asked for more.
+
+Stored in jakub/.tmp/city_yield.json.
+
+Usage:
+    model = CityYieldModel()
+    allocation, skipped = model.allocate(CITIES, budget_usd=10)
+    ...
+    model.record("Raleigh", run_id, fetch_count=200, raw=200, net_new=87)
+"""
+
+import heapq
+from datetime import datetime, timezone
+
+from local_state import load_json, save_json, tmp_path
+
+
+# code_crafter/leads-finder: $1.50 per 1k leads
+COST_PER_LEAD = 0.0015
+
+ALLOCATION_STEP = 50          # leads handed out per allocation step
+MAX_FETCH_PER_CITY = 1000
+RETURNS_DECAY = 0.9           # each further step in the same city is expected to yield 10% less
+RECENCY_DECAY = 0.5           # weight of each older run relative to the one after it
+PRIOR_LEADS = 100             # strength of the pull toward the all-city average, in raw leads
+MIN_EVIDENCE_LEADS = 100      # raw leads of history needed before a city can be called saturated
+DEFAULT_NET_NEW_RATIO = 0.5   # net-new share assumed when there is no history at all
+DEFAULT_MIN_YIELD = 30        # net-new leads per dollar below which a city counts as saturated
+MAX_RUNS_KEPT = 10
+
+
+class CityYieldModel:
+    def __init__(self):
+        self.path = tmp_path("city_yield.json")
+        self.cities = load_json(self.path, {})
+
+    def record(self, city, run_id, fetch_count, raw, net_new):
+        """Record one city run. A run already recorded (reused or resumed) is
+        ignored - its first measurement is the one that counts."""
+        runs = self.cities.setdefault(city, [])
+        if any(r["run_id"] == run_id for r in runs):
+            return
+        runs.append({
+            "run_id": run_id,
+            "at": datetime.now(timezone.utc).isoformat(),
+            "fetch_count": fetch_count,
+            "raw": raw,
+            "net_new": net_new,
+            "cost_usd": round(raw * COST_PER_LEAD, 4),
+        })
+        del runs[:-MAX_RUNS_KEPT]
+        save_json(self.path, self.cities)
+
+    def _weighted(self, city):
+        """(raw, net_new) over the city's runs, most recent weighted highest."""
+        raw = net_new = 0.0
+        weight = 1.0
+        for run in reversed(self.cities.get(city, [])):
+            raw += weight * run["raw"]
+            net_new += weight * run["net_new"]
+            weight *= RECENCY_DECAY
+        return raw, net_new
+
+    def _prior_ratio(self):
+        raw = sum(r["raw"] for runs in self.cities.values() for r in runs)
+        net_new = sum(r["net_new"] for runs in self.cities.values() for r in runs)
+        return net_new / raw if raw else DEFAULT_NET_NEW_RATIO
+
+    def net_new_ratio(self, city, prior=None):
+        """Expected share of a city's raw leads that come out net new."""
+        prior = self._prior_ratio() if prior is None else prior
+        raw, net_new = self._weighted(city)
+        return (net_new + PRIOR_LEADS * prior) / (raw + PRIOR_LEADS)
+
+    def yield_per_dollar(self, city, prior=None):
+        """Expected net-new clean leads per dollar of Apify spend."""
+        return self.net_new_ratio(city, prior) / COST_PER_LEAD
+
+    def capacity(self, city):
+        """Most leads worth asking the city for (its pool, if a run came back short)."""
+        runs = self.cities.get(city)
+        if runs and runs[-1]["raw"] < runs[-1]["fetch_count"]:
+            return max(ALLOCATION_STEP, runs[-1]["raw"])
+        return MAX_FETCH_PER_CITY
+
+    def allocate(self, cities, budget_usd, min_yield=DEFAULT_MIN_YIELD):
+        """Split `budget_usd` of leads over `cities`.
+
+        Returns (allocation, skipped): {city: fetch_count} in descending
+        expected yield, and {city: reason} for cities left out.
+        """
+        prior = self._prior_ratio()
+        skipped = {}
+        heap = []
+        for order, city in enumerate(cities):
+            per_dollar = self.yield_per_dollar(city, prior)
+            evidence, _ = self._weighted(city)
+            if per_dollar < min_yield and evidence >= MIN_EVIDENCE_LEADS:
+                skipped[city] = f"saturated ({per_dollar:.0f} net new/$)"
+                continue
+            # Max-heap on the expected net-new leads of the city's next step;
+            # ties go to the city listed first
+            heapq.heappush(heap, (-per_dollar, order, city))
+
+        steps = int(budget_usd / (ALLOCATION_STEP * COST_PER_LEAD))
+        allocation = {}
+        while steps > 0 and heap:
+            neg_marginal, order, city = heapq.heappop(heap)
+            fetch = allocation.get(city, 0)
+            room = self.capacity(city) - fetch
+            if room <= 0:
+                continue
+            allocation[city] = fetch + min(ALLOCATION_STEP, room)
+            steps -= 1
+            heapq.heappush(heap, (neg_marginal * RETURNS_DECAY, order, city))
+
+        for city in cities:
+            if city not in allocation and city not in skipped:
+                skipped[city] = "budget exhausted"
+
+        ranked = sorted(allocation, key=lambda c: -self.yield_per_dollar(c, prior))
+        return {c: allocation[c] for c in ranked}, skipped
+
+    def expected_net_new(self, allocation):
+        """Expected net-new leads from an allocation, with the same diminishing
+        returns per step that `allocate()` assumes."""
+        prior = self._prior_ratio()
+        total = 0.0
+        for city, fetch in allocation.items():
+            ratio = self.net_new_ratio(city, prior)
+            k = 0
+            while fetch > 0:
+                total += ratio * min(ALLOCATION_STEP, fetch) * RETURNS_DECAY ** k
+                fetch -= ALLOCATION_STEP
+                k += 1
+        return total
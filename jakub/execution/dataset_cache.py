@@ -0,0 +1,121 @@
+"""
+dataset_cache.py - Local compressed cache of finished Apify datasets.
+
+Datasets of finished actor runs never change, so once a dataset has been
+downloaded in full it is kept as gzip JSONL under jakub/.tmp/datasets/ and
+later reads (`--dataset <id>` resumes, repeated audits) load it from disk
+instead of paging through the Apify API again.
+
+Projected downloads (only some `fields`) are cached separately from the full
+dataset; a full copy can serve any projection.
+
+The cache is size-capped: after each write the least recently used datasets
+are evicted until the directory fits in `max_bytes`. Pass `--no-cache` to the
+scripts to bypass it (no reads, no writes).
+
+Usage:
+    cache = DatasetCache()
+    if cache.has(dataset_id):
+        for page in cache.iter_pages(dataset_id):
+            ...
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+from local_state import tmp_path
+
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+PAGE_SIZE = 1000
+
+
+class DatasetCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.dir = os.path.dirname(tmp_path("datasets", "_"))
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+    def path(self, dataset_id, fields=None):
+        if fields:
+            digest = hashlib.sha1(",".join(sorted(fields)).encode("utf-8")).hexdigest()[:10]
+            return os.path.join(self.dir, f"{dataset_id}.{digest}.jsonl.gz")
+        return os.path.join(self.dir, f"{dataset_id}.jsonl.gz")
+
+    def _existing_path(self, dataset_id, fields=None):
+        """The full copy if present, else the matching projection, else None."""
+        if not self.enabled:
+            return None
+        for path in (self.path(dataset_id), self.path(dataset_id, fields) if fields else None):
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    def has(self, dataset_id, fields=None):
+        return self._existing_path(dataset_id, fields) is not None
+
+    def iter_pages(self, dataset_id, page_size=PAGE_SIZE, fields=None):
+        """Yield cached items in pages of `page_size`, projected to `fields` if given."""
+        path = self._existing_path(dataset_id, fields)
+        os.utime(path)  # mark as recently used for eviction
+        page = []
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                item = json.loads(line)
+                if fields:
+                    item = {k: item[k] for k in fields if k in item}
+                page.append(item)
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+        if page:
+            yield page
+
+    def writer(self, dataset_id, fields=None):
+        """Start writing a dataset. Call `write_page()` per page, then
+        `commit()` once the download is complete (or `abort()`)."""
+        return DatasetCacheWriter(self, dataset_id, fields)
+
+    def evict(self):
+        """Delete least recently used datasets until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.dir):
+            if not name.endswith(".jsonl.gz"):
+                continue
+            full = os.path.join(self.dir, name)
+            st = os.stat(full)
+            entries.append((st.st_mtime, st.st_size, full))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, full in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(full)
+            total -= size
+
+
+class DatasetCacheWriter:
+    """Writes to a temp file so a partial download never looks like a cached dataset."""
+
+    def __init__(self, cache, dataset_id, fields=None):
+        self.cache = cache
+        self.final_path = cache.path(dataset_id, fields)
+        self.tmp_path = f"{self.final_path}.{os.getpid()}.part"
+        self.file = gzip.open(self.tmp_path, "wt", encoding="utf-8", compresslevel=6)
+
+    def write_page(self, items):
+        for item in items:
+            self.file.write(json.dumps(item, ensure_ascii=False))
+            self.file.write("\n")
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.final_path)
+        self.cache.evict()
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
@@ -0,0 +1,56 @@
+"""
+email_index.py - Local index of the emails already in the `leads` table.
+
+find_and_enrich_leads dedups every Apify lead against the emails already in
+Supabase. Paging the whole table with limit/offset on every run re-downloads
+every email and gets slower as the table grows (Postgres walks past all
+skipped rows). The index keeps the emails locally with the highest lead id
+seen, and `sync()` only reads rows added since then (keyset on id), so a warm
+run downloads just the new leads.
+
+Rows deleted or edited in Supabase after they were indexed are not noticed;
+delete the file (or pass --rebuild-email-index) to rebuild it from scratch.
+
+Stored in jakub/.tmp/lead_emails.json as {"last_id": N, "emails": [sorted]}.
+
+Usage:
+    index = EmailIndex()
+    index.sync(sb_url, sb_key)
+    if email in index.emails: ...
+"""
+
+from local_state import load_json, save_json, tmp_path
+from supabase_api import get_client
+
+
+PAGE_SIZE = 1000
+
+
+class EmailIndex:
+    def __init__(self, rebuild=False):
+        self.path = tmp_path("lead_emails.json")
+        data = {} if rebuild else load_json(self.path, {})
+        self.last_id = data.get("last_id", 0)
+        self.emails = set(data.get("emails", []))
+        self.rebuilt = rebuild
+
+    def save(self):
+        save_json(self.path, {"last_id": self.last_id, "emails": sorted(self.emails)})
+
+    def sync(self, sb_url, sb_key):
+        """Add leads rows created since the last sync. Returns rows read."""
+        sb = get_client(sb_url, sb_key)
+        added = 0
+        while True:
+            rows = sb.get(f"leads?select=id,email&id=gt.{self.last_id}&order=id.asc&limit={PAGE_SIZE}")
+            for row in rows:
+                if row.get("email"):
+                    self.emails.add(row["email"].lower().strip())
+                self.last_id = max(self.last_id, row["id"])
+            added += len(rows)
+            if len(rows) < PAGE_SIZE:
+                break
+        if added or self.rebuilt:
+            self.save()
+            self.rebuilt = False
+        return added
@@ -2,7 +2,9 @@
 enrich_with_ai.py - Use GPT-5-mini to enrich leads with AI insights (async, 20 concurrent).
 
 Usage:
-    python3 jakub/execution/enrich_with_ai.py [--limit 10] [--concurrency 20] [--rerun]
+    python3 jakub/execution/enrich_with_ai.py [--limit 10] [--concurrency 20] [--rerun] [--local]
+
+    --local  select leads from the local SQLite mirror (see local_mirror.py)
 
 Reads leads from Supabase (those that have been website-scraped but not AI-enriched),
 sends their data to GPT-5-mini, and updates Supabase with:
@@ -27,6 +29,10 @@ import json
 import asyncio
 import aiohttp
 
+from local_mirror import LocalMirror
+from supabase_api import AsyncSupabaseClient
+from upsert_buffer import UpsertBuffer
+
 
 # --- ENV ---
 def load_env(env_path=".env"):
@@ -52,22 +58,6 @@ async def supabase_get(session, url, key, endpoint):
         return []
 
 
-async def supabase_update(session, url, key, table, match_col, match_val, data):
-    full_url = f"{url}/rest/v1/{table}?{match_col}=eq.{match_val}"
-    headers = {
-        "apikey": key,
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal",
-    }
-    async with session.patch(full_url, headers=headers, json=data) as resp:
-        if resp.status in (200, 204):
-            return True
-        error_body = await resp.text()
-        print(f"  Update error: {resp.status} - {error_body[:200]}")
-        return False
-
-
 # --- SYSTEM PROMPT ---
 SYSTEM_PROMPT = """You write cold email opening lines for FitCore - we build custom client dashboards for fitness coaches.
 
@@ -298,7 +288,7 @@ def sanitize_ai_output(result):
     return result
 
 
-async def enrich_lead(session, semaphore, i, total, lead, openai_key, sb_url, sb_key, results):
+async def enrich_lead(session, semaphore, i, total, lead, openai_key, writes, results):
     """Enrich a single lead (runs concurrently behind a semaphore)."""
     async with semaphore:
         name = lead.get("first_name", "")
@@ -336,21 +326,20 @@ async def enrich_lead(session, semaphore, i, total, lead, openai_key, sb_url, sb
         skip_reason = result.get("skip_reason", "")
 
         update_data = {
+            "id": lead_id,
+            "email": lead.get("email"),
             "ai_pain_point": (result.get("pain_point", "") or "")[:500],
             "ai_opening_line": (result.get("opening_line", "") or "")[:300],
             "ai_estimated_clients": str(result.get("estimated_clients", ""))[:50],
             "ai_confidence_score": str(score)[:10],
         }
 
-        success = await supabase_update(session, sb_url, sb_key, "leads", "id", lead_id, update_data)
-        if success:
-            skip_flag = f" [SKIP: {skip_reason[:40]}]" if score_int < 4 and skip_reason else ""
-            print(f"  [{i+1}/{total}] {name} @ {company}... score={score}{skip_flag} - {result.get('opening_line', '')[:60]}")
-            results["enriched"] += 1
-            if score_int < 4:
-                results["skipped"] += 1
-        else:
-            results["errors"] += 1
+        await writes.add(update_data)
+        skip_flag = f" [SKIP: {skip_reason[:40]}]" if score_int < 4 and skip_reason else ""
+        print(f"  [{i+1}/{total}] {name} @ {company}... score={score}{skip_flag} - {result.get('opening_line', '')[:60]}")
+        results["enriched"] += 1
+        if score_int < 4:
+            results["skipped"] += 1
 
 
 async def main_async():
@@ -369,6 +358,7 @@ async def main_async():
             concurrency = int(args[idx + 1])
     if "--rerun" in args:
         rerun = True
+    local = "--local" in args
 
     env = load_env()
     sb_url = env.get("SUPABASE_URL", "")
@@ -401,12 +391,23 @@ async def main_async():
                 f"leads?enriched_at=not.is.null&ai_pain_point=is.null"
                 f"&select={select_fields}&limit={limit}"
             )
-        leads = await supabase_get(session, sb_url, sb_key, endpoint)
+        mirror = None
+        if local:
+            mirror = LocalMirror()
+            mirror.sync(sb_url, sb_key, tables=["leads"])
+            columns = select_fields.split(",")
+            where = "1" if rerun else "enriched_at IS NOT NULL AND ai_pain_point IS NULL"
+            leads = mirror.select("leads", where, columns=columns, limit=limit)
+        else:
+            leads = await supabase_get(session, sb_url, sb_key, endpoint)
 
         if not leads and not rerun:
             print("No website-scraped leads found. Trying all un-enriched leads...")
-            endpoint = f"leads?ai_pain_point=is.null&select={select_fields}&limit={limit}"
-            leads = await supabase_get(session, sb_url, sb_key, endpoint)
+            if local:
+                leads = mirror.select("leads", "ai_pain_point IS NULL", columns=columns, limit=limit)
+            else:
+                endpoint = f"leads?ai_pain_point=is.null&select={select_fields}&limit={limit}"
+                leads = await supabase_get(session, sb_url, sb_key, endpoint)
 
         if not leads:
             print("No leads to enrich.")
@@ -421,11 +422,14 @@ async def main_async():
         semaphore = asyncio.Semaphore(concurrency)
         results = {"enriched": 0, "errors": 0, "skipped": 0}
 
-        tasks = [
-            enrich_lead(session, semaphore, i, len(leads), lead, openai_key, sb_url, sb_key, results)
-            for i, lead in enumerate(leads)
-        ]
-        await asyncio.gather(*tasks)
+        async with AsyncSupabaseClient(sb_url, sb_key) as sb, UpsertBuffer(sb, "leads", mirror=mirror) as writes:
+            tasks = [
+                enrich_lead(session, semaphore, i, len(leads), lead, openai_key, writes, results)
+                for i, lead in enumerate(leads)
+            ]
+            await asyncio.gather(*tasks)
+        results["enriched"] -= len(writes.failed)
+        results["errors"] += len(writes.failed)
 
     print()
     print("=" * 50)
@@ -433,6 +437,7 @@ async def main_async():
     print(f"  Enriched:  {results['enriched']}")
     print(f"  Skipped:   {results['skipped']} (confidence < 4)")
     print(f"  Errors:    {results['errors']}")
+    print(f"  Saved:     {writes.written} rows in {writes.requests} Supabase requests")
     print(f"  Total:     {len(leads)}")
     print("=" * 50)
 
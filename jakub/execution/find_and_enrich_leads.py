@@ -15,9 +15,46 @@ Usage:
     # Find + enrich but don't push to Instantly
     python3 jakub/execution/find_and_enrich_leads.py --skip-instantly
 
+    # Run up to 8 city searches at once (capped by the account's Apify concurrency limit)
+    python3 jakub/execution/find_and_enrich_leads.py --parallel 8
+
+    # Stream: dedup, clean and insert each 1000-item dataset page as it downloads
+    python3 jakub/execution/find_and_enrich_leads.py --stream
+
     # Resume from an existing Apify dataset (skip the Apify run)
     python3 jakub/execution/find_and_enrich_leads.py --dataset Yc8vjXz4KCfq7g3lI
 
+    # Resume the last interrupted run: finished cities are not re-run (their datasets
+    # are re-read, from the local cache when available), in-flight runs are re-attached
+    python3 jakub/execution/find_and_enrich_leads.py --resume
+
+    # Spend ~$10 where past runs found the most net-new leads per dollar: fetch_count
+    # is split across cities by yield, cities under 30 net new/$ are skipped as saturated
+    python3 jakub/execution/find_and_enrich_leads.py --budget 10 --dry-run
+    python3 jakub/execution/find_and_enrich_leads.py --budget 10 --min-yield 50
+
+    # Download large datasets with 8 concurrent page requests (default 4)
+    python3 jakub/execution/find_and_enrich_leads.py --dataset Yc8vjXz4KCfq7g3lI --download-workers 8
+
+    # Skip the local dataset cache (jakub/.tmp/datasets/) - always download from Apify
+    python3 jakub/execution/find_and_enrich_leads.py --dataset Yc8vjXz4KCfq7g3lI --no-cache
+
+    # Re-running the same search within 24h reuses the finished run's dataset.
+    # Change the window (hours), or 0 to always start fresh runs
+    python3 jakub/execution/find_and_enrich_leads.py --reuse-ttl 72
+    python3 jakub/execution/find_and_enrich_leads.py --reuse-ttl 0
+
+    # Existing emails for dedup come from a local index (jakub/.tmp/lead_emails.json)
+    # that only downloads leads added since the last run. Rebuild it from scratch
+    # after deleting or editing leads in Supabase
+    python3 jakub/execution/find_and_enrich_leads.py --rebuild-email-index
+
+    # Or skip the email download entirely: each page's emails are looked up in
+    # Supabase (email=in.(...) chunks), so dedup cost scales with the run, not the table.
+    # Lookups are exact like the table's unique constraint: old rows stored with
+    # capitals only match an incoming email in that same spelling
+    python3 jakub/execution/find_and_enrich_leads.py --dedup lookup
+
     # Dry run - show what would happen without calling Apify
     python3 jakub/execution/find_and_enrich_leads.py --dry-run
 
@@ -35,14 +72,22 @@ Cost estimate for full run (~5,000 raw leads):
     Total:    ~$37.50 → ~2,000-2,500 net new enriched leads
 """
 
-import json
+import asyncio
 import os
+import random
 import re
 import subprocess
 import sys
-import time
-import urllib.error
-import urllib.request
+import urllib.parse
+
+from apify_api import TERMINAL_STATUSES, ApifyClient, DatasetDownloadError, run_is_complete
+from city_yield import COST_PER_LEAD, DEFAULT_MIN_YIELD, CityYieldModel
+from dataset_cache import DatasetCache
+from email_index import EmailIndex
+from query_planner import plan_queries
+from run_manifest import STATUS_FAILED, STATUS_PARTIAL, STATUS_RUNNING, STATUS_SUCCEEDED, RunManifest
+from run_registry import DEFAULT_TTL_HOURS, RunRegistry
+from supabase_api import SupabaseError, get_client
 
 
 # ---------------------------------------------------------------------------
@@ -126,6 +171,14 @@ GOOD_TITLES = [
     "strength coach", "conditioning", "wellness coach",
 ]
 
+# Raw Apify fields read by dedup + clean_and_map_lead/check_reject/score_online/classify_segment.
+# Dataset downloads are projected to these to cut payload size.
+LEAD_FIELDS = [
+    "email", "first_name", "last_name", "job_title", "headline", "linkedin",
+    "company_name", "company_website", "company_description", "company_size",
+    "industry", "keywords", "city", "state", "country",
+]
+
 # Online coaching keywords
 ONLINE_KEYWORDS = [
     "online coach", "online training", "online personal training",
@@ -137,85 +190,217 @@ ONLINE_KEYWORDS = [
 
 
 # ---------------------------------------------------------------------------
-# APIFY API (reused from find_instagram_leads.py)
+# CITY SEARCH
 # ---------------------------------------------------------------------------
 
-def apify_request(api_key, method, path, data=None):
-    """Make a request to the Apify API."""
-    url = f"https://api.apify.com/v2/{path}"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}",
+def build_run_input(query):
+    """Leads Finder input for one planned query (one or more cities, a set of job titles).
+
+    Actor docs: "If you want to target a specific city, leave Location empty
+    and enter the city in the City box."
+    """
+    return {
+        "fetch_count": query["fetch_count"],
+        "contact_job_title": query["job_titles"],
+        "contact_city": [c.lower() for c in query["cities"]],
+        "company_industry": ["health, wellness & fitness"],
+        "size": ["1-10", "11-20", "21-50"],
+        "email_status": ["validated"],
     }
-    body = json.dumps(data).encode("utf-8") if data else None
-    req = urllib.request.Request(url, data=body, headers=headers, method=method)
 
+
+def split_page_by_city(query, page):
+    """Group a merged run's page by the lead's city, so each city's yield is
+    tracked on its own. Leads whose city doesn't match go under the query name."""
+    if len(query["cities"]) == 1:
+        return {query["cities"][0]: page}
+    by_name = {c.lower(): c for c in query["cities"]}
+    groups = {}
+    for lead in page:
+        city = by_name.get((lead.get("city") or "").strip().lower(), query["name"])
+        groups.setdefault(city, []).append(lead)
+    return groups
+
+
+async def search_query(apify, query, on_page, manifest=None):
+    """Run the Leads Finder actor for one planned query and hand its dataset to
+    `on_page(city_name, page)` one page at a time (per city for merged
+    queries). Returns the raw lead count.
+
+    With a manifest, the query's run id / dataset id / status / item count are
+    checkpointed as they change; a query already finished in the manifest is
+    not re-run, its dataset is just pulled again.
+
+    A run that times out or fails still hands over whatever leads it found
+    (already paid for); the query is then recorded as partial. If its dataset
+    cannot be read in full, DatasetDownloadError is raised and the query stays
+    unfinished in the manifest.
+    """
+    name = query["name"]
+    fetch_count = query["fetch_count"]
+    entry = (manifest.get(name) if manifest else None) or {}
+    status = entry.get("status")
+
+    if status in (STATUS_SUCCEEDED, STATUS_PARTIAL):
+        print(f"  [{name}] Already finished (dataset {entry['dataset_id']}) - pulling dataset")
+        dataset_id = entry["dataset_id"]
+        # Older entries have no run_status: let the client look the run up
+        final = entry["run_status"] in TERMINAL_STATUSES if entry.get("run_status") else None
+    else:
+        def checkpoint_start(run):
+            manifest.update(name, status=STATUS_RUNNING, run_id=run["id"],
+                            dataset_id=run["defaultDatasetId"], fetch_count=fetch_count)
+
+        # ~12 sec per lead for email verification, min 10 min per run
+        run_timeout = max(600, fetch_count * 12)
+        run = await apify.run_and_wait("code_crafter/leads-finder", build_run_input(query),
+                                       timeout=run_timeout, label=name,
+                                       run_id=entry.get("run_id"),
+                                       on_start=checkpoint_start if manifest else None)
+        if not run:
+            if manifest:
+                manifest.update(name, status=STATUS_FAILED)
+            return 0
+        dataset_id = run["defaultDatasetId"]
+        status = STATUS_SUCCEEDED if run_is_complete(run) else STATUS_PARTIAL
+        # Only a finished run's dataset is final; if the abort didn't land, don't cache it
+        final = run["status"] in TERMINAL_STATUSES
+        if manifest:
+            manifest.update(name, run_id=run["id"], dataset_id=dataset_id, run_status=run["status"])
+
+    count = 0
     try:
-        with urllib.request.urlopen(req, timeout=300) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8") if e.fp else ""
-        print(f"  [ERROR] Apify API {e.code}: {error_body[:500]}")
+        async for page in apify.iter_dataset_pages(dataset_id, label=name, final=final,
+                                                   fields=LEAD_FIELDS, ordered=False):
+            count += len(page)
+            for city_name, city_page in split_page_by_city(query, page).items():
+                await on_page(city_name, city_page)
+    except DatasetDownloadError:
+        if manifest:
+            # Not finished until its dataset was read in full: --resume re-attaches and pulls it again
+            manifest.update(name, status=STATUS_RUNNING)
+        raise
+
+    if status == STATUS_PARTIAL:
+        print(f"  [{name}] Partial: salvaged {count}/{fetch_count} leads")
+    if manifest:
+        manifest.update(name, status=status, dataset_id=dataset_id, item_count=count)
+    return count
+
+
+async def search_queries(api_key, queries, on_page, max_parallel=1, client_options=None,
+                         manifest=None):
+    """Run every planned query (see query_planner), keeping at most
+    `max_parallel` actor runs in flight.
+
+    Each run spends almost all of its time waiting on Apify, so all runs are
+    awaited from one event loop and each run's dataset is handed to
+    `on_page` as soon as it finishes. The cap is lowered to whatever the
+    account can still start. Returns the total raw lead count.
+
+    `client_options` are passed to ApifyClient (dataset_cache, run_registry).
+    `manifest` (RunManifest) checkpoints each query so --resume can skip it.
+    """
+    async with ApifyClient(api_key, **(client_options or {})) as apify:
+        max_parallel = max(1, min(await apify.cap_parallel(max_parallel), len(queries)))
+        print(f"  Runs in flight: up to {max_parallel}")
+
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def search_one(query):
+            entry = (manifest.get(query["name"]) if manifest else None) or {}
+            if entry.get("status") in (STATUS_SUCCEEDED, STATUS_PARTIAL):
+                # No actor run needed - don't take a run slot
+                return query["name"], await search_query(apify, query, on_page, manifest)
+            async with semaphore:
+                print(f"  Searching: {query['name']} ({query['fetch_count']} leads)")
+                return query["name"], await search_query(apify, query, on_page, manifest)
+
+        total = 0
+        done = 0
+        for next_done in asyncio.as_completed([search_one(q) for q in queries]):
+            done += 1
+            try:
+                name, query_count = await next_done
+            except Exception as e:
+                print(f"  [{done}/{len(queries)}] [ERROR] Search failed: {e}")
+                continue
+            print(f"  [{done}/{len(queries)}] Got {query_count} leads from {name}")
+            total += query_count
+
+    return total
+
+
+async def stream_apify_dataset(api_key, dataset_id, on_page, client_options=None):
+    """Hand every page of an existing Apify dataset to `on_page(dataset_id, page)`.
+    Returns the raw lead count."""
+    count = 0
+    async with ApifyClient(api_key, **(client_options or {})) as apify:
+        async for page in apify.iter_dataset_pages(dataset_id, fields=LEAD_FIELDS, ordered=False):
+            count += len(page)
+            await on_page(dataset_id, page)
+    return count
+
+
+def manifest_plan(manifest):
+    """(allocation, queries) saved in a manifest's config, or None if the manifest
+    predates query planning ({"cities", "leads_per_city"}) or is damaged."""
+    config = manifest.config if isinstance(manifest.config, dict) else {}
+    allocation = config.get("allocation")
+    queries = config.get("queries")
+    if not isinstance(allocation, dict) or not allocation or not isinstance(queries, list) or not queries:
         return None
-    except Exception as e:
-        print(f"  [ERROR] Apify request failed: {e}")
+    required = ("name", "fetch_count", "cities", "job_titles", "allocation")
+    if not all(isinstance(q, dict) and all(key in q for key in required) for q in queries):
         return None
-
-
-def run_apify_actor(api_key, actor_id, run_input, poll_interval=10, timeout=600):
-    """Run an Apify actor and wait for it to finish. Returns dataset items."""
-    api_actor_id = actor_id.replace("/", "~")
-
-    result = apify_request(api_key, "POST", f"acts/{api_actor_id}/runs", run_input)
-    if not result or "data" not in result:
-        print("  [ERROR] Failed to start actor run")
-        return []
-
-    run_id = result["data"]["id"]
-    dataset_id = result["data"]["defaultDatasetId"]
-    print(f"  Run started: {run_id}")
-
-    # Poll until finished
-    elapsed = 0
-    while elapsed < timeout:
-        time.sleep(poll_interval)
-        elapsed += poll_interval
-        status_result = apify_request(api_key, "GET", f"acts/{api_actor_id}/runs/{run_id}")
-        if not status_result or "data" not in status_result:
-            print("  [ERROR] Failed to check run status")
-            return []
-
-        status = status_result["data"]["status"]
-        if status in ("SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"):
-            break
-        print(f"  Status: {status} ({elapsed}s)...")
-
-    if status != "SUCCEEDED":
-        print(f"  [ERROR] Actor run {status}")
-        return []
-
-    print(f"  Actor finished ({elapsed}s)")
-
-    # Fetch dataset items
-    items = []
-    offset = 0
-    page_limit = 1000
-    while True:
-        dataset_result = apify_request(
-            api_key, "GET",
-            f"datasets/{dataset_id}/items?offset={offset}&limit={page_limit}&format=json"
-        )
-        if not dataset_result:
-            break
-        if isinstance(dataset_result, list):
-            items.extend(dataset_result)
-            if len(dataset_result) < page_limit:
-                break
-            offset += page_limit
-        else:
-            break
-
-    return items
+    return allocation, queries
+
+
+def finish_manifest(manifest, queries):
+    """Mark the manifest finished (once its leads are stored) if every query's run
+    is done, succeeded or partial. Failed queries leave it open so --resume runs
+    them again."""
+    statuses = [(manifest.get(q["name"]) or {}).get("status") for q in queries]
+    if all(status in (STATUS_SUCCEEDED, STATUS_PARTIAL) for status in statuses):
+        manifest.finish()
+
+
+def record_city_yields(model, manifest, processor, restored=()):
+    """Store each searched city's raw / net-new counts in the yield model.
+
+    Cities with a query in `restored` (started before a --resume) are not
+    recorded: leads that run inserted before the interruption now count as
+    existing, so their net-new count would read as ~0.
+
+    A city split over several runs is recorded once with their combined
+    fetch_count. For a merged run that came back full, the per-city split was
+    up to the actor, so each city's fetch_count is taken as what it returned
+    (it may have more to give).
+    """
+    cities = {}
+    resumed = set()
+    for query in manifest.config["queries"]:
+        if query["name"] in restored:
+            resumed.update(query["cities"])
+        entry = manifest.get(query["name"]) or {}
+        if entry.get("status") not in (STATUS_SUCCEEDED, STATUS_PARTIAL):
+            continue
+        filled = entry.get("item_count", 0) >= query["fetch_count"]
+        for city_name, share in query["allocation"].items():
+            city = cities.setdefault(city_name, {"run_ids": [], "fetch_count": 0, "open_ended": False})
+            city["run_ids"].append(entry["run_id"])
+            city["fetch_count"] += share
+            city["open_ended"] |= filled and len(query["cities"]) > 1
+
+    if resumed:
+        print(f"  Yield stats not recorded for {len(resumed)} cities resumed from an earlier run")
+    for city_name, city in cities.items():
+        stats = processor.by_source.get(city_name)
+        if not stats or city_name in resumed:
+            continue
+        fetch_count = stats["raw"] if city["open_ended"] else city["fetch_count"]
+        model.record(city_name, "+".join(sorted(city["run_ids"])), fetch_count,
+                     stats["raw"], stats["net_new"])
 
 
 # ---------------------------------------------------------------------------
@@ -224,52 +409,88 @@ def run_apify_actor(api_key, actor_id, run_input, poll_interval=10, timeout=600)
 
 def sb_get(sb_url, sb_key, endpoint):
     """GET from Supabase REST API."""
-    req = urllib.request.Request(
-        f"{sb_url}/rest/v1/{endpoint}",
-        headers={"apikey": sb_key, "Authorization": f"Bearer {sb_key}"}
-    )
-    return json.loads(urllib.request.urlopen(req).read())
+    return get_client(sb_url, sb_key).get(endpoint)
 
 
 def sb_post_batch(sb_url, sb_key, table, rows):
     """POST batch of rows to Supabase. Returns (inserted, skipped)."""
-    body = json.dumps(rows).encode("utf-8")
-    full_url = f"{sb_url}/rest/v1/{table}?on_conflict=email"
-    headers = {
-        "apikey": sb_key,
-        "Authorization": f"Bearer {sb_key}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal,resolution=ignore-duplicates",
-    }
-
-    req = urllib.request.Request(full_url, data=body, headers=headers, method="POST")
     try:
-        urllib.request.urlopen(req)
+        get_client(sb_url, sb_key).post(f"{table}?on_conflict=email", rows,
+                                        prefer="return=minimal,resolution=ignore-duplicates")
         return len(rows), 0
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8")
-        if "duplicate" in error_body.lower() or e.code == 409:
+    except SupabaseError as e:
+        if "duplicate" in e.body.lower() or e.status == 409:
             return 0, len(rows)
-        print(f"  [ERROR] Supabase POST: {e.code} - {error_body[:200]}")
+        print(f"  [ERROR] Supabase POST: {e.status} - {e.body[:200]}")
         return 0, 0
     except Exception as e:
         print(f"  [ERROR] Supabase POST: {e}")
         return 0, 0
 
 
-def fetch_existing_emails(sb_url, sb_key):
-    """Fetch all existing emails from leads table."""
-    emails = set()
-    offset = 0
-    while True:
-        rows = sb_get(sb_url, sb_key, f"leads?select=email&limit=1000&offset={offset}")
-        for r in rows:
-            if r.get("email"):
-                emails.add(r["email"].lower().strip())
-        if len(rows) < 1000:
-            break
-        offset += 1000
-    return emails
+def fetch_existing_emails(sb_url, sb_key, rebuild=False):
+    """All emails in the leads table, from the local EmailIndex plus rows added
+    since its last sync."""
+    index = EmailIndex(rebuild=rebuild)
+    added = index.sync(sb_url, sb_key)
+    print(f"  Email index: {added} new rows synced (up to lead id {index.last_id})")
+    return index.emails
+
+
+# --dedup lookup: ask Supabase only about the emails about to be inserted
+LOOKUP_URL_BUDGET = 6000   # characters of encoded emails per email=in.(...) request
+LOOKUP_CONCURRENCY = 8
+
+
+def email_lookup_chunks(emails):
+    """Split `emails` into email=in.(...) value lists whose encoded length stays
+    under LOOKUP_URL_BUDGET. Values are quoted so commas / parentheses are safe."""
+    chunk, size = [], 0
+    for email in sorted(emails):
+        value = urllib.parse.quote('"' + email.replace("\\", "\\\\").replace('"', '\\"') + '"', safe="@")
+        if chunk and size + len(value) + 1 > LOOKUP_URL_BUDGET:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(value)
+        size += len(value) + 1
+    if chunk:
+        yield chunk
+
+
+async def lookup_existing_emails(sb_url, sb_key, emails):
+    """The subset of `emails` (lowercased) already in the leads table, looked up
+    in concurrent chunks. Returns (existing, requests made)."""
+    # Emails are stored lowercased, but older rows may not be: ask for both forms
+    forms = {e.strip() for e in emails} | {e.strip().lower() for e in emails}
+    chunks = list(email_lookup_chunks(forms))
+    semaphore = asyncio.Semaphore(LOOKUP_CONCURRENCY)
+
+    async def lookup(chunk):
+        async with semaphore:
+            return await asyncio.to_thread(
+                sb_get, sb_url, sb_key, f"leads?select=email&email=in.({','.join(chunk)})")
+
+    existing = set()
+    for rows in await asyncio.gather(*(lookup(chunk) for chunk in chunks)):
+        existing.update(r["email"].lower().strip() for r in rows if r.get("email"))
+    return existing, len(chunks)
+
+
+async def check_page_emails(sb_url, sb_key, processor, page):
+    """Add the emails of `page` that already exist in Supabase to
+    processor.existing_emails before the page is processed."""
+    candidates = set()
+    for raw in page:
+        email = (raw.get("email", "") or "").strip()
+        key = email.lower()
+        if is_valid_email(key) and key not in processor.seen_emails and key not in processor.existing_emails:
+            candidates.add(email)
+    if not candidates:
+        return
+    existing, requests = await lookup_existing_emails(sb_url, sb_key, candidates)
+    processor.existing_emails |= existing
+    processor.lookup_candidates += len(candidates)
+    processor.lookup_requests += requests
 
 
 # ---------------------------------------------------------------------------
@@ -386,6 +607,143 @@ def clean_and_map_lead(raw):
     }, None
 
 
+class LeadBatchProcessor:
+    """Dedup + clean raw Apify leads page by page.
+
+    Only running counters, the set of emails seen so far and a fixed-size
+    random sample are kept, so raw pages can be dropped once processed.
+    """
+
+    def __init__(self, existing_emails, sample_size=20):
+        self.existing_emails = existing_emails
+        self.seen_emails = set()
+        self.reject_counts = {}
+        self.raw = 0
+        self.dupes_existing = 0
+        self.dupes_batch = 0
+        self.cleaned = 0
+        self.sample_size = sample_size
+        self.sample = []
+        self.by_source = {}  # {source: {"raw": n, "net_new": n}} - per-city yield
+        self.lookup_candidates = 0  # --dedup lookup: emails checked against Supabase
+        self.lookup_requests = 0
+
+    def process(self, raw_leads, source=None):
+        """Dedup and clean one page of raw leads. Returns the net-new cleaned leads."""
+        cleaned_leads = []
+        for raw in raw_leads:
+            self.raw += 1
+            email = (raw.get("email", "") or "").strip().lower()
+
+            # Dedup against existing DB
+            if email in self.existing_emails:
+                self.dupes_existing += 1
+                continue
+
+            # Dedup within this batch
+            if email in self.seen_emails:
+                self.dupes_batch += 1
+                continue
+
+            if is_valid_email(email):
+                self.seen_emails.add(email)
+
+            # Clean and qualify
+            cleaned, reason = clean_and_map_lead(raw)
+            if reason:
+                bucket = reason.split(":")[0]
+                self.reject_counts[bucket] = self.reject_counts.get(bucket, 0) + 1
+                continue
+
+            cleaned_leads.append(cleaned)
+            self.cleaned += 1
+            self._add_to_sample(cleaned)
+
+        stats = self.by_source.setdefault(source, {"raw": 0, "net_new": 0})
+        stats["raw"] += len(raw_leads)
+        stats["net_new"] += len(cleaned_leads)
+        return cleaned_leads
+
+    def _add_to_sample(self, lead):
+        """Reservoir sampling - a uniform random sample without keeping every lead."""
+        if len(self.sample) < self.sample_size:
+            self.sample.append(lead)
+            return
+        j = random.randrange(self.cleaned)
+        if j < self.sample_size:
+            self.sample[j] = lead
+
+    def print_summary(self):
+        print(f"  Raw leads:              {self.raw}")
+        print(f"  Dupes (already in DB):  {self.dupes_existing}")
+        if self.lookup_requests:
+            print(f"  Emails looked up in DB: {self.lookup_candidates} in {self.lookup_requests} requests")
+        print(f"  Dupes (within batch):   {self.dupes_batch}")
+        for reason, count in sorted(self.reject_counts.items(), key=lambda x: -x[1]):
+            print(f"  Rejected ({reason}): {count}")
+        print(f"  Net new cleaned leads:  {self.cleaned}")
+
+    def print_sample(self):
+        print(f"\n  Sample leads ({len(self.sample)} random):")
+        for j, lead in enumerate(self.sample, 1):
+            print(f"    {j}. {lead['first_name']} {lead['last_name']} - {lead['job_title']}")
+            print(f"       {lead['company_name']} ({lead['company_size']} emp) | {lead['city']}, {lead['state']}")
+            print(f"       {lead['email']} | {lead['segment']}")
+
+
+# ---------------------------------------------------------------------------
+# STREAMING MODE
+# ---------------------------------------------------------------------------
+
+async def stream_leads(apify_key, sb_url, sb_key, processor, dataset_id=None, queries=None,
+                       max_parallel=1, push=True, batch_size=50, client_options=None, manifest=None,
+                       lookup_dedup=False):
+    """Download → dedup/clean → Supabase insert, overlapped page by page.
+
+    Each dataset page is processed as soon as it arrives and its cleaned leads
+    are queued for insertion, so peak memory is bounded by page size and the
+    first rows land in Supabase while later pages are still downloading.
+    Returns (raw_count, inserted, skipped).
+    """
+    # Bounded queue = backpressure: downloads pause if inserts fall behind
+    queue = asyncio.Queue(maxsize=40)
+    totals = {"inserted": 0, "skipped": 0, "batches": 0}
+
+    async def on_page(source, page):
+        if lookup_dedup:
+            await check_page_emails(sb_url, sb_key, processor, page)
+        cleaned = processor.process(page, source)
+        print(f"  [{source}] Page of {len(page)}: {len(cleaned)} net new")
+        if not push:
+            return
+        for j in range(0, len(cleaned), batch_size):
+            await queue.put(cleaned[j:j + batch_size])
+
+    async def inserter():
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            inserted, skipped = await asyncio.to_thread(sb_post_batch, sb_url, sb_key, "leads", batch)
+            totals["inserted"] += inserted
+            totals["skipped"] += skipped
+            totals["batches"] += 1
+            print(f"  Batch {totals['batches']}: {inserted} inserted, {skipped} skipped")
+
+    insert_task = asyncio.create_task(inserter())
+    try:
+        if dataset_id:
+            raw_count = await stream_apify_dataset(apify_key, dataset_id, on_page, client_options)
+        else:
+            raw_count = await search_queries(apify_key, queries, on_page,
+                                             max_parallel, client_options, manifest)
+    finally:
+        await queue.put(None)
+        await insert_task
+
+    return raw_count, totals["inserted"], totals["skipped"]
+
+
 # ---------------------------------------------------------------------------
 # PIPELINE STEP RUNNER
 # ---------------------------------------------------------------------------
@@ -413,28 +771,6 @@ def run_pipeline_step(name, cmd, cwd):
 # MAIN
 # ---------------------------------------------------------------------------
 
-def fetch_apify_dataset(api_key, dataset_id):
-    """Fetch all items from an existing Apify dataset."""
-    items = []
-    offset = 0
-    page_limit = 1000
-    while True:
-        result = apify_request(
-            api_key, "GET",
-            f"datasets/{dataset_id}/items?offset={offset}&limit={page_limit}&format=json"
-        )
-        if not result:
-            break
-        if isinstance(result, list):
-            items.extend(result)
-            if len(result) < page_limit:
-                break
-            offset += page_limit
-        else:
-            break
-    return items
-
-
 def main():
     # Parse args
     args = sys.argv[1:]
@@ -445,6 +781,16 @@ def main():
     dry_run = False
     audit_only = False
     dataset_id = None
+    max_parallel = 5
+    stream = False
+    use_cache = True
+    reuse_ttl_hours = DEFAULT_TTL_HOURS
+    download_workers = 4
+    resume = False
+    budget = None
+    min_yield = DEFAULT_MIN_YIELD
+    rebuild_email_index = False
+    dedup = "index"
 
     i = 0
     while i < len(args):
@@ -469,10 +815,44 @@ def main():
         elif args[i] == "--dataset" and i + 1 < len(args):
             dataset_id = args[i + 1]
             i += 2
+        elif args[i] == "--parallel" and i + 1 < len(args):
+            max_parallel = max(1, int(args[i + 1]))
+            i += 2
+        elif args[i] == "--stream":
+            stream = True
+            i += 1
+        elif args[i] == "--no-cache":
+            use_cache = False
+            i += 1
+        elif args[i] == "--reuse-ttl" and i + 1 < len(args):
+            reuse_ttl_hours = float(args[i + 1])
+            i += 2
+        elif args[i] == "--budget" and i + 1 < len(args):
+            budget = float(args[i + 1])
+            i += 2
+        elif args[i] == "--min-yield" and i + 1 < len(args):
+            min_yield = float(args[i + 1])
+            i += 2
+        elif args[i] == "--resume":
+            resume = True
+            i += 1
+        elif args[i] == "--download-workers" and i + 1 < len(args):
+            download_workers = max(1, int(args[i + 1]))
+            i += 2
+        elif args[i] == "--dedup" and i + 1 < len(args):
+            dedup = args[i + 1]
+            i += 2
+        elif args[i] == "--rebuild-email-index":
+            rebuild_email_index = True
+            i += 1
         else:
             print(f"Unknown argument: {args[i]}")
             i += 1
 
+    if dedup not in ("index", "lookup"):
+        print("ERROR: --dedup must be 'index' or 'lookup'")
+        sys.exit(1)
+
     # Load env
     env = load_env()
     apify_key = env.get("APIFY_API_KEY")
@@ -487,8 +867,40 @@ def main():
         sys.exit(1)
 
     cities = CITIES[:max_cities]
-    estimated_raw = len(cities) * leads_per_city
-    estimated_cost = estimated_raw * 0.0015
+    yield_model = CityYieldModel()
+    skipped_cities = {}
+    manifest = None
+    restored = set()
+    if resume and not dataset_id:
+        manifest = RunManifest.latest("find_and_enrich")
+        if manifest and manifest.finished:
+            print(f"The last run ({manifest.path}) completed - nothing to resume.")
+            return
+        plan = manifest_plan(manifest) if manifest else None
+        if plan:
+            # The interrupted run's search settings win over this invocation's flags
+            allocation, queries = plan
+            restored = manifest.started_units()
+        elif manifest:
+            print(f"Run manifest {manifest.path} has no usable search plan (older format or "
+                  f"damaged file) - starting a new run.")
+            manifest = None
+        else:
+            print("No run manifest found - starting a new run.")
+    if not manifest:
+        if budget is not None:
+            allocation, skipped_cities = yield_model.allocate(cities, budget, min_yield)
+        else:
+            allocation = {c: leads_per_city for c in cities}
+        # Small cities share runs, big ones are split by job title
+        queries = plan_queries(allocation, JOB_TITLES, capacity=yield_model.capacity)
+        if not dataset_id and not dry_run:
+            manifest = RunManifest.create("find_and_enrich", {"allocation": allocation, "queries": queries})
+
+    merged_runs = sum(1 for q in queries if len(q["cities"]) > 1)
+    split_runs = sum(1 for q in queries if len(q["job_titles"]) < len(JOB_TITLES))
+    estimated_raw = sum(q["fetch_count"] for q in queries)
+    estimated_cost = estimated_raw * COST_PER_LEAD
 
     print("=" * 60)
     print("LEAD PIPELINE - Find by City → Dedup → Clean → Enrich → Push")
@@ -496,10 +908,25 @@ def main():
     if dataset_id:
         print(f"  Mode:            Resume from dataset {dataset_id}")
     else:
-        print(f"  Cities:          {len(cities)}")
-        print(f"  Leads/city:      {leads_per_city}")
+        print(f"  Cities:          {len(allocation)}")
+        if budget is not None and not resume:
+            print(f"  Budget:          ${budget:.2f} (allocated by net-new yield, "
+                  f"{len(skipped_cities)} cities skipped)")
+            print(f"  Expected new:    ~{yield_model.expected_net_new(allocation):.0f}")
+        elif len(set(allocation.values())) == 1:
+            print(f"  Leads/city:      {next(iter(allocation.values()))}")
+        print(f"  Actor runs:      {len(queries)} ({merged_runs} multi-city, {split_runs} split by job title)")
+        print(f"  Parallel runs:   {max_parallel}")
         print(f"  Est. raw leads:  ~{estimated_raw}")
         print(f"  Est. Apify cost: ~${estimated_cost:.2f}")
+        if manifest:
+            counts = manifest.counts()
+            print(f"  Manifest:        {manifest.path}")
+            if resume and counts:
+                print(f"  Resuming:        {counts.get(STATUS_SUCCEEDED, 0)} finished, "
+                      f"{counts.get(STATUS_PARTIAL, 0)} partial, "
+                      f"{counts.get(STATUS_RUNNING, 0)} in flight, {counts.get(STATUS_FAILED, 0)} failed")
+    print(f"  Streaming:       {stream}")
     print(f"  Skip enrichment: {skip_enrich}")
     print(f"  Skip Instantly:  {skip_instantly}")
     print(f"  Dry run:         {dry_run}")
@@ -507,8 +934,17 @@ def main():
 
     if dry_run and not dataset_id:
         print("Cities to search:")
-        for c in cities:
-            print(f"  - {c}")
+        for c, fetch_count in allocation.items():
+            per_dollar = yield_model.yield_per_dollar(c)
+            print(f"  - {c}: {fetch_count} leads (~{per_dollar:.0f} net new/$)")
+        print("Actor runs:")
+        for q in queries:
+            print(f"  - {q['name']}: {q['fetch_count']} leads, {len(q['cities'])} cities, "
+                  f"{len(q['job_titles'])} job titles")
+        if skipped_cities:
+            print("Skipped:")
+            for c, reason in skipped_cities.items():
+                print(f"  - {c}: {reason}")
         print(f"\nEstimated pipeline cost (Apify + Tavily + GPT): ~${estimated_cost + estimated_raw * 0.012:.2f}")
         print("Run without --dry-run to execute.")
         return
@@ -517,135 +953,132 @@ def main():
     # STEP 1: Fetch existing emails for dedup
     # -----------------------------------------------------------------------
     print("\n" + "=" * 60)
-    print("STEP 1: Fetching existing emails from Supabase...")
-    print("=" * 60)
-
-    existing_emails = fetch_existing_emails(sb_url, sb_key)
-    print(f"  Existing leads in DB: {len(existing_emails)}")
+    if dedup == "lookup":
+        print("STEP 1: Dedup by lookup - each page's emails are checked against Supabase")
+        print("=" * 60)
+        existing_emails = set()
+    else:
+        print("STEP 1: Fetching existing emails from Supabase...")
+        print("=" * 60)
+        existing_emails = fetch_existing_emails(sb_url, sb_key, rebuild_email_index)
+        print(f"  Existing leads in DB: {len(existing_emails)}")
 
     # -----------------------------------------------------------------------
     # STEP 2: Find leads via Apify (or load from existing dataset)
     # -----------------------------------------------------------------------
-    print("\n" + "=" * 60)
-    print("STEP 2: Finding leads via Apify")
-    print("=" * 60)
+    processor = LeadBatchProcessor(existing_emails)
+    client_options = {
+        "dataset_cache": DatasetCache(enabled=use_cache),
+        "run_registry": RunRegistry(ttl_hours=reuse_ttl_hours),
+        "download_workers": download_workers,
+    }
 
-    if dataset_id:
-        # Resume from existing dataset
-        print(f"  Loading from dataset: {dataset_id}")
-        all_raw_leads = fetch_apify_dataset(apify_key, dataset_id)
+    if stream:
+        # -------------------------------------------------------------------
+        # STEP 2-4 (streaming): each dataset page is deduped, cleaned and
+        # inserted as soon as it arrives
+        # -------------------------------------------------------------------
+        print("\n" + "=" * 60)
+        print("STEP 2-4: Streaming Apify pages → Dedup + Clean → Supabase")
+        print("=" * 60)
+        if audit_only:
+            print("  --audit-only mode: pages are cleaned but not pushed to Supabase.")
+
+        raw_count, total_inserted, total_skipped = asyncio.run(stream_leads(
+            apify_key, sb_url, sb_key, processor,
+            dataset_id=dataset_id, queries=queries,
+            max_parallel=max_parallel, push=not audit_only, client_options=client_options,
+            manifest=manifest, lookup_dedup=dedup == "lookup",
+        ))
+        if manifest:
+            record_city_yields(yield_model, manifest, processor, restored)
+            if not audit_only and total_inserted + total_skipped == processor.cleaned:
+                finish_manifest(manifest, queries)
+
+        print(f"\n  Total raw leads from Apify: {raw_count}")
+        processor.print_summary()
+        if processor.sample:
+            processor.print_sample()
+
+        if audit_only:
+            print("\n  --audit-only mode: nothing was pushed to Supabase.")
+            print("  Review the sample above. If data looks good, run again without --audit-only.")
+            return
+
+        print(f"\n  Total inserted: {total_inserted}")
+        print(f"  Total skipped:  {total_skipped}")
     else:
-        # Run per-city with correct parameter names:
-        #   contact_job_title, contact_location, contact_city, company_industry, size, email_status, fetch_count
-        all_raw_leads = []
-        for ci, city_name in enumerate(cities, 1):
-            print(f"\n  [{ci}/{len(cities)}] Searching: {city_name} ({leads_per_city} leads)")
-
-            # Actor docs: "If you want to target a specific city, leave Location empty
-            # and enter the city in the City box."
-            run_input = {
-                "fetch_count": leads_per_city,
-                "contact_job_title": JOB_TITLES,
-                "contact_city": [city_name.lower()],
-                "company_industry": ["health, wellness & fitness"],
-                "size": ["1-10", "11-20", "21-50"],
-                "email_status": ["validated"],
-            }
-
-            # ~12 sec per lead for email verification, min 10 min per city
-            city_timeout = max(600, leads_per_city * 12)
-
-            city_leads = run_apify_actor(apify_key, "code_crafter/leads-finder", run_input,
-                                         poll_interval=10, timeout=city_timeout)
-            print(f"  Got {len(city_leads)} leads from {city_name}")
-            all_raw_leads.extend(city_leads)
-
-    print(f"\n  Total raw leads from Apify: {len(all_raw_leads)}")
-
-    # -----------------------------------------------------------------------
-    # STEP 3: Dedup + Clean
-    # -----------------------------------------------------------------------
-    print("\n" + "=" * 60)
-    print("STEP 3: Dedup + Clean")
-    print("=" * 60)
-
-    seen_emails = set()
-    cleaned_leads = []
-    reject_counts = {}
-    dupes_existing = 0
-    dupes_batch = 0
-
-    for raw in all_raw_leads:
-        email = (raw.get("email", "") or "").strip().lower()
-
-        # Dedup against existing DB
-        if email in existing_emails:
-            dupes_existing += 1
-            continue
-
-        # Dedup within this batch
-        if email in seen_emails:
-            dupes_batch += 1
-            continue
-
-        if is_valid_email(email):
-            seen_emails.add(email)
-
-        # Clean and qualify
-        cleaned, reason = clean_and_map_lead(raw)
-        if reason:
-            bucket = reason.split(":")[0]
-            reject_counts[bucket] = reject_counts.get(bucket, 0) + 1
-            continue
-
-        cleaned_leads.append(cleaned)
-
-    print(f"  Raw leads:              {len(all_raw_leads)}")
-    print(f"  Dupes (already in DB):  {dupes_existing}")
-    print(f"  Dupes (within batch):   {dupes_batch}")
-    for reason, count in sorted(reject_counts.items(), key=lambda x: -x[1]):
-        print(f"  Rejected ({reason}): {count}")
-    print(f"  Net new cleaned leads:  {len(cleaned_leads)}")
-
-    if not cleaned_leads:
-        print("\nNo new leads to process. Exiting.")
-        return
-
-    # Show sample (20 random leads)
-    import random
-    sample_size = min(20, len(cleaned_leads))
-    sample = random.sample(cleaned_leads, sample_size)
-    print(f"\n  Sample leads ({sample_size} random):")
-    for j, lead in enumerate(sample, 1):
-        print(f"    {j}. {lead['first_name']} {lead['last_name']} - {lead['job_title']}")
-        print(f"       {lead['company_name']} ({lead['company_size']} emp) | {lead['city']}, {lead['state']}")
-        print(f"       {lead['email']} | {lead['segment']}")
-
-    if audit_only:
-        print("\n  --audit-only mode: stopping before Supabase push.")
-        print("  Review the sample above. If data looks good, run again without --audit-only.")
-        return
-
-    # -----------------------------------------------------------------------
-    # STEP 4: Push to Supabase
-    # -----------------------------------------------------------------------
-    print("\n" + "=" * 60)
-    print("STEP 4: Pushing to Supabase")
-    print("=" * 60)
-
-    total_inserted = 0
-    total_skipped = 0
-    batch_size = 50
-
-    for i in range(0, len(cleaned_leads), batch_size):
-        batch = cleaned_leads[i:i + batch_size]
-        inserted, skipped = sb_post_batch(sb_url, sb_key, "leads", batch)
-        total_inserted += inserted
-        total_skipped += skipped
-        print(f"  Batch {i // batch_size + 1}: {inserted} inserted, {skipped} skipped")
-
-    print(f"\n  Total inserted: {total_inserted}")
-    print(f"  Total skipped:  {total_skipped}")
+        print("\n" + "=" * 60)
+        print("STEP 2: Finding leads via Apify")
+        print("=" * 60)
+
+        # Pages are deduped + cleaned as they arrive so per-city yield is known
+        cleaned_leads = []
+
+        async def collect(source, page):
+            if dedup == "lookup":
+                await check_page_emails(sb_url, sb_key, processor, page)
+            cleaned_leads.extend(processor.process(page, source))
+
+        if dataset_id:
+            # Resume from existing dataset
+            print(f"  Loading from dataset: {dataset_id}")
+            asyncio.run(stream_apify_dataset(apify_key, dataset_id, collect, client_options))
+        else:
+            # Run the planned queries with correct parameter names:
+            #   contact_job_title, contact_location, contact_city, company_industry, size, email_status, fetch_count
+            asyncio.run(search_queries(apify_key, queries, collect,
+                                       max_parallel, client_options, manifest))
+            record_city_yields(yield_model, manifest, processor, restored)
+
+        print(f"\n  Total raw leads from Apify: {processor.raw}")
+
+        # -------------------------------------------------------------------
+        # STEP 3: Dedup + Clean
+        # -------------------------------------------------------------------
+        print("\n" + "=" * 60)
+        print("STEP 3: Dedup + Clean")
+        print("=" * 60)
+
+        processor.print_summary()
+
+        if not cleaned_leads:
+            if manifest:
+                finish_manifest(manifest, queries)
+            print("\nNo new leads to process. Exiting.")
+            return
+
+        # Show sample (20 random leads)
+        processor.print_sample()
+
+        if audit_only:
+            print("\n  --audit-only mode: stopping before Supabase push.")
+            print("  Review the sample above. If data looks good, run again without --audit-only.")
+            return
+
+        # -------------------------------------------------------------------
+        # STEP 4: Push to Supabase
+        # -------------------------------------------------------------------
+        print("\n" + "=" * 60)
+        print("STEP 4: Pushing to Supabase")
+        print("=" * 60)
+
+        total_inserted = 0
+        total_skipped = 0
+        batch_size = 50
+
+        for i in range(0, len(cleaned_leads), batch_size):
+            batch = cleaned_leads[i:i + batch_size]
+            inserted, skipped = sb_post_batch(sb_url, sb_key, "leads", batch)
+            total_inserted += inserted
+            total_skipped += skipped
+            print(f"  Batch {i // batch_size + 1}: {inserted} inserted, {skipped} skipped")
+        # A failed batch leaves the manifest open so --resume inserts it again
+        if manifest and total_inserted + total_skipped == len(cleaned_leads):
+            finish_manifest(manifest, queries)
+
+        print(f"\n  Total inserted: {total_inserted}")
+        print(f"  Total skipped:  {total_skipped}")
 
     if total_inserted == 0:
         print("\nNo new leads inserted. Skipping enrichment.")
@@ -692,10 +1125,10 @@ def main():
     print("\n" + "=" * 60)
     print("PIPELINE COMPLETE")
     print("=" * 60)
-    print(f"  Cities searched:       {len(cities)}")
-    print(f"  Raw leads from Apify:  {len(all_raw_leads)}")
-    print(f"  Duplicates removed:    {dupes_existing + dupes_batch}")
-    print(f"  Rejected (quality):    {sum(reject_counts.values())}")
+    print(f"  Cities searched:       {len(allocation)}")
+    print(f"  Raw leads from Apify:  {processor.raw}")
+    print(f"  Duplicates removed:    {processor.dupes_existing + processor.dupes_batch}")
+    print(f"  Rejected (quality):    {sum(processor.reject_counts.values())}")
     print(f"  New leads in Supabase: {total_inserted}")
     if not skip_enrich:
         print(f"  Enrichment:            completed")
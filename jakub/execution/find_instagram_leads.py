@@ -14,6 +14,12 @@ Modes:
   --mode hashtag   Search hashtags like #fitnesscoach, #onlinecoaching (default)
   --mode search    Search keywords like "fitness coach", "personal trainer"
   --mode both      Run both hashtag and keyword search (more leads, more credits)
+  --mode graph     Discover coaches through Instagram's related profiles, starting from the
+                   best-scored leads already in instagram_leads (needs Supabase)
+  --mode refresh   Re-scrape existing instagram_leads rows last scraped over --fresh-days
+                   ago and update their metric columns (followers, posts, bio, score...)
+                   in place; only rows that changed since the last refresh are sent and
+                   outreach fields (status, dm_draft, notes...) are never touched
 
 Options:
   --limit N        Max results per hashtag/keyword (default: 100)
@@ -23,6 +29,28 @@ Options:
   --dry-run        Show what would be scraped without calling Apify
   --min-followers N  Minimum follower count (default: 1000)
   --max-followers N  Maximum follower count (default: 50000)
+  --min-hashtag-yield N  Skip hashtags whose past qualified leads per dollar (search +
+                   profile scraping) is below N (default: 20); weaker-than-median
+                   hashtags get a lower resultsLimit
+  --budget USD     --mode graph: profile-scraping spend cap, seeds included (default: 2.0)
+  --graph-depth N  --mode graph: hops away from the seed leads (default: 2)
+  --graph-seeds N  --mode graph: number of existing leads to start from (default: 50)
+  --fresh-days N   Don't re-scrape usernames already in instagram_leads or scraped
+                   within the last N days (default: 30, 0 = scrape everything)
+  --full-scan      Ignore the per-hashtag high-water marks and scan the top posts again
+                   (by default only posts newer than the last run are fetched)
+  --parallel N     Hashtag / profile-scrape runs in flight at once (default: 4, capped by the
+                   Apify account's concurrency limit)
+  --ai-concurrency N  Profiles qualified by Claude at once (default: 8); rate-limited
+                   (429) and overloaded (529) responses are retried after retry-after
+  --no-ai-cache    Ask Claude about every profile, ignoring verdicts cached from
+                   earlier runs (jakub/.tmp/ai_verdicts.json; reused while the
+                   bio, name and business category are unchanged)
+  --no-language-check  Let Claude judge the language of every bio (by default bios
+                   that are clearly Polish / clearly Czech or Slovak are recognised
+                   locally; the clearly non-Polish ones never reach the API)
+  --reuse-ttl H    Reuse an identical Apify run (same actor + input) finished within
+                   the last H hours instead of paying for a new one (default: 24, 0 = off)
 
 Apify actors used:
   - apify/instagram-hashtag-scraper - find posts by hashtag, extract usernames
@@ -36,6 +64,7 @@ Costs (Apify free tier = $5/month):
 
 Requires .env with:
     APIFY_API_KEY=apify_api_...
+    ANTHROPIC_API_KEY=sk-ant-... (AI qualification; skipped without it)
     SUPABASE_URL=https://xxxxx.supabase.co (only for --output supabase/both)
     SUPABASE_KEY=sb_publishable_... (only for --output supabase/both)
 """
@@ -44,10 +73,25 @@ import sys
 import os
 import json
 import csv
-import time
+import asyncio
 import urllib.request
 import urllib.error
-from datetime import datetime, timezone
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+
+from apify_api import TERMINAL_STATUSES, ApifyClient, DatasetDownloadError, backoff_delay, run_is_complete
+from bio_matcher import BioMatcher
+from hashtag_yield import COST_PER_PROFILE, DEFAULT_MIN_YIELD, HashtagYieldModel, hashtag_search_cost
+from local_state import load_json, save_json, tmp_path
+from metric_snapshot import MetricSnapshot
+from polish_language import AMBIGUOUS, NOT_POLISH, POLISH, classify as classify_language
+from profile_frontier import ProfileFrontier
+from run_registry import DEFAULT_TTL_HOURS, RunRegistry
+from supabase_api import get_client
+from username_index import DEFAULT_FRESH_DAYS, UsernameIndex
+from verdict_cache import VerdictCache
 
 
 # --- ENV ---
@@ -64,82 +108,15 @@ def load_env(env_path=".env"):
 
 
 # --- APIFY API ---
-def apify_request(api_key, method, path, data=None):
-    """Make a request to the Apify API."""
-    url = f"https://api.apify.com/v2/{path}"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}",
-    }
-    body = json.dumps(data).encode("utf-8") if data else None
-    req = urllib.request.Request(url, data=body, headers=headers, method=method)
-
-    try:
-        with urllib.request.urlopen(req, timeout=300) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8") if e.read else ""
-        print(f"  [ERROR] Apify API {e.code}: {error_body[:500]}")
-        return None
-    except Exception as e:
-        print(f"  [ERROR] Apify request failed: {e}")
-        return None
-
-
-def run_apify_actor(api_key, actor_id, run_input, poll_interval=5):
-    """Run an Apify actor and wait for it to finish. Returns dataset items."""
+async def run_apify_actor(apify, actor_id, run_input, timeout=3600, label=""):
+    """Run an Apify actor via the shared client and wait for it to finish. Returns dataset items."""
     print(f"  Starting actor: {actor_id}")
     print(f"  Input: {json.dumps(run_input, indent=2)[:500]}")
 
-    # Start the actor run (Apify REST API uses ~ instead of / in actor IDs)
-    api_actor_id = actor_id.replace("/", "~")
-    result = apify_request(api_key, "POST", f"acts/{api_actor_id}/runs", run_input)
-    if not result or "data" not in result:
-        print("  [ERROR] Failed to start actor run")
-        return []
-
-    run_id = result["data"]["id"]
-    dataset_id = result["data"]["defaultDatasetId"]
-    print(f"  Run started: {run_id}")
-
-    # Poll until finished
-    while True:
-        time.sleep(poll_interval)
-        status_result = apify_request(api_key, "GET", f"acts/{api_actor_id}/runs/{run_id}")
-        if not status_result or "data" not in status_result:
-            print("  [ERROR] Failed to check run status")
-            return []
-
-        status = status_result["data"]["status"]
-        if status in ("SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"):
-            break
-        print(f"  Status: {status}...")
-
-    if status != "SUCCEEDED":
-        print(f"  [ERROR] Actor run {status}")
+    try:
+        items = await apify.run_actor(actor_id, run_input, timeout=timeout, label=label)
+    except DatasetDownloadError:
         return []
-
-    print(f"  Actor finished successfully")
-
-    # Fetch dataset items (paginated)
-    items = []
-    offset = 0
-    page_limit = 1000
-    while True:
-        dataset_result = apify_request(
-            api_key, "GET",
-            f"datasets/{dataset_id}/items?offset={offset}&limit={page_limit}&format=json"
-        )
-        if not dataset_result:
-            break
-        if isinstance(dataset_result, list):
-            items.extend(dataset_result)
-            if len(dataset_result) < page_limit:
-                break
-            offset += page_limit
-        else:
-            break
-
     print(f"  Retrieved {len(items)} items from dataset")
     return items
 
@@ -172,27 +149,142 @@ HASHTAGS = [
     "treningpersonalnywroclaw",
 ]
 
-def search_hashtags(api_key, limit_per_hashtag=100):
-    """Search Instagram hashtags and extract unique usernames."""
+# Newest post timestamp seen per hashtag - later runs only fetch posts newer than it
+HASHTAG_MARKS_FILE = "hashtag_marks.json"
+# A hashtag whose whole resultsLimit came back new has more new posts than we asked
+# for: re-run with a doubled limit, up to this multiple of the planned limit
+MAX_DEEPEN_FACTOR = 4
+
+
+def post_time(post):
+    ts = post.get("timestamp")
+    if not ts:
+        return None
+    return datetime.fromisoformat(ts.replace("Z", "+00:00"))
+
+
+async def search_hashtag(apify, hashtag, results_limit, since=None):
+    """Hashtag-scraper run(s) for one hashtag.
+
+    With `since` (the hashtag's high-water mark) only posts newer than it are
+    requested and kept. If every post that came back is new, the mark was not
+    reached, so the search is repeated with a doubled resultsLimit (up to
+    MAX_DEEPEN_FACTOR x) to go deeper into a fresh hashtag.
+
+    Returns (run, posts, fetched): the last run (None if none started), the
+    new posts, and how many posts were fetched in total (what was paid for).
+    """
+    label = f"#{hashtag}"
+    since_dt = datetime.fromisoformat(since) if since else None
+    posts = {}
+    fetched = 0
+    run = None
+    limit = results_limit
+    while True:
+        run_input = {"hashtags": [hashtag], "resultsLimit": limit}
+        if since:
+            run_input["onlyPostsNewerThan"] = since
+        last_run = await apify.run_and_wait("apify/instagram-hashtag-scraper", run_input,
+                                            timeout=3600, label=label)
+        if not last_run:
+            break
+        run = last_run
+        items = await apify.fetch_dataset(run["defaultDatasetId"], label=label,
+                                          final=run["status"] in TERMINAL_STATUSES)
+        fetched += len(items)
+        new = [p for p in items if not since_dt or (post_time(p) and post_time(p) > since_dt)]
+        for p in new:
+            posts[p.get("id") or p.get("shortCode") or id(p)] = p
+
+        if (not since or len(new) < limit or not run_is_complete(run)
+                or limit >= results_limit * MAX_DEEPEN_FACTOR):
+            break
+        limit *= 2
+        print(f"  [{label}] All {len(new)} posts are newer than the last run - going deeper "
+              f"(resultsLimit {limit})")
+
+    return run, list(posts.values()), fetched
+
+
+async def search_hashtags(apify, hashtag_limits, max_parallel=4, incremental=True):
+    """Search each hashtag in its own run, up to `max_parallel` at once, and
+    extract unique usernames.
+
+    `hashtag_limits` is {hashtag: resultsLimit} (see HashtagYieldModel.plan).
+    With `incremental`, each hashtag only fetches posts newer than the newest
+    one seen by earlier runs (jakub/.tmp/hashtag_marks.json).
+
+    Returns (usernames, per_hashtag, newest) where per_hashtag is
+    {hashtag: {"run_id", "posts", "usernames"}} for the yield stats and
+    newest is {hashtag: newest post timestamp} for the hashtags whose mark
+    moved. The marks are not saved here: the caller saves them with
+    save_hashtag_marks() once these posts are processed (their leads stored,
+    or none of them qualified) - not when scraping or the Supabase push fails.
+    """
     print(f"\n{'='*60}")
-    print(f"STEP 1: Searching {len(HASHTAGS)} hashtags ({limit_per_hashtag} results each)")
+    print(f"STEP 1: Searching {len(hashtag_limits)} hashtags "
+          f"({sum(hashtag_limits.values())} results total)")
     print(f"{'='*60}")
 
-    run_input = {
-        "hashtags": HASHTAGS,
-        "resultsLimit": limit_per_hashtag,
-    }
+    marks = load_json(tmp_path(HASHTAG_MARKS_FILE), {})
+    semaphore = asyncio.Semaphore(await apify.cap_parallel(max_parallel))
 
-    items = run_apify_actor(api_key, "apify/instagram-hashtag-scraper", run_input)
+    async def search_one(hashtag):
+        since = marks.get(hashtag) if incremental else None
+        async with semaphore:
+            try:
+                return hashtag, *await search_hashtag(apify, hashtag, hashtag_limits[hashtag], since)
+            except DatasetDownloadError:
+                # Incomplete posts would move the mark past posts never read - retry next run
+                return hashtag, None, [], 0
 
     usernames = set()
-    for item in items:
-        username = item.get("ownerUsername")
-        if username:
-            usernames.add(username)
+    per_hashtag = {}
+    newest = {}
+    for next_done in asyncio.as_completed([search_one(h) for h in hashtag_limits]):
+        hashtag, run, posts, fetched = await next_done
+        found = {p["ownerUsername"] for p in posts if p.get("ownerUsername")}
+        new = len(found - usernames)
+        usernames.update(found)
+        if run:
+            per_hashtag[hashtag] = {"run_id": run["id"], "posts": fetched, "usernames": found}
+        times = [t for t in map(post_time, posts) if t]
+        if times and (not marks.get(hashtag) or max(times) > datetime.fromisoformat(marks[hashtag])):
+            newest[hashtag] = max(times).isoformat()
+        print(f"  #{hashtag}: {len(posts)} new posts, {len(found)} usernames ({new} new)")
 
     print(f"\n  Found {len(usernames)} unique usernames from hashtag search")
-    return usernames
+    return usernames, per_hashtag, newest
+
+
+def save_hashtag_marks(newest):
+    """Move the hashtag high-water marks to `newest` ({hashtag: timestamp})."""
+    if not newest:
+        return
+    marks_path = tmp_path(HASHTAG_MARKS_FILE)
+    marks = load_json(marks_path, {})
+    marks.update(newest)
+    save_json(marks_path, marks)
+
+
+def record_hashtag_yields(model, per_hashtag, leads, scraped):
+    """Store each hashtag's posts / usernames / qualified leads and cost.
+
+    Only usernames in `scraped` cost a profile scrape (known handles were
+    skipped). A username found under several hashtags counts 1/n towards
+    each of them, for both its profile-scrape cost and its qualified lead.
+    """
+    owners = {}
+    for hashtag, info in per_hashtag.items():
+        for username in info["usernames"]:
+            owners[username] = owners.get(username, 0) + 1
+    qualified_handles = {lead["instagram_handle"] for lead in leads}
+
+    for hashtag, info in per_hashtag.items():
+        profile_share = sum(1 / owners[u] for u in info["usernames"] if u in scraped)
+        qualified = sum(1 / owners[u] for u in info["usernames"] if u in qualified_handles)
+        cost = hashtag_search_cost(info["posts"]) + profile_share * COST_PER_PROFILE
+        model.record(hashtag, info["run_id"], info["posts"], len(info["usernames"]), qualified, cost)
 
 
 # --- KEYWORD SEARCH ---
@@ -209,7 +301,7 @@ SEARCH_KEYWORDS = [
     "personal trainer poland",
 ]
 
-def search_keywords(api_key, limit_per_keyword=50):
+async def search_keywords(apify, limit_per_keyword=50):
     """Search Instagram by keyword and extract usernames."""
     print(f"\n{'='*60}")
     print(f"STEP 1b: Searching {len(SEARCH_KEYWORDS)} keywords ({limit_per_keyword} results each)")
@@ -224,7 +316,7 @@ def search_keywords(api_key, limit_per_keyword=50):
             "searchLimit": limit_per_keyword,
         }
 
-        items = run_apify_actor(api_key, "apify/instagram-search-scraper", run_input)
+        items = await run_apify_actor(apify, "apify/instagram-search-scraper", run_input)
         for item in items:
             username = item.get("username")
             if username:
@@ -235,26 +327,122 @@ def search_keywords(api_key, limit_per_keyword=50):
 
 
 # --- PROFILE SCRAPING ---
-def scrape_profiles(api_key, usernames):
-    """Scrape full profile details for a list of usernames."""
-    username_list = list(usernames)
+PROFILE_SCRAPER = "apify/instagram-profile-scraper"
+PROFILE_RUN_TIMEOUT = 3600
+# Chunks in flight are limited so each should finish in half the run timeout at the observed speed
+PROFILE_RUN_TARGET_SECS = PROFILE_RUN_TIMEOUT // 2
+PROFILE_CHUNK_SIZE = 200
+MIN_CHUNK_SIZE = 50
+
+
+class ScrapePace:
+    """Decides how many profile-scrape runs go at once from observed run speed.
+
+    Seconds per profile is tracked as a moving average over finished runs and
+    remembered between script runs (jakub/.tmp/profile_scrape_rate.json). When
+    runs slow down (Instagram throttling the scraper), fewer chunks run at once
+    so each still finishes well inside the timeout. Chunk sizes never change:
+    see profile_chunks().
+    """
+
+    def __init__(self):
+        self.path = tmp_path("profile_scrape_rate.json")
+        self.secs_per_profile = load_json(self.path, {}).get("secs_per_profile")
+
+    def parallel(self, max_parallel):
+        if not self.secs_per_profile:
+            return max_parallel
+        chunk_secs = self.secs_per_profile * PROFILE_CHUNK_SIZE
+        return max(1, min(max_parallel, int(PROFILE_RUN_TARGET_SECS / chunk_secs)))
+
+    def observe(self, profiles, run_secs):
+        if profiles <= 0 or not run_secs:
+            return
+        rate = run_secs / profiles
+        if self.secs_per_profile:
+            rate = 0.7 * self.secs_per_profile + 0.3 * rate
+        self.secs_per_profile = rate
+        save_json(self.path, {"secs_per_profile": rate})
+
+
+def profile_chunks(usernames):
+    """Fixed-size chunks of the sorted usernames (a short tail joins the last chunk).
+
+    The boundaries depend only on the username set, so a rerun over the same
+    set sends the same run inputs and the RunRegistry reuses the chunks that
+    already finished."""
+    username_list = sorted(usernames)
+    chunks = [username_list[i:i + PROFILE_CHUNK_SIZE]
+              for i in range(0, len(username_list), PROFILE_CHUNK_SIZE)]
+    if len(chunks) > 1 and len(chunks[-1]) < MIN_CHUNK_SIZE:
+        chunks[-2].extend(chunks.pop())
+    return chunks
+
+
+def run_duration_secs(run):
+    """How long an Apify run ran, from its own stats (also right for reused runs)."""
+    secs = (run.get("stats") or {}).get("runTimeSecs")
+    if secs:
+        return secs
+    started, finished = run.get("startedAt"), run.get("finishedAt")
+    if started and finished:
+        started = datetime.fromisoformat(started.replace("Z", "+00:00"))
+        finished = datetime.fromisoformat(finished.replace("Z", "+00:00"))
+        return (finished - started).total_seconds()
+    return None
+
+
+async def scrape_profile_chunk(apify, chunk, label):
+    """One profile-scraper run. Returns (profiles, run seconds)."""
+    run = await apify.run_and_wait(PROFILE_SCRAPER, {"usernames": chunk},
+                                   timeout=PROFILE_RUN_TIMEOUT, label=label)
+    if not run:
+        return [], None
+    try:
+        profiles = await apify.fetch_dataset(run["defaultDatasetId"], label=label,
+                                             final=run["status"] in TERMINAL_STATUSES)
+    except DatasetDownloadError:
+        return [], None
+    return profiles, run_duration_secs(run)
+
+
+async def scrape_profiles(apify, usernames, max_parallel=4):
+    """Scrape full profile details for a list of usernames.
+
+    Usernames are split into fixed chunks (one actor run each, see
+    profile_chunks()); results are merged as each run finishes. Up to
+    `max_parallel` runs are in flight, fewer when the runs seen so far were
+    slow (see ScrapePace).
+    """
+    chunks = profile_chunks(usernames)
     print(f"\n{'='*60}")
-    print(f"STEP 2: Scraping {len(username_list)} profiles")
+    print(f"STEP 2: Scraping {sum(len(c) for c in chunks)} profiles in {len(chunks)} runs")
     print(f"{'='*60}")
 
-    # Apify can handle large batches, but we chunk to avoid timeouts
-    all_profiles = []
-    chunk_size = 200
-    for i in range(0, len(username_list), chunk_size):
-        chunk = username_list[i:i + chunk_size]
-        print(f"\n  Batch {i // chunk_size + 1}: {len(chunk)} profiles")
-
-        run_input = {
-            "usernames": chunk,
-        }
+    max_parallel = await apify.cap_parallel(max_parallel)
 
-        profiles = run_apify_actor(api_key, "apify/instagram-profile-scraper", run_input)
-        all_profiles.extend(profiles)
+    pace = ScrapePace()
+    all_profiles = []
+    pending = {}
+    batch = 0
+    while batch < len(chunks) or pending:
+        while batch < len(chunks) and len(pending) < pace.parallel(max_parallel):
+            chunk = chunks[batch]
+            batch += 1
+            label = f"Batch {batch}"
+            print(f"\n  {label}: {len(chunk)} profiles")
+            task = asyncio.create_task(scrape_profile_chunk(apify, chunk, label))
+            pending[task] = (label, len(chunk))
+
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            label, chunk_len = pending.pop(task)
+            profiles, run_secs = task.result()
+            all_profiles.extend(profiles)
+            pace.observe(chunk_len, run_secs)
+            timing = f" in {run_secs:.0f}s" if run_secs else ""
+            print(f"  [{label}] Retrieved {len(profiles)}/{chunk_len} profiles{timing} "
+                  f"({len(all_profiles)} total)")
 
     print(f"\n  Scraped {len(all_profiles)} profiles total")
     return all_profiles
@@ -308,6 +496,111 @@ POLAND_INDICATORS = [
     "gdynia", "sopot", "zakopane",
 ]
 
+# Score features
+ONLINE_TERMS = ["online", "treningi online", "coaching online"]
+CTA_TERMS = ["1:1", "1-on-1", "zapisy", "napisz", "dm me", "clients", "klienci"]
+
+# All bio keyword lists in one automaton (accent-folded, short keywords like "pl"
+# only as whole tokens) - one scan over bio + location/full name; the location
+# and full name only count for "poland"
+BIO_MATCHER = BioMatcher({
+    "positive": POSITIVE_BIO_KEYWORDS,
+    "negative": NEGATIVE_BIO_KEYWORDS,
+    "poland": POLAND_INDICATORS,
+    "online": ONLINE_TERMS,
+    "cta": CTA_TERMS,
+}, context_groups=["poland"])
+
+
+def match_bio(p):
+    """BIO_MATCHER hits for a scraped profile."""
+    return BIO_MATCHER.match(p.get("biography") or "",
+                             context=f"{p.get('locationName') or ''} {p.get('fullName') or ''}")
+
+
+def build_lead(p, hits=None):
+    """instagram_leads row (profile fields, likely_us, score) for a scraped profile.
+    `hits` is match_bio(p), computed if not given."""
+    if hits is None:
+        hits = match_bio(p)
+    followers = p.get("followersCount", 0)
+
+    lead = {
+        "instagram_handle": p.get("username", ""),
+        "full_name": p.get("fullName", ""),
+        "bio": p.get("biography", ""),
+        "follower_count": followers,
+        "following_count": p.get("followsCount", 0),
+        "post_count": p.get("postsCount", 0),
+        "website": p.get("externalUrl", ""),
+        "is_business_account": p.get("isBusinessAccount", False),
+        "business_category": p.get("businessCategoryName", ""),
+        "is_verified": p.get("verified", False),
+        "scraped_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+    # Try to detect Poland-based
+    is_poland = hits["poland"]
+    lead["likely_us"] = is_poland  # Reusing column, now means "likely_poland"
+
+    # Score the lead (simple heuristic)
+    score = 0
+    if p.get("isBusinessAccount"):
+        score += 2
+    if p.get("externalUrl"):
+        score += 2
+    if hits["online"]:
+        score += 2
+    if hits["cta"]:
+        score += 2
+    if 2000 <= followers <= 30000:
+        score += 1  # Sweet spot for Polish market
+    if is_poland:
+        score += 1
+    lead["score"] = score
+    return lead
+
+
+def rejection_reason(p, min_followers=1000, max_followers=50000):
+    """(reason, hits): why a scraped profile fails the ICP criteria (None if it
+    passes) and its match_bio() hits (None if rejected before the bio check)."""
+    # Skip private accounts
+    if p.get("private", True):
+        return "private", None
+
+    # Follower count filter
+    followers = p.get("followersCount", 0)
+    if followers < min_followers:
+        return "too_few_followers", None
+    if followers > max_followers:
+        return "too_many_followers", None
+
+    # Must have a bio
+    bio = (p.get("biography") or "").lower()
+    if not bio or len(bio) < 10:
+        return "no_bio", None
+
+    hits = match_bio(p)
+
+    # Check for disqualifying keywords
+    if hits["negative"]:
+        return "negative_keywords", hits
+
+    # Must have at least one positive coaching signal
+    has_positive = bool(hits["positive"])
+    # Also check business category
+    biz_cat = (p.get("businessCategoryName") or "").lower()
+    if any(term in biz_cat for term in ["trainer", "coach", "fitness", "gym", "health"]):
+        has_positive = True
+    if not has_positive:
+        return "no_coaching_signals", hits
+
+    # Activity check - at least 10 posts
+    if p.get("postsCount", 0) < 10:
+        return "inactive", hits
+
+    return None, hits
+
 
 def filter_profiles(profiles, min_followers=1000, max_followers=50000):
     """Filter scraped profiles by ICP criteria."""
@@ -328,95 +621,11 @@ def filter_profiles(profiles, min_followers=1000, max_followers=50000):
     }
 
     for p in profiles:
-        # Skip private accounts
-        if p.get("private", True):
-            reasons_rejected["private"] += 1
-            continue
-
-        # Follower count filter
-        followers = p.get("followersCount", 0)
-        if followers < min_followers:
-            reasons_rejected["too_few_followers"] += 1
-            continue
-        if followers > max_followers:
-            reasons_rejected["too_many_followers"] += 1
+        reason, hits = rejection_reason(p, min_followers, max_followers)
+        if reason:
+            reasons_rejected[reason] += 1
             continue
-
-        # Must have a bio
-        bio = (p.get("biography") or "").lower()
-        if not bio or len(bio) < 10:
-            reasons_rejected["no_bio"] += 1
-            continue
-
-        # Check for disqualifying keywords
-        has_negative = False
-        for kw in NEGATIVE_BIO_KEYWORDS:
-            if kw in bio:
-                has_negative = True
-                break
-        if has_negative:
-            reasons_rejected["negative_keywords"] += 1
-            continue
-
-        # Must have at least one positive coaching signal
-        has_positive = False
-        for kw in POSITIVE_BIO_KEYWORDS:
-            if kw in bio:
-                has_positive = True
-                break
-        # Also check business category
-        biz_cat = (p.get("businessCategoryName") or "").lower()
-        if any(term in biz_cat for term in ["trainer", "coach", "fitness", "gym", "health"]):
-            has_positive = True
-        if not has_positive:
-            reasons_rejected["no_coaching_signals"] += 1
-            continue
-
-        # Activity check - at least 10 posts
-        if p.get("postsCount", 0) < 10:
-            reasons_rejected["inactive"] += 1
-            continue
-
-        # Build lead record
-        lead = {
-            "instagram_handle": p.get("username", ""),
-            "full_name": p.get("fullName", ""),
-            "bio": p.get("biography", ""),
-            "follower_count": followers,
-            "following_count": p.get("followsCount", 0),
-            "post_count": p.get("postsCount", 0),
-            "website": p.get("externalUrl", ""),
-            "is_business_account": p.get("isBusinessAccount", False),
-            "business_category": p.get("businessCategoryName", ""),
-            "is_verified": p.get("verified", False),
-            "scraped_at": datetime.now(timezone.utc).isoformat(),
-        }
-
-        # Try to detect Poland-based
-        bio_lower = bio
-        location_text = (p.get("locationName") or "").lower()
-        full_name_lower = (p.get("fullName") or "").lower()
-        combined = f"{bio_lower} {location_text} {full_name_lower}"
-        is_poland = any(indicator in combined for indicator in POLAND_INDICATORS)
-        lead["likely_us"] = is_poland  # Reusing column, now means "likely_poland"
-
-        # Score the lead (simple heuristic)
-        score = 0
-        if p.get("isBusinessAccount"):
-            score += 2
-        if p.get("externalUrl"):
-            score += 2
-        if any(term in bio for term in ["online", "treningi online", "coaching online"]):
-            score += 2
-        if any(term in bio for term in ["1:1", "1-on-1", "zapisy", "napisz", "dm me", "clients", "klienci"]):
-            score += 2
-        if 2000 <= followers <= 30000:
-            score += 1  # Sweet spot for Polish market
-        if is_poland:
-            score += 1
-        lead["score"] = score
-
-        qualified.append(lead)
+        qualified.append(build_lead(p, hits))
 
     # Print rejection summary
     print(f"\n  Rejection breakdown:")
@@ -432,108 +641,214 @@ def filter_profiles(profiles, min_followers=1000, max_followers=50000):
 
 
 # --- AI QUALIFICATION ---
-def qualify_with_ai(leads, api_key_anthropic):
-    """Use Claude Sonnet 4.6 to verify each lead is a real Polish fitness coach."""
-    print(f"\n{'='*60}")
-    print(f"STEP 3b: AI qualification - verifying {len(leads)} leads with Claude Sonnet 4.6")
-    print(f"{'='*60}")
+ANTHROPIC_API_URL = "https://api.anthropic.com/v1/messages"
+AI_MODEL = "claude-sonnet-4-6"
+AI_CONCURRENCY = 8              # qualification requests in flight at once
+AI_TIMEOUT_SECS = 30
+AI_MAX_RETRIES = 5              # on 429 rate limit / 529 overloaded
+AI_RETRY_STATUSES = (429, 529)
+AI_MAX_RETRY_AFTER_SECS = 60
 
-    if not api_key_anthropic:
-        print("  [WARN] ANTHROPIC_API_KEY not found, skipping AI qualification")
-        return leads
 
-    qualified = []
-    rejected = 0
+POLISH_QUESTION = """Question 1: Is this person POLISH (from Poland)?
+IMPORTANT: Czech, Slovak, Croatian, Serbian and other Slavic languages are NOT Polish.
+- Czech uses: ř, ů, ě, ž, š, č - words like "jóga", "běh", "trenérka", "pohyb", "učitelka"
+- Slovak uses: ľ, ŕ, ĺ, ô - words like "tréner"
+- Polish uses: ą, ę, ó, ś, ł, ż, ź, ć, ń - words like "trener", "treningi", "dietetyk", "sylwetka"
+Look at the LANGUAGE of the bio text, not just the characters. If the bio is in Czech, Slovak, or any other non-Polish language, answer false."""
+
+COACH_QUESTION = """Is this person an actual FITNESS COACH or PERSONAL TRAINER who works with individual clients?
+- YES if: personal trainer, fitness coach, online coach, nutrition coach/dietitian who coaches people, transformation coach
+- NO if: health blog, gym chain, fitness influencer who doesn't coach, supplement brand, yoga studio (not individual coach), photographer, business coach, life coach, generic wellness page, motivational page"""
 
-    for i, lead in enumerate(leads):
-        bio = lead.get("bio", "")
-        name = lead.get("full_name", "")
-        handle = lead.get("instagram_handle", "")
-        biz_cat = lead.get("business_category", "")
-        followers = lead.get("follower_count", 0)
 
-        prompt = f"""You are a lead qualification assistant. Analyze this Instagram profile and answer TWO questions.
+def build_qualification_prompt(lead, ask_language=True):
+    """Prompt for Claude's verdict. With `ask_language=False` (the bio was
+    already recognised as Polish locally) only the coach question is asked."""
+    bio = lead.get("bio", "")
+    name = lead.get("full_name", "")
+    handle = lead.get("instagram_handle", "")
+    biz_cat = lead.get("business_category", "")
+    followers = lead.get("follower_count", 0)
 
-Profile:
+    profile = f"""Profile:
 - Handle: @{handle}
 - Name: {name}
 - Bio: {bio}
 - Business category: {biz_cat}
-- Followers: {followers}
+- Followers: {followers}"""
 
-Question 1: Is this person POLISH (from Poland)?
-IMPORTANT: Czech, Slovak, Croatian, Serbian and other Slavic languages are NOT Polish.
-- Czech uses: ř, ů, ě, ž, š, č - words like "jóga", "běh", "trenérka", "pohyb", "učitelka"
-- Slovak uses: ľ, ŕ, ĺ, ô - words like "tréner"
-- Polish uses: ą, ę, ó, ś, ł, ż, ź, ć, ń - words like "trener", "treningi", "dietetyk", "sylwetka"
-Look at the LANGUAGE of the bio text, not just the characters. If the bio is in Czech, Slovak, or any other non-Polish language, answer false.
+    if not ask_language:
+        return f"""You are a lead qualification assistant. Analyze this Instagram profile and answer ONE question.
 
-Question 2: Is this person an actual FITNESS COACH or PERSONAL TRAINER who works with individual clients?
-- YES if: personal trainer, fitness coach, online coach, nutrition coach/dietitian who coaches people, transformation coach
-- NO if: health blog, gym chain, fitness influencer who doesn't coach, supplement brand, yoga studio (not individual coach), photographer, business coach, life coach, generic wellness page, motivational page
+{profile}
+
+Question: {COACH_QUESTION}
+
+Respond ONLY with this exact JSON format, nothing else:
+{{"is_fitness_coach": true/false, "reason": "one sentence explanation"}}"""
+
+    return f"""You are a lead qualification assistant. Analyze this Instagram profile and answer TWO questions.
+
+{profile}
+
+{POLISH_QUESTION}
+
+Question 2: {COACH_QUESTION}
 
 Respond ONLY with this exact JSON format, nothing else:
 {{"is_polish": true/false, "is_fitness_coach": true/false, "reason": "one sentence explanation"}}"""
 
-        body = json.dumps({
-            "model": "claude-sonnet-4-6",
-            "max_tokens": 200,
-            "messages": [{"role": "user", "content": prompt}],
-        }).encode("utf-8")
-
-        req = urllib.request.Request(
-            "https://api.anthropic.com/v1/messages",
-            data=body,
-            headers={
-                "Content-Type": "application/json",
-                "x-api-key": api_key_anthropic,
-                "anthropic-version": "2023-06-01",
-            },
-            method="POST",
-        )
 
-        try:
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                result = json.loads(resp.read().decode("utf-8"))
-                content = (result.get("content", [{}])[0].get("text", "")).strip()
+def retry_after_secs(resp, attempt):
+    """Seconds to wait before retrying: the server's retry-after if it sent one."""
+    try:
+        return min(AI_MAX_RETRY_AFTER_SECS, max(0.0, float(resp.headers.get("retry-after", ""))))
+    except ValueError:
+        return backoff_delay(attempt)
+
+
+async def ask_claude(session, semaphore, prompt):
+    """Send one qualification prompt. Returns the response text ("" if empty);
+    raises on errors that survive the retries."""
+    body = {
+        "model": AI_MODEL,
+        "max_tokens": 200,
+        "messages": [{"role": "user", "content": prompt}],
+    }
+    async with semaphore:
+        for attempt in range(AI_MAX_RETRIES + 1):
+            async with session.post(
+                ANTHROPIC_API_URL, json=body,
+                timeout=aiohttp.ClientTimeout(total=AI_TIMEOUT_SECS),
+            ) as resp:
+                if resp.status in AI_RETRY_STATUSES and attempt < AI_MAX_RETRIES:
+                    delay = retry_after_secs(resp, attempt)
+                else:
+                    if resp.status >= 400:
+                        raise RuntimeError(f"HTTP Error {resp.status}: {(await resp.text())[:200]}")
+                    result = await resp.json(content_type=None)
+                    return (result.get("content", [{}])[0].get("text", "")).strip()
+            await asyncio.sleep(delay)
 
-                if not content:
-                    print(f"  {i+1}/{len(leads)} @{handle}: [EMPTY RESPONSE] - rejecting (unverified)")
-                    rejected += 1
-                    continue
 
-                # Strip markdown code blocks if present
-                if content.startswith("```"):
-                    content = content.split("\n", 1)[1] if "\n" in content else content
-                    content = content.rsplit("```", 1)[0].strip()
+async def judge_lead(session, semaphore, lead, known_polish=False):
+    """("ok", verdict) / ("empty", None) / ("error", message) for one lead.
+    With `known_polish` Claude is only asked the coach question."""
+    try:
+        content = await ask_claude(session, semaphore, build_qualification_prompt(lead, not known_polish))
+        if not content:
+            return "empty", None
+
+        # Strip markdown code blocks if present
+        if content.startswith("```"):
+            content = content.split("\n", 1)[1] if "\n" in content else content
+            content = content.rsplit("```", 1)[0].strip()
+
+        verdict = json.loads(content)
+        if known_polish:
+            verdict["is_polish"] = True
+        return "ok", verdict
+    except Exception as e:
+        return "error", str(e) or repr(e)
 
-                parsed = json.loads(content)
-                is_polish = parsed.get("is_polish", False)
-                is_coach = parsed.get("is_fitness_coach", False)
-                reason = parsed.get("reason", "")
 
-                status = "PASS" if (is_polish and is_coach) else "REJECT"
-                tag = ""
-                if not is_polish:
-                    tag += " [NOT POLISH]"
-                if not is_coach:
-                    tag += " [NOT COACH]"
+async def qualify_with_ai(leads, api_key_anthropic, concurrency=AI_CONCURRENCY, cache=None,
+                          language_check=True):
+    """Use Claude Sonnet 4.6 to verify each lead is a real Polish fitness coach.
 
-                print(f"  {i+1}/{len(leads)} @{handle}: {status}{tag} - {reason}")
+    Up to `concurrency` leads are judged at once over one pooled session;
+    results are reported and returned in the input order. With a
+    verdict_cache.VerdictCache, profiles judged before (same bio, name and
+    category) reuse the stored verdict and new verdicts are added to it.
 
-                if is_polish and is_coach:
-                    qualified.append(lead)
-                else:
-                    rejected += 1
+    With `language_check`, bios polish_language.classify() is sure about skip
+    the language question: clearly Czech/Slovak ones are rejected without an
+    API call, clearly Polish ones are only asked whether they coach."""
+    print(f"\n{'='*60}")
+    print(f"STEP 3b: AI qualification - verifying {len(leads)} leads with Claude Sonnet 4.6")
+    print(f"{'='*60}")
 
-        except Exception as e:
-            print(f"  {i+1}/{len(leads)} @{handle}: [ERROR] {e} - rejecting (unverified)")
-            rejected += 1
+    if not api_key_anthropic:
+        print("  [WARN] ANTHROPIC_API_KEY not found, skipping AI qualification")
+        return leads
 
-        # Small delay to avoid rate limits
-        if i < len(leads) - 1:
-            time.sleep(0.2)
+    qualified = []
+    rejected = 0
 
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    headers = {
+        "Content-Type": "application/json",
+        "x-api-key": api_key_anthropic,
+        "anthropic-version": "2023-06-01",
+    }
+    cached = [cache.get(lead) if cache else None for lead in leads]
+    from_cache = sum(1 for verdict in cached if verdict)
+    if cache:
+        print(f"  {from_cache} verdicts reused from cache, {len(leads) - from_cache} profiles to ask about")
+
+    languages = [
+        classify_language(lead.get("bio")) if language_check and not verdict else (AMBIGUOUS, "")
+        for lead, verdict in zip(leads, cached)
+    ]
+    if language_check:
+        counts = Counter(label for (label, _), verdict in zip(languages, cached) if not verdict)
+        print(f"  Local language check: {counts[POLISH]} Polish (coach question only), "
+              f"{counts[NOT_POLISH]} not Polish (no API call), {counts[AMBIGUOUS]} left to Claude")
+
+    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+        tasks = [
+            None if verdict or label == NOT_POLISH
+            else asyncio.create_task(judge_lead(session, semaphore, lead, known_polish=label == POLISH))
+            for lead, verdict, (label, _) in zip(leads, cached, languages)
+        ]
+
+        # Report in input order as soon as each prefix of the list is done
+        for i, (lead, task) in enumerate(zip(leads, tasks)):
+            if task is None and not cached[i]:
+                outcome, verdict = "local", languages[i][1]
+            elif task is None:
+                outcome, verdict = "ok", cached[i]
+            else:
+                outcome, verdict = await task
+                if outcome == "ok" and cache:
+                    cache.put(lead, verdict)
+            handle = lead.get("instagram_handle", "")
+
+            if outcome == "empty":
+                print(f"  {i+1}/{len(leads)} @{handle}: [EMPTY RESPONSE] - rejecting (unverified)")
+                rejected += 1
+                continue
+            if outcome == "error":
+                print(f"  {i+1}/{len(leads)} @{handle}: [ERROR] {verdict} - rejecting (unverified)")
+                rejected += 1
+                continue
+            if outcome == "local":
+                print(f"  {i+1}/{len(leads)} @{handle}: REJECT [NOT POLISH] - {verdict} (local check)")
+                rejected += 1
+                continue
+
+            is_polish = verdict.get("is_polish", False)
+            is_coach = verdict.get("is_fitness_coach", False)
+            reason = verdict.get("reason", "")
+
+            status = "PASS" if (is_polish and is_coach) else "REJECT"
+            tag = ""
+            if not is_polish:
+                tag += " [NOT POLISH]"
+            if not is_coach:
+                tag += " [NOT COACH]"
+
+            print(f"  {i+1}/{len(leads)} @{handle}: {status}{tag} - {reason}")
+
+            if is_polish and is_coach:
+                qualified.append(lead)
+            else:
+                rejected += 1
+
+    if cache:
+        cache.save()
     print(f"\n  AI qualification: {len(qualified)} passed, {rejected} rejected")
     return qualified
 
@@ -562,13 +877,13 @@ def save_to_csv(leads, output_path):
 
 # --- OUTPUT: SUPABASE ---
 def push_to_supabase(leads, env):
-    """Push leads to Supabase instagram_leads table."""
+    """Push leads to Supabase instagram_leads table. Returns True if every batch was stored."""
     url = env.get("SUPABASE_URL")
     key = env.get("SUPABASE_KEY")
 
     if not url or not key:
         print("  [ERROR] SUPABASE_URL and SUPABASE_KEY required in .env")
-        return
+        return False
 
     print(f"\n  Pushing {len(leads)} leads to Supabase (instagram_leads table)")
     print(f"  NOTE: You need to create the table first. Run this SQL in Supabase:")
@@ -633,21 +948,196 @@ def push_to_supabase(leads, env):
             print(f"  [ERROR] Batch {i // batch_size + 1}: {e}")
 
     print(f"  Results: {success} inserted, {dupes} duplicates skipped, {errors} errors")
+    return errors == 0
+
+
+# --- METRIC REFRESH ---
+# Columns a refresh may overwrite; outreach fields (status, dm_draft, notes, ...) are never sent
+METRIC_COLUMNS = [
+    "full_name", "bio", "follower_count", "following_count", "post_count", "website",
+    "is_business_account", "business_category", "is_verified", "likely_us", "score",
+]
+REFRESH_BATCH_SIZE = 200
+
+
+def time_cutoff_iso(days):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def fetch_stale_handles(url, key, older_than_days):
+    """Handles in instagram_leads last scraped more than `older_than_days` ago (or never)."""
+    cutoff = time_cutoff_iso(older_than_days)
+    handles = []
+    last_id = 0
+    sb = get_client(url, key)
+    while True:
+        rows = sb.get(f"instagram_leads?select=id,instagram_handle,scraped_at"
+                      f"&or=(scraped_at.is.null,scraped_at.lt.{cutoff})"
+                      f"&id=gt.{last_id}&order=id.asc&limit=1000")
+        handles.extend(row["instagram_handle"] for row in rows if row.get("instagram_handle"))
+        if len(rows) < 1000:
+            return handles
+        last_id = rows[-1]["id"]
+
+
+def refresh_metrics(leads, env, snapshot):
+    """Upsert the metric columns of existing instagram_leads rows, sending only rows
+    whose values changed since the last refresh (metric_snapshot.MetricSnapshot)."""
+    sb = get_client(env.get("SUPABASE_URL"), env.get("SUPABASE_KEY"))
+    rows = [{col: lead[col] for col in ["instagram_handle"] + METRIC_COLUMNS + ["scraped_at"]}
+            for lead in leads]
+    changed = snapshot.changed(rows)
+    print(f"\n  {len(changed)} of {len(rows)} profiles changed since the last refresh - "
+          f"updating those in batches of {REFRESH_BATCH_SIZE}")
+
+    updated = 0
+    errors = 0
+    for i in range(0, len(changed), REFRESH_BATCH_SIZE):
+        batch = changed[i:i + REFRESH_BATCH_SIZE]
+        try:
+            # Only the columns in the payload are overwritten on conflict
+            sb.post("instagram_leads?on_conflict=instagram_handle", batch,
+                    prefer="return=minimal,resolution=merge-duplicates")
+            updated += len(batch)
+            snapshot.record(batch)
+        except Exception as e:
+            errors += len(batch)
+            print(f"  [ERROR] Batch {i // REFRESH_BATCH_SIZE + 1}: {e}")
+    snapshot.save()
+
+    print(f"  Results: {updated} updated, {len(rows) - len(changed)} unchanged (not sent), {errors} errors")
+
+
+async def refresh_existing_leads(api_key, env, older_than_days, max_parallel, reuse_ttl_hours, dry_run):
+    """--mode refresh: re-scrape instagram_leads rows older than `older_than_days`
+    and write back the metric columns that changed."""
+    if not env.get("SUPABASE_URL") or not env.get("SUPABASE_KEY"):
+        print("Error: --mode refresh needs SUPABASE_URL and SUPABASE_KEY in .env")
+        sys.exit(1)
+
+    handles = fetch_stale_handles(env["SUPABASE_URL"], env["SUPABASE_KEY"], older_than_days)
+    # Unchanged rows keep their old scraped_at; the local index knows they were re-scraped
+    username_index = UsernameIndex()
+    handles, recent = username_index.split(handles, older_than_days)
+    print(f"\n  {len(handles)} instagram_leads rows last scraped over {older_than_days:g} days ago "
+          f"({len(recent)} more already re-scraped within that window)")
+    if dry_run:
+        print(f"  Estimated profile scraping cost: ${len(handles) * COST_PER_PROFILE:.2f}")
+        print(f"\n  Run without --dry-run to execute.")
+        return
+    if not handles:
+        print("\nNothing to refresh. Exiting.")
+        return
+
+    async with ApifyClient(api_key, run_registry=RunRegistry(ttl_hours=reuse_ttl_hours)) as apify:
+        profiles = await scrape_profiles(apify, handles, max_parallel)
+    username_index.mark_scraped(p.get("username") for p in profiles)
+
+    # Profiles that went private / were renamed come back without a username
+    leads = [build_lead(p) for p in profiles if p.get("username")]
+    refresh_metrics(leads, env, MetricSnapshot(METRIC_COLUMNS))
+
+
+# --- RELATED-PROFILE DISCOVERY ---
+DEFAULT_GRAPH_BUDGET = 2.0   # USD of profile scraping per --mode graph run, seeds included
+DEFAULT_GRAPH_DEPTH = 2      # hops from the seed leads
+DEFAULT_GRAPH_SEEDS = 50     # best-scored existing leads to start from
+GRAPH_WAVE_SIZE = 100        # candidates scraped per wave before the frontier is re-ranked
+
+
+def fetch_seed_leads(url, key, limit):
+    """Best-scored instagram_leads rows that are not marked dead: [{instagram_handle, score}]."""
+    return get_client(url, key).get(f"instagram_leads?select=instagram_handle,score"
+                                    f"&status=neq.dead&order=score.desc&limit={limit}")
+
+
+async def discover_related_profiles(api_key, env, budget_usd, max_depth, num_seeds, max_parallel, reuse_ttl_hours, min_followers, max_followers):
+    """--mode graph: walk Instagram's related profiles outward from existing leads.
+
+    Seeds are scraped first; the related profiles of every profile that passes
+    `rejection_reason` go into a ProfileFrontier, and the best candidates are
+    scraped in waves until `budget_usd` is spent, the frontier is empty or
+    `max_depth` is reached. Returns every scraped candidate profile (not the
+    seeds) for the usual filtering / AI qualification."""
+    print(f"\n{'='*60}")
+    print(f"STEP 1: Related-profile discovery (budget ${budget_usd:.2f}, depth {max_depth})")
+    print(f"{'='*60}")
+
+    url, key = env.get("SUPABASE_URL"), env.get("SUPABASE_KEY")
+    if not url or not key:
+        print("Error: --mode graph needs SUPABASE_URL and SUPABASE_KEY in .env")
+        sys.exit(1)
+
+    seeds = fetch_seed_leads(url, key, num_seeds)
+    seed_scores = {row["instagram_handle"].lower(): row.get("score") or 0 for row in seeds}
+    # Existing leads and every profile scraped before are never candidates
+    username_index = UsernameIndex()
+    try:
+        username_index.sync(url, key)
+    except Exception as e:
+        print(f"  [WARN] Could not sync username index from Supabase: {e}")
+    skip = set(seed_scores) | set(username_index.handles)
+    frontier = ProfileFrontier(BIO_MATCHER, max_depth, skip=skip)
+    print(f"  {len(seeds)} seed leads, {len(skip)} handles excluded as known")
+
+    max_profiles = int(budget_usd / COST_PER_PROFILE)
+    seed_handles = list(seed_scores)[:max_profiles]
+    found = []
+    passed = 0
+
+    async with ApifyClient(api_key, run_registry=RunRegistry(ttl_hours=reuse_ttl_hours)) as apify:
+        seed_profiles = await scrape_profiles(apify, seed_handles, max_parallel)
+        scraped = len(seed_profiles)
+        for p in seed_profiles:
+            handle = (p.get("username") or "").lower()
+            frontier.add_related({"instagram_handle": handle, "score": seed_scores.get(handle, 0)},
+                                 p.get("relatedProfiles"), depth=1)
+        print(f"\n  Seeds: {len(seed_profiles)} scraped, {len(frontier)} related candidates queued")
+
+        wave = 0
+        while len(frontier) and scraped < max_profiles:
+            batch = frontier.pop(min(GRAPH_WAVE_SIZE, max_profiles - scraped))
+            if not batch:
+                break
+            wave += 1
+            depth_of = dict(batch)
+            profiles = await scrape_profiles(apify, [handle for handle, _ in batch], max_parallel)
+            scraped += len(profiles)
+            username_index.mark_scraped(p.get("username") for p in profiles)
+
+            wave_passed = 0
+            for p in profiles:
+                found.append(p)
+                reason, hits = rejection_reason(p, min_followers, max_followers)
+                if reason:
+                    continue
+                wave_passed += 1
+                handle = (p.get("username") or "").lower()
+                frontier.add_related(build_lead(p, hits), p.get("relatedProfiles"),
+                                     depth=depth_of.get(handle, max_depth) + 1)
+            passed += wave_passed
+            print(f"\n  Wave {wave}: {len(profiles)} scraped, {wave_passed} pass filters, "
+                  f"{len(frontier)} candidates queued, ${scraped * COST_PER_PROFILE:.2f} of "
+                  f"${budget_usd:.2f} spent")
+
+    spent = scraped * COST_PER_PROFILE
+    print(f"\n  Related-profile discovery: {len(found)} new profiles, {passed} pass filters "
+          f"({passed / spent if spent else 0:.0f} per $ before AI qualification)")
+    return found
 
 
 # --- COST ESTIMATION ---
-def estimate_cost(mode, limit_per_source, num_usernames):
-    """Estimate Apify credit cost for a run."""
+def estimate_cost(mode, limit_per_source, num_usernames, hashtag_limits=None):
+    """Estimate Apify credit cost for a run. `hashtag_limits` ({hashtag: resultsLimit})
+    defaults to every hashtag at `limit_per_source`."""
     hashtag_cost = 0
     search_cost = 0
     profile_cost = 0
 
     if mode in ("hashtag", "both"):
         # ~$0.0004 per item after 60 free per hashtag
-        total_items = len(HASHTAGS) * limit_per_source
-        free_items = len(HASHTAGS) * 60
-        paid_items = max(0, total_items - free_items)
-        hashtag_cost = paid_items * 0.0004
+        hashtag_limits = hashtag_limits or {h: limit_per_source for h in HASHTAGS}
+        hashtag_cost = sum(hashtag_search_cost(n) for n in hashtag_limits.values())
 
     if mode in ("search", "both"):
         search_cost = len(SEARCH_KEYWORDS) * limit_per_source * 0.0026
@@ -665,7 +1155,7 @@ def estimate_cost(mode, limit_per_source, num_usernames):
 
 
 # --- MAIN ---
-def main():
+async def main_async():
     # Parse args
     args = sys.argv[1:]
     mode = "hashtag"
@@ -674,6 +1164,17 @@ def main():
     dry_run = False
     min_followers = 1000
     max_followers = 50000
+    reuse_ttl_hours = DEFAULT_TTL_HOURS
+    max_parallel = 4
+    ai_concurrency = AI_CONCURRENCY
+    no_ai_cache = False
+    no_language_check = False
+    graph_budget = DEFAULT_GRAPH_BUDGET
+    graph_depth = DEFAULT_GRAPH_DEPTH
+    graph_seeds = DEFAULT_GRAPH_SEEDS
+    min_hashtag_yield = DEFAULT_MIN_YIELD
+    full_scan = False
+    fresh_days = DEFAULT_FRESH_DAYS
 
     i = 0
     while i < len(args):
@@ -692,6 +1193,39 @@ def main():
         elif args[i] == "--max-followers" and i + 1 < len(args):
             max_followers = int(args[i + 1])
             i += 2
+        elif args[i] == "--reuse-ttl" and i + 1 < len(args):
+            reuse_ttl_hours = float(args[i + 1])
+            i += 2
+        elif args[i] == "--min-hashtag-yield" and i + 1 < len(args):
+            min_hashtag_yield = float(args[i + 1])
+            i += 2
+        elif args[i] == "--fresh-days" and i + 1 < len(args):
+            fresh_days = float(args[i + 1])
+            i += 2
+        elif args[i] == "--full-scan":
+            full_scan = True
+            i += 1
+        elif args[i] == "--parallel" and i + 1 < len(args):
+            max_parallel = max(1, int(args[i + 1]))
+            i += 2
+        elif args[i] == "--ai-concurrency" and i + 1 < len(args):
+            ai_concurrency = max(1, int(args[i + 1]))
+            i += 2
+        elif args[i] == "--no-ai-cache":
+            no_ai_cache = True
+            i += 1
+        elif args[i] == "--no-language-check":
+            no_language_check = True
+            i += 1
+        elif args[i] == "--budget" and i + 1 < len(args):
+            graph_budget = float(args[i + 1])
+            i += 2
+        elif args[i] == "--graph-depth" and i + 1 < len(args):
+            graph_depth = max(1, int(args[i + 1]))
+            i += 2
+        elif args[i] == "--graph-seeds" and i + 1 < len(args):
+            graph_seeds = max(1, int(args[i + 1]))
+            i += 2
         elif args[i] == "--dry-run":
             dry_run = True
             i += 1
@@ -699,8 +1233,8 @@ def main():
             print(f"Unknown argument: {args[i]}")
             i += 1
 
-    if mode not in ("hashtag", "search", "both"):
-        print("Error: --mode must be 'hashtag', 'search', or 'both'")
+    if mode not in ("hashtag", "search", "both", "refresh", "graph"):
+        print("Error: --mode must be 'hashtag', 'search', 'both', 'refresh', or 'graph'")
         sys.exit(1)
 
     if output not in ("csv", "supabase", "both"):
@@ -723,16 +1257,32 @@ def main():
     print(f"  Follower range: {min_followers:,} - {max_followers:,}")
     print(f"  Dry run: {dry_run}")
 
+    if mode == "refresh":
+        await refresh_existing_leads(api_key, env, fresh_days, max_parallel, reuse_ttl_hours, dry_run)
+        return
+
+    hashtag_model = HashtagYieldModel()
+    hashtag_limits = {}
+    if mode in ("hashtag", "both"):
+        hashtag_limits, skipped_hashtags = hashtag_model.plan(HASHTAGS, limit, min_hashtag_yield)
+        reduced = sum(1 for n in hashtag_limits.values() if n < limit)
+        print(f"  Hashtags: {len(hashtag_limits)} searched ({reduced} with a reduced limit), "
+              f"{len(skipped_hashtags)} skipped")
+        for hashtag, reason in skipped_hashtags.items():
+            print(f"    skip #{hashtag}: {reason}")
+
     if dry_run:
         # Estimate what would happen
         estimated_usernames = 0
         if mode in ("hashtag", "both"):
-            estimated_usernames += len(HASHTAGS) * limit * 0.3  # ~30% unique
+            estimated_usernames += sum(hashtag_limits.values()) * 0.3  # ~30% unique
         if mode in ("search", "both"):
             estimated_usernames += len(SEARCH_KEYWORDS) * limit * 0.5
+        if mode == "graph":
+            estimated_usernames += graph_budget / COST_PER_PROFILE
         estimated_usernames = int(estimated_usernames)
 
-        costs = estimate_cost(mode, limit, estimated_usernames)
+        costs = estimate_cost(mode, limit, estimated_usernames, hashtag_limits)
         print(f"\n  Estimated unique usernames: ~{estimated_usernames}")
         print(f"  Estimated cost breakdown:")
         print(f"    Hashtag search: ${costs['hashtag_cost']}")
@@ -742,21 +1292,51 @@ def main():
         print(f"\n  Run without --dry-run to execute.")
         return
 
-    # Step 1: Find usernames
-    usernames = set()
-    if mode in ("hashtag", "both"):
-        usernames.update(search_hashtags(api_key, limit))
-    if mode in ("search", "both"):
-        usernames.update(search_keywords(api_key, limit))
-
-    if not usernames:
-        print("\nNo usernames found. Exiting.")
-        return
-
-    print(f"\nTotal unique usernames: {len(usernames)}")
-
-    # Step 2: Scrape profiles
-    profiles = scrape_profiles(api_key, usernames)
+    if mode == "graph":
+        profiles = await discover_related_profiles(
+            api_key, env, graph_budget, graph_depth, graph_seeds, max_parallel,
+            reuse_ttl_hours, min_followers, max_followers,
+        )
+        usernames = {p.get("username") for p in profiles}
+        known, to_scrape, per_hashtag, hashtag_marks = set(), usernames, {}, {}
+    else:
+        async with ApifyClient(api_key, run_registry=RunRegistry(ttl_hours=reuse_ttl_hours)) as apify:
+            # Step 1: Find usernames
+            usernames = set()
+            per_hashtag = {}
+            hashtag_marks = {}
+            if mode in ("hashtag", "both"):
+                hashtag_usernames, per_hashtag, hashtag_marks = await search_hashtags(
+                    apify, hashtag_limits, max_parallel, incremental=not full_scan)
+                usernames.update(hashtag_usernames)
+            if mode in ("search", "both"):
+                usernames.update(await search_keywords(apify, limit))
+
+            if not usernames:
+                print("\nNo usernames found. Exiting.")
+                return
+
+            print(f"\nTotal unique usernames: {len(usernames)}")
+
+            # Step 1c: Don't pay to scrape handles we already have or scraped recently
+            username_index = UsernameIndex()
+            if env.get("SUPABASE_URL") and env.get("SUPABASE_KEY"):
+                try:
+                    synced = username_index.sync(env["SUPABASE_URL"], env["SUPABASE_KEY"])
+                    print(f"  Username index: {synced} new rows synced from instagram_leads")
+                except Exception as e:
+                    print(f"  [WARN] Could not sync username index from Supabase: {e}")
+            to_scrape, known = username_index.split(usernames, fresh_days)
+            print(f"  Skipping {len(known)} usernames already known / scraped in the last {fresh_days:g} days")
+
+            if not to_scrape:
+                save_hashtag_marks(hashtag_marks)
+                print("\nNo new usernames to scrape. Exiting.")
+                return
+
+            # Step 2: Scrape profiles
+            profiles = await scrape_profiles(apify, to_scrape, max_parallel)
+            username_index.mark_scraped(p.get("username") for p in profiles)
 
     if not profiles:
         print("\nNo profiles scraped. Exiting.")
@@ -764,16 +1344,23 @@ def main():
 
     # Step 3: Filter
     leads = filter_profiles(profiles, min_followers, max_followers)
+    if per_hashtag:
+        record_hashtag_yields(hashtag_model, per_hashtag, leads, to_scrape)
 
     if not leads:
+        # These posts were processed - nothing in them qualifies, so don't fetch them again
+        save_hashtag_marks(hashtag_marks)
         print("\nNo leads passed filtering. Try adjusting criteria.")
         return
 
     # Step 3b: AI qualification (Claude Sonnet 4.6)
     anthropic_key = env.get("ANTHROPIC_API_KEY")
-    leads = qualify_with_ai(leads, anthropic_key)
+    verdict_cache = None if no_ai_cache else VerdictCache(AI_MODEL)
+    leads = await qualify_with_ai(leads, anthropic_key, ai_concurrency, verdict_cache,
+                                  language_check=not no_language_check)
 
     if not leads:
+        save_hashtag_marks(hashtag_marks)
         print("\nNo leads passed AI qualification. Try adjusting criteria.")
         return
 
@@ -804,8 +1391,13 @@ def main():
         csv_path = os.path.join(tmp_dir, f"instagram_leads_{timestamp}.csv")
         save_to_csv(leads, csv_path)
 
+    stored = True
     if output in ("supabase", "both"):
-        push_to_supabase(leads, env)
+        stored = push_to_supabase(leads, env)
+    if stored:
+        save_hashtag_marks(hashtag_marks)
+    elif hashtag_marks:
+        print("  [WARN] Hashtag marks not moved - the next run fetches these posts again")
 
     # Summary
     pl_leads = sum(1 for l in leads if l["likely_us"])
@@ -817,6 +1409,7 @@ def main():
     print(f"SUMMARY")
     print(f"{'='*60}")
     print(f"  Profiles found: {len(usernames)}")
+    print(f"  Skipped (known): {len(known)}")
     print(f"  Profiles scraped: {len(profiles)}")
     print(f"  Qualified leads: {len(leads)}")
     print(f"  Likely Poland-based: {pl_leads}")
@@ -831,4 +1424,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main_async())
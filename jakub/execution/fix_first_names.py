@@ -20,12 +20,10 @@ Requires .env with:
 
 import sys
 import os
-import json
 import re
 import asyncio
-import aiohttp
-import urllib.request
-import urllib.error
+
+from supabase_api import AsyncSupabaseClient, get_client
 
 # Common email prefixes that are NOT first names
 GENERIC_PREFIXES = {
@@ -147,17 +145,10 @@ def load_env(env_path=".env"):
     return env
 
 
-async def supabase_update_async(session, url, key, lead_id, data):
-    full_url = f"{url}/rest/v1/leads?id=eq.{lead_id}"
-    headers = {
-        "apikey": key,
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal",
-    }
+async def supabase_update_async(sb, lead_id, data):
     try:
-        async with session.patch(full_url, headers=headers, json=data) as resp:
-            return resp.status in (200, 204)
+        await sb.patch(f"leads?id=eq.{lead_id}", data)
+        return True
     except Exception:
         return False
 
@@ -167,16 +158,13 @@ FALLBACK_NAME = "Hey"  # Last resort if no last name either
 
 def fetch_all_leads(sb_url, sb_key, filter_query):
     """Paginate through ALL matching leads (Supabase caps at 1000 per request)."""
-    headers = {"apikey": sb_key, "Authorization": f"Bearer {sb_key}"}
+    sb = get_client(sb_url, sb_key)
     select = "id,email,first_name,last_name,company_name"
     all_leads = []
     offset = 0
     page_size = 1000
     while True:
-        url = f"{sb_url}/rest/v1/leads?{filter_query}&select={select}&limit={page_size}&offset={offset}&order=id.asc"
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req) as resp:
-            batch = json.loads(resp.read())
+        batch = sb.get(f"leads?{filter_query}&select={select}&limit={page_size}&offset={offset}&order=id.asc")
         if not batch:
             break
         all_leads.extend(batch)
@@ -263,11 +251,11 @@ async def main_async():
     fixed = 0
     failed = 0
 
-    async with aiohttp.ClientSession() as session:
+    async with AsyncSupabaseClient(sb_url, sb_key) as sb:
         async def update_one(lead_id, email, first_name):
             nonlocal fixed, failed
             async with semaphore:
-                ok = await supabase_update_async(session, sb_url, sb_key, lead_id, {"first_name": first_name})
+                ok = await supabase_update_async(sb, lead_id, {"first_name": first_name})
                 if ok:
                     fixed += 1
                 else:
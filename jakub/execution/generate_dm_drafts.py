@@ -2,7 +2,9 @@
 generate_dm_drafts.py - Generate personalized Instagram DM drafts for engaged leads.
 
 Usage:
-    python3 jakub/execution/generate_dm_drafts.py [--limit 20] [--dry-run] [--regenerate]
+    python3 jakub/execution/generate_dm_drafts.py [--limit 20] [--dry-run] [--regenerate] [--local]
+
+    --local  select engaged leads from the local SQLite mirror (see local_mirror.py)
 
 Fetches leads from Supabase where status=engaged, engaged before today, dm_draft is NULL,
 generates a personalized DM using OpenAI, and writes it back to Supabase.
@@ -21,6 +23,10 @@ import asyncio
 import aiohttp
 from datetime import datetime, timezone, timedelta
 
+from local_mirror import LocalMirror
+from supabase_api import AsyncSupabaseClient
+from upsert_buffer import UpsertBuffer
+
 
 # --- ENV ---
 def load_env(env_path=".env"):
@@ -46,22 +52,6 @@ async def supabase_get(session, url, key, endpoint):
         return []
 
 
-async def supabase_update(session, url, key, table, match_col, match_val, data):
-    full_url = f"{url}/rest/v1/{table}?{match_col}=eq.{match_val}"
-    headers = {
-        "apikey": key,
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal",
-    }
-    async with session.patch(full_url, headers=headers, json=data) as resp:
-        if resp.status in (200, 204):
-            return True
-        error_body = await resp.text()
-        print(f"  Update error: {resp.status} - {error_body[:200]}")
-        return False
-
-
 # --- SYSTEM PROMPT ---
 SYSTEM_PROMPT = """You write personalized Instagram DMs in POLISH for FitCore outreach to Polish fitness coaches.
 
@@ -150,7 +140,7 @@ Pick the style (A/B/C/D) that works best given the data available. If bio is ric
 Remember: just the DM text, nothing else."""
 
 
-async def generate_dm(session, semaphore, i, total, lead, anthropic_key, sb_url, sb_key, results):
+async def generate_dm(session, semaphore, i, total, lead, anthropic_key, writes, results):
     """Generate a DM draft for a single lead using Claude Sonnet 4.6."""
     async with semaphore:
         handle = lead.get("instagram_handle", "unknown")
@@ -195,18 +185,11 @@ async def generate_dm(session, semaphore, i, total, lead, anthropic_key, sb_url,
             results["errors"] += 1
             return
 
-        # Write back to Supabase
-        success = await supabase_update(
-            session, sb_url, sb_key, "instagram_leads", "id", lead["id"],
-            {"dm_draft": dm_text}
-        )
-
-        if success:
-            preview = dm_text[:80].replace("\n", " ")
-            print(f"  [{i+1}/{total}] @{handle} - {preview}...")
-            results["generated"] += 1
-        else:
-            results["errors"] += 1
+        # Queue the write back to Supabase (flushed in bulk by the UpsertBuffer)
+        await writes.add({"instagram_handle": lead["instagram_handle"], "dm_draft": dm_text})
+        preview = dm_text[:80].replace("\n", " ")
+        print(f"  [{i+1}/{total}] @{handle} - {preview}...")
+        results["generated"] += 1
 
 
 async def main_async():
@@ -223,6 +206,7 @@ async def main_async():
         dry_run = True
     if "--regenerate" in args:
         regenerate = True
+    local = "--local" in args
 
     env = load_env()
     sb_url = env.get("SUPABASE_URL", "")
@@ -246,7 +230,14 @@ async def main_async():
         else:
             endpoint = f"instagram_leads?status=in.(engaged,warm)&dm_draft=is.null&select={select}&limit={limit}"
 
-        leads = await supabase_get(session, sb_url, sb_key, endpoint)
+        mirror = None
+        if local:
+            mirror = LocalMirror()
+            mirror.sync(sb_url, sb_key, tables=["instagram_leads"])
+            where = "status IN ('engaged', 'warm')" + ("" if regenerate else " AND dm_draft IS NULL")
+            leads = mirror.select("instagram_leads", where, columns=select.split(","), limit=limit)
+        else:
+            leads = await supabase_get(session, sb_url, sb_key, endpoint)
 
         if not leads:
             print("No engaged leads found that need DM drafts.")
@@ -288,17 +279,22 @@ async def main_async():
         semaphore = asyncio.Semaphore(10)
         results = {"generated": 0, "errors": 0}
 
-        tasks = [
-            generate_dm(session, semaphore, i, len(eligible), lead, anthropic_key, sb_url, sb_key, results)
-            for i, lead in enumerate(eligible[:limit])
-        ]
-        await asyncio.gather(*tasks)
+        async with AsyncSupabaseClient(sb_url, sb_key) as sb, UpsertBuffer(
+                sb, "instagram_leads", mirror=mirror, key="instagram_handle") as writes:
+            tasks = [
+                generate_dm(session, semaphore, i, len(eligible), lead, anthropic_key, writes, results)
+                for i, lead in enumerate(eligible[:limit])
+            ]
+            await asyncio.gather(*tasks)
+        results["generated"] -= len(writes.failed)
+        results["errors"] += len(writes.failed)
 
     print()
     print("=" * 50)
     print("DM DRAFT GENERATION COMPLETE")
     print(f"  Generated: {results['generated']}")
     print(f"  Errors:    {results['errors']}")
+    print(f"  Saved:     {writes.written} rows in {writes.requests} Supabase requests")
     print(f"  Total:     {len(eligible[:limit])}")
     print("=" * 50)
 
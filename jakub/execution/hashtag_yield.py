@@ -0,0 +1,109 @@
+"""
+hashtag_yield.py - Per-hashtag discovery stats and results-limit planning.
+
+Every hashtag is searched in its own instagram-hashtag-scraper run, and after
+filtering the script records, per hashtag: posts returned, unique usernames
+and how many of those passed `filter_profiles`. Cost per hashtag is the
+paid posts (first 60 per hashtag are free) plus the profile scrapes of its
+usernames; a username found under several hashtags is split evenly between
+them, both its cost and its qualified lead.
+
+On later runs `plan()` uses qualified leads per dollar (recent runs weigh
+more, hashtags with little history are pulled toward the overall average):
+
+- Hashtags under `min_yield` with enough history are skipped.
+- Hashtags below the median yield get a proportionally lower resultsLimit
+  (never under the free 60).
+
+Stored in jakub/.tmp/hashtag_yield.json.
+
+Usage:
+    model = HashtagYieldModel()
+    plan, skipped = model.plan(HASHTAGS, limit=100)     # {hashtag: resultsLimit}
+    ...
+    model.record("trenerpersonalny", run_id, posts=100, usernames=41, qualified=9.5, cost_usd=0.1)
+"""
+
+from datetime import datetime, timezone
+
+from local_state import load_json, save_json, tmp_path
+
+
+FREE_POSTS_PER_HASHTAG = 60
+COST_PER_POST = 0.0004          # after the free posts
+COST_PER_PROFILE = 0.002        # instagram-profile-scraper
+RECENCY_DECAY = 0.5             # weight of each older run relative to the one after it
+PRIOR_USD = 0.05                # strength of the pull toward the overall average, in dollars
+MIN_EVIDENCE_USD = 0.05         # spend needed before a hashtag can be skipped
+DEFAULT_QUALIFIED_PER_USD = 100  # assumed when there is no history at all
+DEFAULT_MIN_YIELD = 20          # qualified leads per dollar below which a hashtag is skipped
+MAX_RUNS_KEPT = 10
+
+
+def hashtag_search_cost(posts):
+    return max(0, posts - FREE_POSTS_PER_HASHTAG) * COST_PER_POST
+
+
+class HashtagYieldModel:
+    def __init__(self):
+        self.path = tmp_path("hashtag_yield.json")
+        self.hashtags = load_json(self.path, {})
+
+    def record(self, hashtag, run_id, posts, usernames, qualified, cost_usd):
+        """Record one hashtag run. A run already recorded (reused within the
+        registry TTL) is ignored - its first measurement is the one that counts."""
+        runs = self.hashtags.setdefault(hashtag, [])
+        if any(r["run_id"] == run_id for r in runs):
+            return
+        runs.append({
+            "run_id": run_id,
+            "at": datetime.now(timezone.utc).isoformat(),
+            "posts": posts,
+            "usernames": usernames,
+            "qualified": round(qualified, 2),
+            "cost_usd": round(cost_usd, 4),
+        })
+        del runs[:-MAX_RUNS_KEPT]
+        save_json(self.path, self.hashtags)
+
+    def _weighted(self, hashtag):
+        """(cost_usd, qualified) over the hashtag's runs, most recent weighted highest."""
+        cost = qualified = 0.0
+        weight = 1.0
+        for run in reversed(self.hashtags.get(hashtag, [])):
+            cost += weight * run["cost_usd"]
+            qualified += weight * run["qualified"]
+            weight *= RECENCY_DECAY
+        return cost, qualified
+
+    def _prior(self):
+        cost = sum(r["cost_usd"] for runs in self.hashtags.values() for r in runs)
+        qualified = sum(r["qualified"] for runs in self.hashtags.values() for r in runs)
+        return qualified / cost if cost else DEFAULT_QUALIFIED_PER_USD
+
+    def yield_per_dollar(self, hashtag, prior=None):
+        """Expected qualified leads per dollar of search + profile-scrape spend."""
+        prior = self._prior() if prior is None else prior
+        cost, qualified = self._weighted(hashtag)
+        return (qualified + PRIOR_USD * prior) / (cost + PRIOR_USD)
+
+    def plan(self, hashtags, limit, min_yield=DEFAULT_MIN_YIELD):
+        """resultsLimit per hashtag. Returns (plan, skipped): {hashtag: limit},
+        {hashtag: reason}."""
+        prior = self._prior()
+        yields = {h: self.yield_per_dollar(h, prior) for h in hashtags}
+        skipped = {}
+        for h, per_dollar in yields.items():
+            cost, _ = self._weighted(h)
+            if per_dollar < min_yield and cost >= MIN_EVIDENCE_USD:
+                skipped[h] = f"low yield ({per_dollar:.0f} qualified/$)"
+
+        kept = sorted(yields[h] for h in hashtags if h not in skipped)
+        median = kept[len(kept) // 2] if kept else 0
+        plan = {}
+        for h in hashtags:
+            if h in skipped:
+                continue
+            weight = min(1.0, yields[h] / median) if median else 1.0
+            plan[h] = max(min(limit, FREE_POSTS_PER_HASHTAG), int(round(limit * weight)))
+        return plan, skipped
@@ -0,0 +1,223 @@
+"""
+local_mirror.py - Optional local SQLite copy of the `leads` and `instagram_leads` tables.
+
+The enrichment and outreach scripts pick their work with filters like
+`enriched_at=is.null`, `ai_pain_point=is.null`, `outreach_status=eq.not_contacted`
+or `status=in.(engaged,warm)`, each a query against the hosted database.
+With `--local` they select from this mirror instead; writes still go to
+Supabase.
+
+- `sync()` reads rows added since the last sync (keyset on id) and rows
+  changed since the last sync (keyset on updated_at, id). Change tracking
+  needs an `updated_at` column kept current by a trigger - see UPDATED_AT_SQL;
+  without it only new rows are picked up and `--full` re-reads the tables.
+  When the column shows up after the first sync, the next sync re-reads the
+  table once to set its updated_at high-water mark.
+- `apply()` merges rows the pipeline itself just wrote into the mirror, so
+  the next `--local` selection does not pick them again even before a sync.
+- Every row is stored whole (JSON) next to indexed copies of the columns
+  the scripts filter on, so `select()` is a local indexed query.
+- If Supabase cannot be reached, the mirror is used as it is (offline dry
+  runs and reports).
+
+Stored in jakub/.tmp/mirror.sqlite3. Deleting it just means the next sync
+downloads everything once.
+
+Usage:
+    python3 jakub/execution/local_mirror.py            # sync + status report
+    python3 jakub/execution/local_mirror.py --full     # re-download both tables
+
+    mirror = LocalMirror()
+    mirror.sync(sb_url, sb_key)
+    leads = mirror.select("leads", "enriched_at IS NULL", columns=["id", "email"], limit=100)
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import urllib.parse
+
+from local_state import tmp_path
+from supabase_api import get_client
+
+
+PAGE_SIZE = 1000
+
+# Columns copied out of the row for filtering, per table (all get an index)
+INDEXED_COLUMNS = {
+    "leads": ["email", "website", "linkedin", "enriched_at", "ai_pain_point",
+              "ai_opening_line", "outreach_status"],
+    "instagram_leads": ["instagram_handle", "status", "engaged_at", "dm_draft", "scraped_at", "score"],
+}
+
+UPDATED_AT_SQL = """
+-- Run once in the Supabase SQL editor
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+BEGIN NEW.updated_at = NOW(); RETURN NEW; END $$ LANGUAGE plpgsql;
+
+ALTER TABLE leads ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+CREATE INDEX IF NOT EXISTS leads_updated_at_idx ON leads (updated_at, id);
+CREATE TRIGGER leads_touch_updated_at BEFORE UPDATE ON leads
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+ALTER TABLE instagram_leads ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+CREATE INDEX IF NOT EXISTS instagram_leads_updated_at_idx ON instagram_leads (updated_at, id);
+CREATE TRIGGER instagram_leads_touch_updated_at BEFORE UPDATE ON instagram_leads
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+"""
+
+
+def load_env(env_path=".env"):
+    env = {}
+    if os.path.exists(env_path):
+        with open(env_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#") and "=" in line:
+                    key, val = line.split("=", 1)
+                    env[key.strip()] = val.strip()
+    return env
+
+
+class LocalMirror:
+    def __init__(self):
+        self.db = sqlite3.connect(tmp_path("mirror.sqlite3"))
+        self.db.execute("CREATE TABLE IF NOT EXISTS sync_state "
+                        "(tbl TEXT PRIMARY KEY, last_id INTEGER, updated_at TEXT, updated_id INTEGER)")
+        for table, columns in INDEXED_COLUMNS.items():
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                            f"(id INTEGER PRIMARY KEY, {', '.join(columns)}, data TEXT NOT NULL)")
+            for column in columns:
+                self.db.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})")
+        self.db.commit()
+
+    def _state(self, table):
+        row = self.db.execute("SELECT last_id, updated_at, updated_id FROM sync_state WHERE tbl = ?",
+                              (table,)).fetchone()
+        return row or (0, None, 0)
+
+    def _store(self, table, rows):
+        columns = INDEXED_COLUMNS[table]
+        self.db.executemany(
+            f"INSERT OR REPLACE INTO {table} (id, {', '.join(columns)}, data) "
+            f"VALUES (?, {', '.join('?' * len(columns))}, ?)",
+            [(row["id"], *(row.get(c) for c in columns), json.dumps(row, ensure_ascii=False))
+             for row in rows],
+        )
+
+    def sync_table(self, sb_url, sb_key, table, full=False):
+        """Pull new and changed rows of `table`. Returns (new rows, changed rows)."""
+        sb = get_client(sb_url, sb_key)
+        if full:
+            self.db.execute(f"DELETE FROM {table}")
+            self.db.execute("DELETE FROM sync_state WHERE tbl = ?", (table,))
+        last_id, updated_at, updated_id = self._state(table)
+        tracks_updates = None
+        if last_id and updated_at is None:
+            # No mark yet: the first sync saw no updated_at column. If it exists now,
+            # rows changed since then are unknown - read the whole table once more
+            sample = sb.get(f"{table}?select=*&limit=1")
+            tracks_updates = ("updated_at" in sample[0]) if sample else None
+            if tracks_updates:
+                print(f"  {table} now has updated_at - re-reading it once to start change tracking")
+                last_id = 0
+        first_sync = last_id == 0
+
+        new = 0
+        while True:
+            rows = sb.get(f"{table}?select=*&id=gt.{last_id}&order=id.asc&limit={PAGE_SIZE}")
+            self._store(table, rows)
+            for row in rows:
+                if tracks_updates is None:
+                    tracks_updates = "updated_at" in row
+                # Later syncs pick changed rows up from the updated_at high-water mark;
+                # only the first one sets it
+                if first_sync and row.get("updated_at") and (
+                        updated_at is None or (row["updated_at"], row["id"]) > (updated_at, updated_id)):
+                    updated_at, updated_id = row["updated_at"], row["id"]
+            new += len(rows)
+            if rows:
+                last_id = rows[-1]["id"]
+            if len(rows) < PAGE_SIZE:
+                break
+
+        changed = 0
+        if updated_at is not None and not first_sync:
+            while True:
+                ts = urllib.parse.quote(f'"{updated_at}"')
+                rows = sb.get(f"{table}?select=*&or=(updated_at.gt.{ts},and(updated_at.eq.{ts},id.gt.{updated_id}))"
+                              f"&order=updated_at.asc,id.asc&limit={PAGE_SIZE}")
+                self._store(table, rows)
+                changed += len(rows)
+                if rows:
+                    updated_at, updated_id = rows[-1]["updated_at"], rows[-1]["id"]
+                if len(rows) < PAGE_SIZE:
+                    break
+        elif tracks_updates is False:
+            print(f"  [WARN] {table} has no updated_at column - only new rows are mirrored. "
+                  f"Run local_mirror.UPDATED_AT_SQL in Supabase (the next sync then re-reads "
+                  f"{table} once), or sync with --full to pick up changes now.")
+
+        self.db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                        (table, last_id, updated_at, updated_id))
+        self.db.commit()
+        return new, changed
+
+    def sync(self, sb_url, sb_key, tables=None, full=False):
+        """Sync `tables` (default both). Keeps the current copy if Supabase is unreachable."""
+        for table in tables or INDEXED_COLUMNS:
+            try:
+                new, changed = self.sync_table(sb_url, sb_key, table, full)
+                print(f"  Local mirror: {table} +{new} new, {changed} changed")
+            except Exception as e:
+                print(f"  [WARN] Could not sync local mirror of {table} ({e}) - using the local copy")
+
+    def select(self, table, where="1", params=(), columns=None, limit=None, order="id"):
+        """Rows of `table` matching the SQL `where` clause, as dicts with `columns` (default all)."""
+        sql = f"SELECT data FROM {table} WHERE {where} ORDER BY {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        rows = [json.loads(data) for (data,) in self.db.execute(sql, params)]
+        if columns:
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+        return rows
+
+    def apply(self, table, rows, key="id"):
+        """Merge rows just written to Supabase (each with `key`: "id" or an indexed
+        unique column) into the mirror."""
+        merged = []
+        for row in rows:
+            found = self.db.execute(f"SELECT data FROM {table} WHERE {key} = ?", (row[key],)).fetchone()
+            if found:
+                merged.append({**json.loads(found[0]), **row})
+        self._store(table, merged)
+        self.db.commit()
+
+
+def main():
+    env = load_env()
+    sb_url = env.get("SUPABASE_URL", "")
+    sb_key = env.get("SUPABASE_KEY", "")
+    if not sb_url or not sb_key:
+        print("ERROR: SUPABASE_URL and SUPABASE_KEY must be set in .env")
+        sys.exit(1)
+
+    mirror = LocalMirror()
+    mirror.sync(sb_url, sb_key, full="--full" in sys.argv)
+
+    print()
+    print("=" * 50)
+    print("LOCAL MIRROR")
+    for table, column in (("leads", "outreach_status"), ("instagram_leads", "status")):
+        print(f"  {table} by {column}:")
+        for value, count in mirror.db.execute(
+                f"SELECT {column}, COUNT(*) FROM {table} GROUP BY {column} ORDER BY COUNT(*) DESC"):
+            print(f"    {value or '-':<22} {count}")
+    waiting = mirror.db.execute("SELECT COUNT(*) FROM leads WHERE enriched_at IS NULL").fetchone()[0]
+    print(f"  leads waiting for website scraping: {waiting}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
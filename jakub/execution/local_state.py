@@ -0,0 +1,38 @@
+"""
+local_state.py - Where the pipeline scripts keep local state (caches, registries).
+
+Everything lives under jakub/.tmp/ next to the CSV exports, so it is never
+committed. It can be wiped at any time - it only saves time and Apify spend,
+the source of truth stays in Apify / Supabase.
+"""
+
+import json
+import os
+
+
+TMP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".tmp")
+
+
+def tmp_path(*parts):
+    """Path under jakub/.tmp/, creating parent directories as needed."""
+    path = os.path.join(TMP_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def load_json(path, default):
+    """Read a JSON state file, falling back to `default` if missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path, data):
+    """Write a JSON state file atomically (temp file + rename) so a crash mid-write
+    never leaves a truncated file behind."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
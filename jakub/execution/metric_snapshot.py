@@ -0,0 +1,46 @@
+"""
+metric_snapshot.py - Last written metric values per Instagram handle.
+
+`find_instagram_leads.py --refresh` re-scrapes existing instagram_leads rows
+to keep follower counts, bio and score current. Most profiles barely change
+between refreshes, so the snapshot keeps a digest of the metric columns last
+written for each handle and only rows whose digest differs are sent.
+
+Stored in jakub/.tmp/instagram_metrics.json as {handle: digest}. Deleting it
+just means the next refresh writes every row once.
+
+Usage:
+    snapshot = MetricSnapshot(["follower_count", "post_count", "bio", "score"])
+    changed = snapshot.changed(rows)
+    ...                             # upsert `changed`
+    snapshot.record(changed)
+    snapshot.save()
+"""
+
+import hashlib
+import json
+
+from local_state import load_json, save_json, tmp_path
+
+
+class MetricSnapshot:
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.path = tmp_path("instagram_metrics.json")
+        self.digests = load_json(self.path, {})
+
+    def digest(self, row):
+        values = [row.get(column) for column in self.columns]
+        return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+    def changed(self, rows):
+        """Rows whose metric columns differ from the last recorded write."""
+        return [row for row in rows
+                if self.digests.get(row["instagram_handle"].lower()) != self.digest(row)]
+
+    def record(self, rows):
+        for row in rows:
+            self.digests[row["instagram_handle"].lower()] = self.digest(row)
+
+    def save(self):
+        save_json(self.path, self.digests)
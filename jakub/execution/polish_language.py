@@ -0,0 +1,181 @@
+"""
+polish_language.py - Offline check whether an Instagram bio is written in Polish.
+
+`qualify_with_ai` asks Claude two things: is the person Polish, and are they
+a fitness coach. Most of that prompt is about telling Polish from Czech and
+Slovak, which is easy locally when the bio is clear:
+
+1. Diacritics. ą ę ł ś ź ż ń only occur in Polish; ř ů ě ď ť ň and the
+   Slovak ľ ĺ ŕ ô only in Czech / Slovak. á é í ú ý č š ž are Czech and
+   Slovak too, but also turn up in loanwords and names in Polish bios
+   ("café", "protéine"), so they never decide on their own.
+2. Otherwise a character-trigram model trained on the short sample texts
+   below (Polish, Czech, Slovak, English) scores the bio; a clear winner
+   decides.
+
+`classify()` returns POLISH, NOT_POLISH or AMBIGUOUS. English, mixed and very
+short bios are AMBIGUOUS - a Polish coach may well write in English, so only
+Claude (who also sees name and handle) can judge those.
+
+Usage:
+    label, reason = classify(bio)    # ("polish", "Polish letters: ł, ż")
+"""
+
+import math
+import re
+from collections import Counter
+
+from bio_matcher import fold
+
+
+POLISH = "polish"
+NOT_POLISH = "not_polish"
+AMBIGUOUS = "ambiguous"
+
+POLISH_LETTERS = set("ąęłśźżń")
+CZECH_SLOVAK_LETTERS = set("řůěďťňľĺŕô")
+MIN_MARKS = 2          # diacritics needed before the letters alone decide
+MIN_LETTERS = 25       # shorter bios are too short for the trigram model
+MIN_MARGIN = 0.35      # average log-probability per trigram the winner must lead by
+
+SAMPLES = {
+    "pl": """
+        trener personalny i dietetyk pomagam kobietom schudnąć i zbudować sylwetkę
+        treningi online i stacjonarne plany treningowe oraz dieta dopasowana do ciebie
+        prowadzę podopiecznych od lat zapraszam na konsultacje napisz do mnie wiadomość
+        trening siłowy zdrowe nawyki motywacja i wsparcie na każdym etapie drogi
+        współpraca indywidualna prowadzenie online metamorfozy moich klientów
+        przygotowanie motoryczne redukcja tkanki tłuszczowej budowanie masy mięśniowej
+        jestem trenerką fitness i mamą dwójki dzieci kocham ruch i dobre jedzenie
+        zapisy na treningi w krakowie warszawie i online link w bio sprawdź ofertę
+        trener przygotowania fizycznego certyfikowany instruktor siłowni pasjonat sportu
+        zdrowe odżywianie bez wyrzeczeń schudnij mądrze razem ze mną zacznij dziś
+        to nie jest kolejna dieta cud tylko plan który naprawdę działa dla ciebie
+        chcesz poczuć się lepiej we własnym ciele napisz do mnie a ja ci pomogę
+        pokażę ci jak ćwiczyć bezpiecznie i skutecznie w domu albo na siłowni
+        już ponad sto osób zmieniło ze mną swoje życie może teraz twoja kolej
+        szczęśliwa żona i mama dwóch córek trenuję od dziecka uwielbiam bieganie
+        rzetelna wiedza bez ściemy przepisy ćwiczenia i porady codziennie na stories
+        prowadzenie treningowe i żywieniowe miesięczne pakiety wspólnie osiągniemy cel
+        jeśli szukasz trenera który naprawdę się zaangażuje dobrze trafiłeś
+        """,
+    "cs": """
+        osobní trenér a výživový poradce pomáhám ženám zhubnout a zpevnit postavu
+        online tréninky a tréninkové plány na míru jídelníček a podpora každý den
+        trenérka fitness a jógy miluji pohyb a zdravé jídlo přidej se ke mně
+        cvičení doma i v posilovně konzultace zdarma napiš mi zprávu
+        pomáhám lidem najít cestu ke zdravému životnímu stylu bez hladovění
+        silový trénink běh a motivace pro každého kdo chce změnu
+        certifikovaný trenér instruktor skupinových lekcí praha brno ostrava
+        učitelka jógy a pohybu výživa regenerace a zdravé návyky
+        spolupráce online koučink proměny mých klientů odkaz v profilu
+        tohle není další zázračná dieta ale plán který opravdu funguje právě pro tebe
+        chceš se cítit lépe ve svém těle napiš mi a já ti pomůžu
+        ukážu ti jak cvičit bezpečně a efektivně doma nebo v posilovně
+        už přes sto lidí se mnou změnilo svůj život možná je teď řada na tobě
+        šťastná manželka a máma dvou dcer trénuju od dětství a miluju běhání
+        poctivé informace bez keců recepty cviky a rady každý den ve stories
+        tréninkové a výživové vedení měsíční balíčky společně dosáhneme cíle
+        pokud hledáš trenéra který se opravdu zapojí jsi tady správně
+        """,
+    "sk": """
+        osobný tréner a výživový poradca pomáham ženám schudnúť a spevniť postavu
+        online tréningy a tréningové plány na mieru jedálniček a podpora každý deň
+        trénerka fitness a jogy milujem pohyb a zdravé jedlo pridaj sa ku mne
+        cvičenie doma aj v posilňovni konzultácia zdarma napíš mi správu
+        pomáham ľuďom nájsť cestu k zdravému životnému štýlu bez hladovania
+        silový tréning beh a motivácia pre každého kto chce zmenu
+        certifikovaný tréner inštruktor skupinových lekcií bratislava košice žilina
+        spolupráca online koučing premeny mojich klientov odkaz v profile
+        toto nie je ďalšia zázračná diéta ale plán ktorý naozaj funguje práve pre teba
+        chceš sa cítiť lepšie vo svojom tele napíš mi a ja ti pomôžem
+        ukážem ti ako cvičiť bezpečne a efektívne doma alebo v posilňovni
+        už viac ako sto ľudí so mnou zmenilo svoj život možno je teraz rad na tebe
+        šťastná manželka a mama dvoch dcér trénujem od detstva a milujem behanie
+        poctivé informácie bez kecov recepty cviky a rady každý deň v stories
+        tréningové a výživové vedenie mesačné balíčky spolu dosiahneme cieľ
+        ak hľadáš trénera ktorý sa naozaj zapojí si tu správne
+        """,
+    "en": """
+        personal trainer and nutrition coach helping women lose fat and build strength
+        online coaching and custom training plans with meal plans that fit your life
+        fitness coach and mum of two i love lifting good food and helping people
+        book a free consultation send me a message link in bio for coaching
+        strength training healthy habits mindset and accountability every week
+        certified personal trainer group classes transformations of my clients
+        helping busy people get fit without giving up the foods they love
+        this is not another miracle diet but a plan that actually works for you
+        want to feel better in your own body send me a message and i will help
+        i will show you how to train safely and effectively at home or in the gym
+        over a hundred people have changed their lives with me maybe now it is your turn
+        happy wife and mother of two daughters training since childhood and love running
+        honest advice no nonsense recipes workouts and tips every day on my stories
+        """,
+}
+
+LETTERS = re.compile(r"[^\W\d_]+")
+
+
+def _trigrams(text):
+    for word in LETTERS.findall(text.lower()):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3]
+
+
+def _train(samples):
+    models = {}
+    for lang, text in samples.items():
+        # Bios often skip diacritics, so learn the accent-free spelling too
+        counts = Counter(_trigrams(text)) + Counter(_trigrams(fold(text)))
+        total = sum(counts.values())
+        vocab = len(counts) + 1
+        # Add-one smoothing; unseen trigrams get the floor probability
+        models[lang] = ({g: math.log((n + 1) / (total + vocab)) for g, n in counts.items()},
+                        math.log(1 / (total + vocab)))
+    return models
+
+
+MODELS = _train(SAMPLES)
+LANGUAGE_NAMES = {"pl": "Polish", "cs": "Czech", "sk": "Slovak", "en": "English"}
+
+
+def language_scores(text):
+    """{lang: average trigram log-probability} for `text`."""
+    grams = list(_trigrams(text))
+    if not grams:
+        return {}
+    return {
+        lang: sum(probs.get(g, floor) for g in grams) / len(grams)
+        for lang, (probs, floor) in MODELS.items()
+    }
+
+
+def classify(text):
+    """(POLISH | NOT_POLISH | AMBIGUOUS, reason) for a bio."""
+    text = (text or "").lower()
+    polish_marks = [c for c in text if c in POLISH_LETTERS]
+    other_marks = [c for c in text if c in CZECH_SLOVAK_LETTERS]
+
+    if len(polish_marks) >= MIN_MARKS and not other_marks:
+        return POLISH, "Polish letters: " + ", ".join(sorted(set(polish_marks)))
+    if len(other_marks) >= MIN_MARKS and not polish_marks:
+        return NOT_POLISH, "Czech/Slovak letters: " + ", ".join(sorted(set(other_marks)))
+    if polish_marks and other_marks:
+        return AMBIGUOUS, "mixed Polish and Czech/Slovak letters"
+
+    if sum(len(w) for w in LETTERS.findall(text)) < MIN_LETTERS:
+        return AMBIGUOUS, "too little text"
+    scores = language_scores(text)
+    best = max(scores, key=scores.get)
+    if best == "en":
+        return AMBIGUOUS, "English text"
+    if best == "pl":
+        runner_up = max((lang for lang in scores if lang != "pl"), key=scores.get)
+        if scores["pl"] - scores[runner_up] < MIN_MARGIN:
+            return AMBIGUOUS, f"Polish or {LANGUAGE_NAMES[runner_up]}"
+        return POLISH, "Polish text"
+    # Czech and Slovak are close to each other; only their distance to Polish matters
+    if scores[best] - scores["pl"] < MIN_MARGIN:
+        return AMBIGUOUS, f"{LANGUAGE_NAMES[best]} or Polish"
+    return NOT_POLISH, f"{LANGUAGE_NAMES[best]} text"
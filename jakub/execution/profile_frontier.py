@@ -0,0 +1,96 @@
+"""
+profile_frontier.py - Priority frontier for related-profile discovery.
+
+Instagram lists "related profiles" for every account, and the related
+profiles of a fitness coach are mostly other coaches. `--mode graph` starts
+from leads already in instagram_leads, scrapes them, and walks those links.
+Before a candidate is scraped (paid per profile) all we know is its
+username and full name, plus which qualified coaches point at it, so the
+frontier ranks candidates by:
+
+- coaching / Poland keywords in username + full name (BIO_MATCHER groups),
+  candidates with negative keywords are dropped,
+- how many qualified coaches list it (each extra parent adds weight),
+- the best score among those parents,
+- depth: every hop away from the seeds costs a little.
+
+Private accounts, handles already visited or known, and candidates beyond
+`max_depth` hops are never queued.
+
+Usage:
+    frontier = ProfileFrontier(BIO_MATCHER, max_depth=2, skip=known_handles)
+    frontier.add_related(lead, profile["relatedProfiles"], depth=1)
+    for handle, depth in frontier.pop(100): ...
+"""
+
+import heapq
+from collections import Counter
+
+
+KEYWORD_WEIGHT = 2.0       # coaching keyword in username / full name
+POLAND_WEIGHT = 1.0
+EXTRA_PARENT_WEIGHT = 1.0  # per qualified coach listing the candidate, after the first
+PARENT_SCORE_WEIGHT = 0.1  # per point of the best parent's lead score
+DEPTH_PENALTY = 0.5
+
+
+class ProfileFrontier:
+    def __init__(self, matcher, max_depth, skip=()):
+        self.matcher = matcher
+        self.max_depth = max_depth
+        self.visited = {h.lower() for h in skip}
+        self.heap = []             # (-priority, order, handle)
+        self.candidates = {}       # handle -> {"depth", "parents", "parent_score", "name_score", "priority"}
+        self.order = 0
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def add_related(self, parent, related, depth):
+        """Queue the related profiles of a qualified lead `parent` found at `depth`."""
+        if depth > self.max_depth:
+            return
+        for profile in related or []:
+            handle = (profile.get("username") or "").lower()
+            if not handle or handle in self.visited or profile.get("is_private"):
+                continue
+            candidate = self.candidates.get(handle)
+            if candidate is None:
+                hits = self.matcher.match(f"{handle} {profile.get('full_name') or ''}")
+                if hits["negative"]:
+                    self.visited.add(handle)
+                    continue
+                candidate = self.candidates[handle] = {
+                    "depth": depth,
+                    "parents": Counter(),
+                    "parent_score": 0,
+                    "name_score": KEYWORD_WEIGHT * bool(hits["positive"]) + POLAND_WEIGHT * bool(hits["poland"]),
+                }
+            candidate["depth"] = min(candidate["depth"], depth)
+            candidate["parents"][parent.get("instagram_handle", "")] += 1
+            candidate["parent_score"] = max(candidate["parent_score"], parent.get("score", 0))
+            self._push(handle, candidate)
+
+    def _push(self, handle, candidate):
+        # Re-pushed on every change; stale heap entries are skipped in pop()
+        candidate["priority"] = (
+            candidate["name_score"]
+            + EXTRA_PARENT_WEIGHT * (len(candidate["parents"]) - 1)
+            + PARENT_SCORE_WEIGHT * candidate["parent_score"]
+            - DEPTH_PENALTY * candidate["depth"]
+        )
+        self.order += 1
+        heapq.heappush(self.heap, (-candidate["priority"], self.order, handle))
+
+    def pop(self, n):
+        """Up to `n` best candidates as [(handle, depth)]; they count as visited."""
+        popped = []
+        while self.heap and len(popped) < n:
+            neg_priority, _, handle = heapq.heappop(self.heap)
+            candidate = self.candidates.get(handle)
+            if candidate is None or -neg_priority != candidate["priority"]:
+                continue
+            del self.candidates[handle]
+            self.visited.add(handle)
+            popped.append((handle, candidate["depth"]))
+        return popped
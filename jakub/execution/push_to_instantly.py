@@ -2,11 +2,16 @@
 push_to_instantly.py - Bulk push leads from Supabase to an Instantly campaign.
 
 Usage:
-    python3 jakub/execution/push_to_instantly.py
+    python3 jakub/execution/push_to_instantly.py [--local]
+
+    --local  select leads from the local SQLite mirror (see local_mirror.py)
 
 Uses the bulk endpoint (POST /api/v2/leads/add) - up to 1000 leads per request.
 """
-import json, urllib.request, os, sys, time
+import json, urllib.error, urllib.request, os, sys, time
+
+from local_mirror import LocalMirror
+from supabase_api import get_client
 
 def load_env(path=".env"):
     env = {}
@@ -22,27 +27,20 @@ def load_env(path=".env"):
 env = load_env()
 SB_URL = env["SUPABASE_URL"]
 SB_KEY = env["SUPABASE_KEY"]
+SB = get_client(SB_URL, SB_KEY)
+MIRROR = LocalMirror() if "--local" in sys.argv else None
 INSTANTLY_KEY = "ZTBmZjI4OWYtYTBiZC00OTdkLTk4NGMtMjA2N2NkMTMxODYxOlFMYXZudnpJcW1Rag=="
 CAMPAIGN_ID = "53f2cb7b-6a49-4b6b-8b01-92a88f586c04"
 
 def sb_get(endpoint):
-    req = urllib.request.Request(
-        f"{SB_URL}/rest/v1/{endpoint}",
-        headers={"apikey": SB_KEY, "Authorization": f"Bearer {SB_KEY}"}
-    )
-    return json.loads(urllib.request.urlopen(req).read())
+    return SB.get(endpoint)
 
 def sb_bulk_patch(ids, data):
     """Patch multiple leads in Supabase by ID list."""
     ids_str = ",".join(str(i) for i in ids)
-    req = urllib.request.Request(
-        f"{SB_URL}/rest/v1/leads?id=in.({ids_str})",
-        data=json.dumps(data).encode(),
-        headers={"apikey": SB_KEY, "Authorization": f"Bearer {SB_KEY}",
-                 "Content-Type": "application/json", "Prefer": "return=minimal"},
-        method="PATCH"
-    )
-    urllib.request.urlopen(req)
+    SB.patch(f"leads?id=in.({ids_str})", data)
+    if MIRROR:
+        MIRROR.apply("leads", [{"id": i, **data} for i in ids])
 
 def bulk_upload(leads_batch):
     """Upload up to 1000 leads to Instantly via bulk endpoint."""
@@ -63,14 +61,23 @@ def bulk_upload(leads_batch):
 # Fetch leads
 print("Fetching leads from Supabase...", flush=True)
 all_leads = []
-for offset in range(0, 4000, 1000):
-    data = sb_get(
-        f"leads?select=id,email,first_name,last_name,company_name,ai_opening_line,ai_pain_point,website"
-        f"&ai_opening_line=not.is.null&outreach_status=eq.not_contacted&order=id&limit=1000&offset={offset}"
+if MIRROR:
+    MIRROR.sync(SB_URL, SB_KEY, tables=["leads"])
+    all_leads = MIRROR.select(
+        "leads", "ai_opening_line IS NOT NULL AND outreach_status = 'not_contacted'",
+        columns=["id", "email", "first_name", "last_name", "company_name", "ai_opening_line",
+                 "ai_pain_point", "website"],
+        limit=4000,
     )
-    all_leads.extend(data)
-    if len(data) < 1000:
-        break
+else:
+    for offset in range(0, 4000, 1000):
+        data = sb_get(
+            f"leads?select=id,email,first_name,last_name,company_name,ai_opening_line,ai_pain_point,website"
+            f"&ai_opening_line=not.is.null&outreach_status=eq.not_contacted&order=id&limit=1000&offset={offset}"
+        )
+        all_leads.extend(data)
+        if len(data) < 1000:
+            break
 
 print(f"Leads to push: {len(all_leads)}", flush=True)
 
@@ -16,6 +16,8 @@ import json
 import urllib.request
 import urllib.error
 
+from supabase_api import SupabaseError, get_client
+
 # Load .env manually (no external deps needed)
 def load_env(env_path=".env"):
     env = {}
@@ -31,28 +33,11 @@ def load_env(env_path=".env"):
 
 def supabase_request(url, key, method, endpoint, data=None):
     """Make a request to Supabase REST API."""
-    full_url = f"{url}/rest/v1/{endpoint}"
-    headers = {
-        "apikey": key,
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal",
-    }
-
-    body = json.dumps(data).encode("utf-8") if data else None
-    req = urllib.request.Request(full_url, data=body, headers=headers, method=method)
-
     try:
-        with urllib.request.urlopen(req) as resp:
-            if resp.status in (200, 201):
-                try:
-                    return json.loads(resp.read().decode("utf-8"))
-                except Exception:
-                    return {"status": "ok"}
-            return {"status": resp.status}
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8") if e.fp else ""
-        return {"error": e.code, "message": error_body}
+        result = get_client(url, key).request(method, endpoint, data or None, prefer="return=minimal")
+    except SupabaseError as e:
+        return {"error": e.status, "message": e.body}
+    return result if result is not None else {"status": "ok"}
 
 
 def supabase_sql(url, key, sql):
@@ -0,0 +1,83 @@
+"""
+query_planner.py - Turn a per-city lead allocation into Leads Finder runs.
+
+Every run has a fixed cost in time (startup, 10-minute timeout floor) no
+matter how few leads it returns, and one run verifies its leads one after
+another, so a big run is slow. The planner evens that out:
+
+- Small cities (allocation, or known pool from past runs, under MERGE_BELOW
+  leads) are packed together into one run - `contact_city` takes a list -
+  up to MAX_FETCH_PER_RUN leads / MAX_CITIES_PER_RUN cities per run.
+- Cities asked for more than MAX_FETCH_PER_RUN leads are split into several
+  runs by job title (each run gets a disjoint subset of the titles), which
+  then run in parallel.
+- Everything else stays one run per city.
+
+Each query is a dict:
+    {"name": "Reno +3", "cities": [...], "job_titles": [...],
+     "fetch_count": 240, "allocation": {city: leads}}
+
+Usage:
+    queries = plan_queries({"Raleigh": 800, "Reno": 50, "Norfolk": 40}, JOB_TITLES,
+                           capacity=yield_model.capacity)
+"""
+
+import math
+
+
+MAX_FETCH_PER_RUN = 400   # ~12 sec/lead verification -> ~80 minutes per run
+MERGE_BELOW = 100
+MAX_CITIES_PER_RUN = 10
+
+
+def plan_queries(allocation, job_titles, capacity=None):
+    """Plan runs for `allocation` ({city: fetch_count}).
+
+    `capacity(city)`, if given, is the most leads a city is known to have
+    (e.g. CityYieldModel.capacity); cities whose pool is small are merged
+    even if they were allocated more.
+    """
+    queries = []
+    small = []
+    for city, fetch_count in allocation.items():
+        expected = min(fetch_count, capacity(city)) if capacity else fetch_count
+        if expected < MERGE_BELOW:
+            small.append((city, expected))
+            continue
+
+        parts = min(math.ceil(fetch_count / MAX_FETCH_PER_RUN), len(job_titles))
+        if parts == 1:
+            queries.append(_query(city, [city], job_titles, {city: fetch_count}))
+            continue
+        per_part = math.ceil(fetch_count / parts)
+        for i in range(parts):
+            queries.append(_query(f"{city} [titles {i + 1}/{parts}]", [city], job_titles[i::parts],
+                                  {city: per_part}))
+
+    group = {}
+    for city, expected in small:
+        if group and (sum(group.values()) + expected > MAX_FETCH_PER_RUN
+                      or len(group) >= MAX_CITIES_PER_RUN):
+            queries.append(_merged_query(group, job_titles))
+            group = {}
+        group[city] = expected
+    if group:
+        queries.append(_merged_query(group, job_titles))
+
+    return queries
+
+
+def _query(name, cities, job_titles, allocation):
+    return {
+        "name": name,
+        "cities": cities,
+        "job_titles": list(job_titles),
+        "fetch_count": sum(allocation.values()),
+        "allocation": allocation,
+    }
+
+
+def _merged_query(group, job_titles):
+    cities = list(group)
+    name = cities[0] if len(cities) == 1 else f"{cities[0]} +{len(cities) - 1}"
+    return _query(name, cities, job_titles, group)
@@ -0,0 +1,100 @@
+"""
+run_manifest.py - Checkpoint file for long multi-run Apify searches.
+
+Every search unit (e.g. one city) gets an entry that is saved to disk the
+moment its state changes: run id as soon as the run starts, then dataset id,
+status and item count when it finishes. If the process crashes or is
+interrupted, `--resume` loads the latest manifest, skips finished units
+(complete or partial - their datasets are pulled from the local cache /
+Apify) and re-attaches to runs that were still in flight - nothing is paid
+for twice. Once every unit is finished and its leads are stored, the run
+calls `finish()` and that manifest is no longer resumed.
+
+Stored in jakub/.tmp/manifests/<name>_<timestamp>.json.
+
+Usage:
+    manifest = RunManifest.create("find_and_enrich", {"allocation": allocation, "queries": queries})
+    manifest = RunManifest.latest("find_and_enrich")    # for --resume
+    manifest.update("Raleigh", status="running", run_id=run["id"])
+    manifest.finish()                                    # all units done, leads stored
+"""
+
+import glob
+import os
+from datetime import datetime, timezone
+
+from local_state import load_json, save_json, tmp_path
+
+
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_PARTIAL = "partial"  # run timed out / failed / was aborted; its dataset was salvaged
+STATUS_FAILED = "failed"
+
+
+class RunManifest:
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def create(cls, name, config):
+        stamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        path = tmp_path("manifests", f"{name}_{stamp}.json")
+        manifest = cls(path, {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "config": config,
+            "units": {},
+        })
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def latest(cls, name):
+        """The most recently created manifest for `name`, or None."""
+        paths = sorted(glob.glob(os.path.join(os.path.dirname(tmp_path("manifests", "_")), f"{name}_*.json")))
+        if not paths:
+            return None
+        data = load_json(paths[-1], {})
+        if not isinstance(data, dict):
+            data = {}
+        # An empty or damaged file still loads: its config is just empty
+        data.setdefault("config", {})
+        data.setdefault("units", {})
+        return cls(paths[-1], data)
+
+    @property
+    def config(self):
+        return self.data["config"]
+
+    @property
+    def finished(self):
+        return bool(self.data.get("finished_at"))
+
+    def get(self, unit):
+        return self.data["units"].get(unit)
+
+    def update(self, unit, **fields):
+        entry = self.data["units"].setdefault(unit, {})
+        entry.update(fields)
+        entry["updated_at"] = datetime.now(timezone.utc).isoformat()
+        self.save()
+
+    def finish(self):
+        """Mark the whole run as done - --resume has nothing left to pick up."""
+        self.data["finished_at"] = datetime.now(timezone.utc).isoformat()
+        self.save()
+
+    def save(self):
+        save_json(self.path, self.data)
+
+    def started_units(self):
+        """Units that already had a run before this process (e.g. a resumed run)."""
+        return {unit for unit, entry in self.data["units"].items() if entry.get("run_id")}
+
+    def counts(self):
+        """{status: number of units}"""
+        counts = {}
+        for entry in self.data["units"].values():
+            counts[entry.get("status")] = counts.get(entry.get("status"), 0) + 1
+        return counts
@@ -0,0 +1,92 @@
+"""
+run_registry.py - Remember finished Apify runs so identical searches aren't bought twice.
+
+Each successful run is recorded under a hash of the actor id plus its
+canonicalized run input (keys sorted, lists of plain values sorted - every
+list input our actors take is a set, e.g. cities, job titles, hashtags,
+usernames). Starting the same actor with the same input again within the TTL
+reuses the finished run's dataset instead of starting a new paid run.
+
+Stored in jakub/.tmp/apify_runs.json. Keep the TTL under Apify's dataset
+retention (7 days for unnamed datasets on the free plan).
+
+Usage:
+    registry = RunRegistry(ttl_hours=24)
+    async with ApifyClient(api_key, run_registry=registry) as apify:
+        items = await apify.run_actor(actor_id, run_input)  # reused when possible
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone, timedelta
+
+from local_state import load_json, save_json, tmp_path
+
+
+DEFAULT_TTL_HOURS = 24
+
+
+def canonicalize(value):
+    """Normalize a run input so equivalent inputs serialize identically."""
+    if isinstance(value, dict):
+        return {k: canonicalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        items = [canonicalize(v) for v in value]
+        if all(isinstance(v, (str, int, float, bool)) for v in items):
+            return sorted(items, key=lambda v: (type(v).__name__, v))
+        return items
+    return value
+
+
+def run_input_key(actor_id, run_input):
+    payload = json.dumps([actor_id, canonicalize(run_input)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RunRegistry:
+    def __init__(self, ttl_hours=DEFAULT_TTL_HOURS):
+        self.path = tmp_path("apify_runs.json")
+        self.ttl = timedelta(hours=ttl_hours)
+        self.entries = load_json(self.path, {})
+
+    @property
+    def enabled(self):
+        return self.ttl > timedelta(0)
+
+    def lookup(self, actor_id, run_input):
+        """Return the registry entry for a finished identical run within the TTL, or None."""
+        if not self.enabled:
+            return None
+        entry = self.entries.get(run_input_key(actor_id, run_input))
+        if not entry:
+            return None
+        finished_at = datetime.fromisoformat(entry["finished_at"])
+        if datetime.now(timezone.utc) - finished_at > self.ttl:
+            return None
+        return entry
+
+    def record(self, actor_id, run_input, run):
+        """Record a SUCCEEDED run and drop expired entries."""
+        if not self.enabled:
+            return
+        now = datetime.now(timezone.utc)
+        self.entries = {
+            k: v for k, v in self.entries.items()
+            if now - datetime.fromisoformat(v["finished_at"]) <= self.ttl
+        }
+        finished_at = run.get("finishedAt")
+        self.entries[run_input_key(actor_id, run_input)] = {
+            "actor_id": actor_id,
+            "run_id": run["id"],
+            "dataset_id": run["defaultDatasetId"],
+            "finished_at": (
+                datetime.fromisoformat(finished_at.replace("Z", "+00:00")).isoformat()
+                if finished_at else now.isoformat()
+            ),
+        }
+        save_json(self.path, self.entries)
+
+    def forget(self, actor_id, run_input):
+        """Drop an entry whose run or dataset turned out to be gone."""
+        if self.entries.pop(run_input_key(actor_id, run_input), None) is not None:
+            save_json(self.path, self.entries)
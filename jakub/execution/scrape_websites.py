@@ -2,7 +2,9 @@
 scrape_websites.py - Visit each lead's website and extract coaching info (async, concurrent).
 
 Usage:
-    python3 jakub/execution/scrape_websites.py [--limit 10] [--use-ai] [--use-tavily] [--use-linkedin] [--concurrency 10] [--rerun]
+    python3 jakub/execution/scrape_websites.py [--limit 10] [--use-ai] [--use-tavily] [--use-linkedin] [--concurrency 10] [--rerun] [--local]
+
+    --local  select leads from the local SQLite mirror (see local_mirror.py)
 
 Reads leads from Supabase (those with a website but not yet enriched),
 scrapes their website, and updates Supabase with findings.
@@ -42,6 +44,10 @@ import ssl
 from html.parser import HTMLParser
 from datetime import datetime, timezone
 
+from local_mirror import LocalMirror
+from supabase_api import AsyncSupabaseClient
+from upsert_buffer import UpsertBuffer
+
 
 # --- ENV ---
 def load_env(env_path=".env"):
@@ -105,26 +111,6 @@ def supabase_get_sync(url, key, endpoint):
         return []
 
 
-async def supabase_update(session, url, key, table, match_col, match_val, data):
-    full_url = f"{url}/rest/v1/{table}?{match_col}=eq.{match_val}"
-    headers = {
-        "apikey": key,
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal",
-    }
-    try:
-        async with session.patch(full_url, headers=headers, json=data) as resp:
-            if resp.status in (200, 204):
-                return True
-            error_body = await resp.text()
-            print(f"  Update error: {resp.status} - {error_body[:200]}")
-            return False
-    except Exception as e:
-        print(f"  Update exception: {e}")
-        return False
-
-
 # --- WEBSITE SCRAPING (async) ---
 async def fetch_website(session, website_url, timeout=10):
     """Fetch a website's HTML content."""
@@ -777,7 +763,7 @@ async def analyze_website(session, html, website_url, openai_key=None):
 
 
 # --- PROCESS SINGLE LEAD (async) ---
-async def process_lead(session, lead, i, total, use_tavily, use_linkedin, tavily_key, apify_key, openai_key, sb_url, sb_key, semaphore, stats):
+async def process_lead(session, lead, i, total, use_tavily, use_linkedin, tavily_key, apify_key, openai_key, writes, semaphore, stats):
     """Process a single lead with concurrency control."""
     async with semaphore:
         website = lead.get("website", "")
@@ -832,8 +818,10 @@ async def process_lead(session, lead, i, total, use_tavily, use_linkedin, tavily
         status = "ONLINE" if info.get("offers_online_coaching") else "ok"
         print(f"  [{i+1}/{total}] {name} @ {company} - {status} via {method} ({services_str})", flush=True)
 
-        # Update Supabase
+        # Queue the Supabase write (flushed in bulk by the UpsertBuffer)
         update_data = {
+            "id": lead_id,
+            "email": lead.get("email"),
             "offers_online_coaching": info.get("offers_online_coaching", False),
             "website_description": (info.get("website_description", "") or "")[:500],
             "coaching_services": (info.get("coaching_services", "") or "")[:500],
@@ -844,7 +832,7 @@ async def process_lead(session, lead, i, total, use_tavily, use_linkedin, tavily
             "enriched_at": datetime.now(timezone.utc).isoformat(),
         }
 
-        await supabase_update(session, sb_url, sb_key, "leads", "id", lead_id, update_data)
+        await writes.add(update_data)
         stats["scraped"] += 1
 
 
@@ -872,6 +860,7 @@ async def async_main():
         use_linkedin = True
     if "--rerun" in sys.argv:
         rerun = True
+    local = "--local" in sys.argv
 
     env = load_env()
     sb_url = env.get("SUPABASE_URL", "")
@@ -901,7 +890,18 @@ async def async_main():
     else:
         # Pick up leads with a website OR leads with no website but with LinkedIn
         endpoint = f"leads?enriched_at=is.null&or=(website.neq.,linkedin.neq.)&select={select_fields}&limit={limit}"
-    leads = supabase_get_sync(sb_url, sb_key, endpoint)
+    mirror = None
+    if local:
+        mirror = LocalMirror()
+        mirror.sync(sb_url, sb_key, tables=["leads"])
+        columns = select_fields.split(",")
+        if rerun:
+            leads = mirror.select("leads", "website != ''", columns=columns, limit=limit)
+        else:
+            leads = mirror.select("leads", "enriched_at IS NULL AND (website != '' OR linkedin != '')",
+                                  columns=columns, limit=limit)
+    else:
+        leads = supabase_get_sync(sb_url, sb_key, endpoint)
 
     if not leads:
         print("No leads to scrape (all already enriched or no websites).")
@@ -944,7 +944,8 @@ async def async_main():
 
     # Use a single aiohttp session with generous connection limits
     connector = aiohttp.TCPConnector(limit=concurrency * 2, limit_per_host=concurrency)
-    async with aiohttp.ClientSession(connector=connector) as session:
+    async with aiohttp.ClientSession(connector=connector) as session, \
+            AsyncSupabaseClient(sb_url, sb_key) as sb, UpsertBuffer(sb, "leads", mirror=mirror) as writes:
         tasks = []
         for i, lead in enumerate(leads):
             task = asyncio.create_task(
@@ -952,13 +953,16 @@ async def async_main():
                     session, lead, i, len(leads),
                     use_tavily, use_linkedin,
                     tavily_key, apify_key, openai_key,
-                    sb_url, sb_key, semaphore, stats
+                    writes, semaphore, stats
                 )
             )
             tasks.append(task)
 
         await asyncio.gather(*tasks)
 
+    stats["scraped"] -= len(writes.failed)
+    stats["failed"] += len(writes.failed)
+
     print()
     print("=" * 50)
     print(f"WEBSITE SCRAPING COMPLETE")
@@ -966,6 +970,7 @@ async def async_main():
     print(f"  Concurrency: {concurrency}")
     print(f"  Scraped:     {stats['scraped']}")
     print(f"  Failed:      {stats['failed']}")
+    print(f"  Saved:       {writes.written} rows in {writes.requests} Supabase requests")
     if use_linkedin:
         print(f"  LinkedIn fallback used: {stats['linkedin_used']}")
     print(f"  Online coaching detected: {stats['online_count']}")
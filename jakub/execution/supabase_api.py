@@ -0,0 +1,198 @@
+"""
+supabase_api.py - Shared Supabase REST client used by the pipeline scripts.
+
+`urllib.request.urlopen` opens a new connection for every call, so a
+paginated full-table read or a few hundred batched inserts pay a TCP + TLS
+handshake each. This client keeps connections open instead:
+
+- SupabaseClient (sync): a small pool of keep-alive http.client connections,
+  safe to share between threads (asyncio.to_thread callers). A pooled
+  connection the server already closed is retried once on a fresh one.
+- AsyncSupabaseClient: one aiohttp session with a pooled TCPConnector, for
+  scripts that fire many requests from an event loop.
+
+Both send `Accept-Encoding: gzip` and apply a per-request timeout. Non-2xx
+responses raise SupabaseError carrying the status code and response body.
+
+Usage:
+    from supabase_api import get_client
+
+    sb = get_client(sb_url, sb_key)            # shared per (url, key)
+    rows = sb.get("leads?select=id,email&limit=1000")
+    sb.post("leads?on_conflict=email", rows, prefer="return=minimal,resolution=ignore-duplicates")
+    sb.patch("leads?id=in.(1,2,3)", {"outreach_status": "contacted"})
+
+    async with AsyncSupabaseClient(sb_url, sb_key) as sb:
+        await sb.patch(f"leads?id=eq.{lead_id}", {"first_name": "Anna"})
+
+Requires:
+    pip install aiohttp   (async client only)
+"""
+
+import gzip
+import http.client
+import json
+import threading
+import urllib.parse
+
+
+DEFAULT_TIMEOUT_SECS = 60
+DEFAULT_MAX_CONNECTIONS = 8
+# Errors that mean a pooled keep-alive connection was closed by the server
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                           BrokenPipeError, ConnectionResetError)
+
+
+class SupabaseError(Exception):
+    def __init__(self, status, body):
+        super().__init__(f"HTTP {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+
+
+def _headers(key, prefer=None, has_body=False):
+    headers = {"apikey": key, "Authorization": f"Bearer {key}", "Accept-Encoding": "gzip"}
+    if has_body:
+        headers["Content-Type"] = "application/json"
+    if prefer:
+        headers["Prefer"] = prefer
+    return headers
+
+
+def _decode(raw):
+    """Parsed JSON body, or None for an empty one (Prefer: return=minimal)."""
+    return json.loads(raw) if raw.strip() else None
+
+
+class SupabaseClient:
+    """Sync Supabase REST client over pooled keep-alive connections."""
+
+    def __init__(self, url, key, timeout=DEFAULT_TIMEOUT_SECS, max_connections=DEFAULT_MAX_CONNECTIONS):
+        parsed = urllib.parse.urlsplit(url)
+        self.key = key
+        self.host = parsed.netloc
+        self.https = parsed.scheme == "https"
+        self.base_path = parsed.path.rstrip("/") + "/rest/v1/"
+        self.timeout = timeout
+        self.idle = []                              # connections ready for reuse
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, timeout=self.timeout)
+
+    def request(self, method, endpoint, data=None, prefer=None):
+        """Send one request; returns the parsed JSON body (None if empty)."""
+        body = json.dumps(data).encode("utf-8") if data is not None else None
+        headers = _headers(self.key, prefer, has_body=body is not None)
+        with self.slots:
+            with self.lock:
+                conn = self.idle.pop() if self.idle else None
+            reused = conn is not None
+            while True:
+                conn = conn or self._connect()
+                try:
+                    conn.request(method, self.base_path + endpoint, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    raw = resp.read()
+                    break
+                except STALE_CONNECTION_ERRORS:
+                    conn.close()
+                    if not reused:
+                        raise
+                    conn, reused = None, False
+                except Exception:
+                    conn.close()
+                    raise
+            if resp.will_close:
+                conn.close()
+            else:
+                with self.lock:
+                    self.idle.append(conn)
+
+        if resp.getheader("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+        text = raw.decode("utf-8")
+        if resp.status >= 300:
+            raise SupabaseError(resp.status, text)
+        return _decode(text)
+
+    def get(self, endpoint):
+        return self.request("GET", endpoint)
+
+    def post(self, endpoint, data, prefer="return=minimal"):
+        return self.request("POST", endpoint, data, prefer)
+
+    def patch(self, endpoint, data, prefer="return=minimal"):
+        return self.request("PATCH", endpoint, data, prefer)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url, key):
+    """The process-wide SupabaseClient for (url, key), so helper functions that
+    take sb_url / sb_key share one connection pool."""
+    with _clients_lock:
+        client = _clients.get((url, key))
+        if client is None:
+            client = _clients[(url, key)] = SupabaseClient(url, key)
+        return client
+
+
+class AsyncSupabaseClient:
+    """Async Supabase REST client. Use as `async with AsyncSupabaseClient(url, key) as sb:`."""
+
+    def __init__(self, url, key, timeout=DEFAULT_TIMEOUT_SECS, max_connections=20):
+        self.base_url = url.rstrip("/") + "/rest/v1/"
+        self.key = key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.session = None
+
+    async def __aenter__(self):
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=90)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def request(self, method, endpoint, data=None, prefer=None):
+        """Send one request; returns the parsed JSON body (None if empty)."""
+        body = json.dumps(data).encode("utf-8") if data is not None else None
+        headers = _headers(self.key, prefer, has_body=body is not None)
+        # aiohttp decompresses gzip responses itself
+        async with self.session.request(method, self.base_url + endpoint, data=body, headers=headers) as resp:
+            text = await resp.text()
+            if resp.status >= 300:
+                raise SupabaseError(resp.status, text)
+            return _decode(text)
+
+    async def get(self, endpoint):
+        return await self.request("GET", endpoint)
+
+    async def post(self, endpoint, data, prefer="return=minimal"):
+        return await self.request("POST", endpoint, data, prefer)
+
+    async def patch(self, endpoint, data, prefer="return=minimal"):
+        return await self.request("PATCH", endpoint, data, prefer)
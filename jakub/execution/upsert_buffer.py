@@ -0,0 +1,121 @@
+"""
+upsert_buffer.py - Write-behind buffer for per-lead results going to Supabase.
+
+The enrichment scripts (scrape_websites, enrich_with_ai, generate_dm_drafts)
+produce one result row per lead. Instead of one PATCH `id=eq.{id}` per lead,
+rows are collected here and written as bulk upserts
+(`on_conflict=<key>`, `Prefer: resolution=merge-duplicates`), which only touch
+the columns present in the rows. The key is `id` by default; instagram_leads
+uses `instagram_handle`, because its id is GENERATED ALWAYS and Postgres
+rejects any insert that sets it, even one that would end in a conflict. A batch is flushed when it reaches
+`batch_size` rows or its oldest row is `max_delay` seconds old, and
+everything left is drained when the `async with` block exits.
+
+If a bulk upsert fails, its rows are retried one by one so a single bad row
+does not lose the batch; rows that still fail are printed and collected in
+`failed` as {key: error}. Written rows are also merged into the local mirror
+when one is given (`--local` runs).
+
+Rows must carry the table's NOT NULL columns (leads.email,
+instagram_leads.instagram_handle) with their current values: Postgres checks
+them on the proposed insert before it resolves the conflict.
+PostgREST bulk inserts need every row to have the same keys, so rows are
+batched per key set.
+
+Usage:
+    async with AsyncSupabaseClient(sb_url, sb_key) as sb:
+        async with UpsertBuffer(sb, "leads") as writes:
+            await writes.add({"id": lead_id, "email": email, "ai_pain_point": "..."})
+        async with UpsertBuffer(sb, "instagram_leads", key="instagram_handle") as writes:
+            await writes.add({"instagram_handle": handle, "dm_draft": "..."})
+    print(writes.written, writes.failed)
+"""
+
+import asyncio
+import time
+
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_DELAY_SECS = 2.0
+MAX_CONCURRENT_FLUSHES = 2
+UPSERT_PREFER = "return=minimal,resolution=merge-duplicates"
+
+
+class UpsertBuffer:
+    """Use as `async with UpsertBuffer(async_supabase_client, table) as writes:`."""
+
+    def __init__(self, sb, table, batch_size=DEFAULT_BATCH_SIZE, max_delay=DEFAULT_MAX_DELAY_SECS,
+                 mirror=None, key="id"):
+        self.sb = sb
+        self.table = table
+        self.key = key             # conflict column; every row must carry it
+        self.mirror = mirror       # optional local_mirror.LocalMirror, updated with written rows
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.pending = {}          # tuple of sorted keys -> (first added at, [rows])
+        self.flushes = set()
+        self.flush_slots = asyncio.Semaphore(MAX_CONCURRENT_FLUSHES)
+        self.timer = None
+        self.written = 0
+        self.requests = 0
+        self.failed = {}
+
+    async def __aenter__(self):
+        self.timer = asyncio.create_task(self._flush_stale())
+        return self
+
+    async def __aexit__(self, *exc):
+        self.timer.cancel()
+        for keys in list(self.pending):
+            self._flush(keys)
+        if self.flushes:
+            await asyncio.gather(*self.flushes)
+
+    async def add(self, row):
+        """Queue one row (must include the key column and the table's NOT NULL columns)."""
+        keys = tuple(sorted(row))
+        _, rows = self.pending.setdefault(keys, (time.monotonic(), []))
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self._flush(keys)
+
+    def _flush(self, keys):
+        _, rows = self.pending.pop(keys)
+        task = asyncio.create_task(self._write(rows))
+        self.flushes.add(task)
+        task.add_done_callback(self.flushes.discard)
+
+    async def _flush_stale(self):
+        while True:
+            await asyncio.sleep(self.max_delay / 2)
+            cutoff = time.monotonic() - self.max_delay
+            for keys, (started, _) in list(self.pending.items()):
+                if started <= cutoff:
+                    self._flush(keys)
+
+    async def _upsert(self, rows):
+        self.requests += 1
+        await self.sb.post(f"{self.table}?on_conflict={self.key}", rows, prefer=UPSERT_PREFER)
+        if self.mirror:
+            self.mirror.apply(self.table, rows, key=self.key)
+
+    async def _write(self, rows):
+        async with self.flush_slots:
+            try:
+                await self._upsert(rows)
+                self.written += len(rows)
+                return
+            except Exception as e:
+                if len(rows) == 1:
+                    self._record_failure(rows[0], e)
+                    return
+            for row in rows:
+                try:
+                    await self._upsert([row])
+                    self.written += 1
+                except Exception as e:
+                    self._record_failure(row, e)
+
+    def _record_failure(self, row, error):
+        self.failed[row.get(self.key)] = str(error)
+        print(f"  Save error for {self.table} {self.key}={row.get(self.key)}: {str(error)[:200]}", flush=True)
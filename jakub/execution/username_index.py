@@ -0,0 +1,83 @@
+"""
+username_index.py - Local index of Instagram handles we already have or scraped recently.
+
+Profile scraping is paid per username, and most discovered usernames are
+already rows in `instagram_leads` (push_to_supabase would drop them as
+duplicates anyway) or were scraped and rejected by a recent run. The index
+keeps every known handle with the time its profile was last scraped:
+
+- `sync()` pulls new `instagram_leads` rows (keyset on id, so only rows
+  added since the last sync are read).
+- `mark_scraped()` records every profile a run scraped, including the ones
+  that did not pass filtering.
+- `split()` drops handles scraped within the freshness window from a
+  discovery set; older ones are scraped again.
+
+Stored in jakub/.tmp/instagram_usernames.json as {handle: unix time}.
+
+Usage:
+    index = UsernameIndex()
+    index.sync(sb_url, sb_key)
+    to_scrape, skipped = index.split(usernames, fresh_days=30)
+    ...
+    index.mark_scraped(p["username"] for p in profiles)
+"""
+
+import time
+from datetime import datetime
+
+from local_state import load_json, save_json, tmp_path
+from supabase_api import get_client
+
+
+DEFAULT_FRESH_DAYS = 30
+PAGE_SIZE = 1000
+
+
+class UsernameIndex:
+    def __init__(self):
+        self.path = tmp_path("instagram_usernames.json")
+        data = load_json(self.path, {})
+        self.last_id = data.get("last_id", 0)
+        self.handles = data.get("handles", {})
+
+    def save(self):
+        save_json(self.path, {"last_id": self.last_id, "handles": self.handles})
+
+    def sync(self, sb_url, sb_key):
+        """Add instagram_leads rows created since the last sync. Returns rows read."""
+        sb = get_client(sb_url, sb_key)
+        added = 0
+        while True:
+            rows = sb.get(f"instagram_leads?select=id,instagram_handle,scraped_at,created_at"
+                          f"&id=gt.{self.last_id}&order=id.asc&limit={PAGE_SIZE}")
+            for row in rows:
+                handle = (row.get("instagram_handle") or "").lower()
+                seen_at = row.get("scraped_at") or row.get("created_at")
+                if handle:
+                    when = int(datetime.fromisoformat(seen_at.replace("Z", "+00:00")).timestamp()) if seen_at else 0
+                    self.handles[handle] = max(self.handles.get(handle, 0), when)
+                self.last_id = max(self.last_id, row["id"])
+            added += len(rows)
+            if len(rows) < PAGE_SIZE:
+                break
+        self.save()
+        return added
+
+    def mark_scraped(self, handles, when=None):
+        when = int(when or time.time())
+        for handle in handles:
+            if handle:
+                self.handles[handle.lower()] = when
+        self.save()
+
+    def split(self, usernames, fresh_days=DEFAULT_FRESH_DAYS):
+        """(to_scrape, skipped): skipped are handles scraped within `fresh_days`."""
+        cutoff = time.time() - fresh_days * 86400
+        to_scrape, skipped = set(), set()
+        for username in usernames:
+            if self.handles.get(username.lower(), -1) >= cutoff:
+                skipped.add(username)
+            else:
+                to_scrape.add(username)
+        return to_scrape, skipped
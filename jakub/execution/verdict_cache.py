@@ -0,0 +1,65 @@
+"""
+verdict_cache.py - Remember Claude's qualification verdict for each Instagram profile.
+
+Discovery runs overlap heavily, so most profiles `qualify_with_ai` sees were
+already judged by an earlier run. A verdict is keyed by the handle plus a
+hash of what the model was shown that can change (bio, full name, business
+category) and the model name: as long as those match, the stored
+is_polish / is_fitness_coach / reason is reused instead of calling the API.
+An edited bio or a new model means a fresh call.
+
+Stored in jakub/.tmp/ai_verdicts.json as {handle: entry}, one entry per handle.
+
+Usage:
+    cache = VerdictCache(model="claude-sonnet-4-6")
+    verdict = cache.get(lead)       # None if unknown or the profile changed
+    ...
+    cache.put(lead, {"is_polish": True, "is_fitness_coach": True, "reason": "..."})
+    cache.save()
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from local_state import load_json, save_json, tmp_path
+
+
+def profile_hash(lead):
+    """Hash of the profile fields the qualification prompt depends on."""
+    fields = [lead.get("bio") or "", lead.get("full_name") or "", lead.get("business_category") or ""]
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+class VerdictCache:
+    def __init__(self, model):
+        self.model = model
+        self.path = tmp_path("ai_verdicts.json")
+        self.entries = load_json(self.path, {})
+        self.dirty = False
+
+    def get(self, lead):
+        """Cached {"is_polish", "is_fitness_coach", "reason"} or None."""
+        entry = self.entries.get((lead.get("instagram_handle") or "").lower())
+        if not entry or entry["hash"] != profile_hash(lead) or entry["model"] != self.model:
+            return None
+        return {k: entry[k] for k in ("is_polish", "is_fitness_coach", "reason")}
+
+    def put(self, lead, verdict):
+        handle = (lead.get("instagram_handle") or "").lower()
+        if not handle:
+            return
+        self.entries[handle] = {
+            "hash": profile_hash(lead),
+            "model": self.model,
+            "is_polish": bool(verdict.get("is_polish", False)),
+            "is_fitness_coach": bool(verdict.get("is_fitness_coach", False)),
+            "reason": verdict.get("reason", ""),
+            "at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.dirty = True
+
+    def save(self):
+        if self.dirty:
+            save_json(self.path, self.entries)
+            self.dirty = False